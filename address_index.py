@@ -0,0 +1,492 @@
+"""
+Precomputed Address Index for Property Matching
+Built once when properties load so spoken addresses resolve by candidate lookup
+instead of rescanning every property on every utterance
+"""
+
+import re
+import bisect
+import logging
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+NUMBER_RE = re.compile(r'\b\d+\b')
+WORD_RE = re.compile(r'\b[a-zA-Z]+\b')
+RANGE_RE = re.compile(r'\b(\d+)\s*-\s*(\d+)\b')
+
+FILLER_WORDS = {'i', 'think', 'its', 'it\'s', 'the', 'a', 'an', 'is', 'was', 'that', 'this'}
+DIRECTIONAL_WORDS = {'north', 'south', 'east', 'west', 'n', 's', 'e', 'w'}
+TYPE_WORDS = {'street', 'avenue', 'ave', 'road', 'rd', 'lane', 'ln', 'drive', 'dr', 'blvd', 'boulevard'}
+
+# Spoken/written abbreviations collapsed to one canonical street token
+STREET_ABBREVIATIONS = {
+    'st': 'street', 'str': 'street', 'ave': 'avenue', 'av': 'avenue', 'rd': 'road',
+    'ln': 'lane', 'dr': 'drive', 'blvd': 'boulevard', 'pl': 'place', 'ct': 'court',
+    'ter': 'terrace', 'pkwy': 'parkway', 'hwy': 'highway'
+}
+
+# Number proximity bands used by AddressMatcher scoring: (max difference, score)
+NUMBER_BANDS = ((0, 10.0), (2, 8.0), (5, 6.0), (10, 4.0), (20, 2.0))
+MAX_NUMBER_DISTANCE = NUMBER_BANDS[-1][0]
+NUMBER_BAND_LIMITS = np.array([band[0] for band in NUMBER_BANDS])
+NUMBER_BAND_SCORES = np.array([band[1] for band in NUMBER_BANDS] + [0.0])
+
+
+@lru_cache(maxsize=2048)
+def extract_street_components(address: str) -> Dict:
+    """Extract components from a spoken address (cached - callers must not mutate the result)"""
+    address_lower = address.lower().strip()
+
+    numbers = NUMBER_RE.findall(address)
+    words = [word for word in WORD_RE.findall(address_lower) if word not in FILLER_WORDS]
+    street_words = [word for word in words if word not in DIRECTIONAL_WORDS and word not in TYPE_WORDS]
+
+    return {
+        'numbers': numbers,
+        'words': words,
+        'street_words': street_words,
+        'has_richmond': 'richmond' in address_lower,
+        'has_port': 'port' in address_lower,
+        'has_targee': 'targee' in address_lower,
+        'original': address
+    }
+
+
+def number_score(difference: int) -> float:
+    for max_difference, score in NUMBER_BANDS:
+        if difference <= max_difference:
+            return score
+    return 0.0
+
+
+def normalize_street_tokens(text: str) -> List[str]:
+    """Lowercase alphabetic tokens with street-type abbreviations expanded"""
+    return [STREET_ABBREVIATIONS.get(word, word) for word in WORD_RE.findall(text.lower())]
+
+
+@lru_cache(maxsize=4096)
+def phonetic_key(word: str) -> str:
+    """
+    Compact Metaphone-style sound key so misheard spellings collide
+    (e.g. 'targee' / 'targey' / 'targie' -> 'TRJ').
+    """
+    w = ''.join(ch for ch in word.upper() if ch.isalpha())
+    if not w:
+        return ''
+
+    for prefix in ('KN', 'GN', 'PN', 'WR', 'AE'):
+        if w.startswith(prefix):
+            w = w[1:]
+            break
+    if w.startswith('X'):
+        w = 'S' + w[1:]
+    if w.startswith('WH'):
+        w = 'W' + w[2:]
+
+    vowels = 'AEIOU'
+    key = []
+    length = len(w)
+    i = 0
+    while i < length:
+        ch = w[i]
+        nxt = w[i + 1] if i + 1 < length else ''
+        nxt2 = w[i + 2] if i + 2 < length else ''
+        prev = w[i - 1] if i > 0 else ''
+        code = ''
+
+        if ch == prev and ch != 'C':
+            i += 1
+            continue
+        if ch in vowels:
+            code = 'A' if i == 0 else ''
+        elif ch == 'B':
+            code = '' if prev == 'M' and i == length - 1 else 'B'
+        elif ch == 'C':
+            if nxt == 'H' or (nxt == 'I' and nxt2 == 'A'):
+                code = 'X'
+            elif nxt in 'IEY' and nxt:
+                code = 'S'
+            else:
+                code = 'K'
+        elif ch == 'D':
+            code = 'J' if nxt == 'G' and nxt2 in 'EIY' and nxt2 else 'T'
+        elif ch == 'G':
+            if nxt == 'H' and nxt2 and nxt2 not in vowels:
+                code = ''
+            elif nxt == 'N' and i == length - 2:
+                code = ''
+            elif nxt in 'IEY' and nxt:
+                code = 'J'
+            else:
+                code = 'K'
+        elif ch == 'H':
+            code = 'H' if nxt in vowels and nxt and prev not in 'CSPTG' else ''
+        elif ch == 'K':
+            code = '' if prev == 'C' else 'K'
+        elif ch == 'P':
+            code = 'F' if nxt == 'H' else 'P'
+        elif ch == 'Q':
+            code = 'K'
+        elif ch == 'S':
+            code = 'X' if nxt == 'H' or (nxt == 'I' and nxt2 in 'OA' and nxt2) else 'S'
+        elif ch == 'T':
+            if nxt == 'I' and nxt2 in 'OA' and nxt2:
+                code = 'X'
+            elif nxt == 'H':
+                code = '0'
+            else:
+                code = 'T'
+        elif ch == 'V':
+            code = 'F'
+        elif ch in 'WY':
+            code = ch if nxt in vowels and nxt else ''
+        elif ch == 'X':
+            code = 'KS'
+        elif ch == 'Z':
+            code = 'S'
+        else:
+            code = ch
+
+        if code and (not key or key[-1] != code):
+            key.append(code)
+        i += 1
+
+    return ''.join(key)
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+@lru_cache(maxsize=8192)
+def property_features(name: str) -> Tuple[frozenset, Tuple[int, ...], Tuple[str, ...], frozenset, Tuple[str, ...]]:
+    """
+    Per-name derived data (n-grams, house numbers, street tokens, trigrams, phonetic keys).
+    Cached so rebuilding the index after a property delta only re-derives changed names.
+    """
+    prop_numbers = [int(n) for n in NUMBER_RE.findall(name)]
+    for low, high in RANGE_RE.findall(name):
+        low, high = int(low), int(high)
+        if low < high <= low + 200:
+            prop_numbers.extend(range(low + 1, high))
+
+    tokens = tuple(t for t in normalize_street_tokens(name) if t not in TYPE_WORDS and t not in DIRECTIONAL_WORDS)
+    keys = tuple(key for key in (phonetic_key(token) for token in tokens) if key)
+    return (frozenset(AddressIndex._grams(name)), tuple(prop_numbers), tokens,
+            frozenset(trigrams(' '.join(tokens))), keys)
+
+
+class AddressIndex:
+    """
+    Immutable lookup structures over one property list.
+    - name lookup for exact / substring matches against the whole property name
+    - n-gram postings (1-3 chars) so word-substring checks only touch candidate properties
+    - sorted house numbers (including ranges like '122-124') for proximity lookups
+    - phonetic keys of normalized street tokens for misheard street names
+    Positions are indexes into the original property list so ties resolve in list order.
+    """
+
+    def __init__(self, properties: List[Dict[str, Any]]):
+        self.properties = properties
+        self.names: List[str] = []
+        self.name_positions: Dict[str, int] = {}
+        self.name_lengths: List[int] = []
+        self.gram_postings: Dict[str, Set[int]] = {}
+        self.numbers: List[Tuple[int, int]] = []
+        self.property_numbers: List[Tuple[int, ...]] = []
+        self.phonetic_postings: Dict[str, Set[int]] = {}
+        self.street_tokens: List[Tuple[str, ...]] = []
+        self.street_trigrams: List[frozenset] = []
+
+        for position, prop in enumerate(properties):
+            name = (prop.get('Name', '') or '').lower()
+            self.names.append(name)
+            if name:
+                self.name_positions.setdefault(name, position)
+
+            grams, prop_numbers, tokens, street_grams, keys = property_features(name)
+            for gram in grams:
+                self.gram_postings.setdefault(gram, set()).add(position)
+
+            self.property_numbers.append(prop_numbers)
+            for number in set(prop_numbers):
+                self.numbers.append((number, position))
+
+            self.street_tokens.append(tokens)
+            self.street_trigrams.append(street_grams)
+            for key in keys:
+                self.phonetic_postings.setdefault(key, set()).add(position)
+
+        self.numbers.sort()
+        self.number_keys = [number for number, _ in self.numbers]
+        self.name_lengths = sorted({len(name) for name in self.name_positions})
+
+        # Dense per-property arrays for batch scoring
+        width = max((len(n) for n in self.property_numbers), default=0) or 1
+        self.number_matrix = np.full((len(properties), width), np.iinfo(np.int64).max // 2, dtype=np.int64)
+        for position, prop_numbers in enumerate(self.property_numbers):
+            self.number_matrix[position, :len(prop_numbers)] = prop_numbers
+        self.has_richmond = np.array(['richmond' in name for name in self.names], dtype=bool)
+        self.has_port = np.array(['port' in name for name in self.names], dtype=bool)
+        self.has_targee = np.array(['targee' in name for name in self.names], dtype=bool)
+        logger.info(f"🗂️ ADDRESS INDEX BUILT: {len(properties)} properties, {len(self.gram_postings)} n-grams, {len(self.phonetic_postings)} phonetic keys")
+
+    @staticmethod
+    def _grams(name: str) -> Set[str]:
+        grams = set(name)
+        grams.update(name[i:i + 2] for i in range(len(name) - 1))
+        grams.update(trigrams(name))
+        return grams
+
+    def __len__(self) -> int:
+        return len(self.properties)
+
+    # ------------------------------------------------------------------
+    # Candidate lookups
+    # ------------------------------------------------------------------
+
+    def positions_containing(self, text: str) -> Set[int]:
+        """Positions whose lowercase name contains text as a substring"""
+        if not text:
+            return set(range(len(self.names)))
+        if len(text) <= 3:
+            return set(self.gram_postings.get(text, ()))
+
+        grams = sorted(trigrams(text), key=lambda g: len(self.gram_postings.get(g, ())))
+        candidates = set(self.gram_postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self.gram_postings.get(gram, set())
+        return {p for p in candidates if text in self.names[p]}
+
+    def positions_within(self, text: str) -> Set[int]:
+        """Positions whose whole lowercase name appears inside text"""
+        found = set()
+        text_length = len(text)
+        for length in self.name_lengths:
+            if length > text_length:
+                break
+            for start in range(text_length - length + 1):
+                position = self.name_positions.get(text[start:start + length])
+                if position is not None:
+                    found.add(position)
+        return found
+
+    def positions_near_number(self, number: int) -> List[Tuple[int, int]]:
+        """(house number, position) pairs within the scoring distance of number"""
+        low = bisect.bisect_left(self.number_keys, number - MAX_NUMBER_DISTANCE)
+        high = bisect.bisect_right(self.number_keys, number + MAX_NUMBER_DISTANCE)
+        return self.numbers[low:high]
+
+    # ------------------------------------------------------------------
+    # Matching tiers (mirror AddressMatcher.find_matching_property)
+    # ------------------------------------------------------------------
+
+    def substring_match(self, spoken_clean: str) -> Optional[int]:
+        """First property where spoken text and name contain one another"""
+        matches = self.positions_containing(spoken_clean) | self.positions_within(spoken_clean)
+        return min(matches) if matches else None
+
+    def candidate_positions(self, street_info: Dict) -> Set[int]:
+        """Properties sharing a spoken word or lying near a spoken house number - the only ones scored"""
+        candidates: Set[int] = set()
+        for word in street_info['words']:
+            candidates |= self.positions_containing(word)
+        for number in street_info['numbers']:
+            candidates.update(position for _, position in self.positions_near_number(int(number)))
+        return candidates
+
+    def score_candidates(self, street_info: Dict) -> Dict[int, float]:
+        """Scores for every candidate property that scores above zero - the rest are never visited"""
+        user_numbers = [int(n) for n in street_info['numbers']]
+        scores = {}
+        for position in self.candidate_positions(street_info):
+            score = self.score(street_info, position, user_numbers)
+            if score > 0:
+                scores[position] = score
+        return scores
+
+    def score(self, street_info: Dict, position: int, user_numbers: Optional[List[int]] = None) -> float:
+        """Match score of one property: house-number proximity, street words and area bonuses / penalties"""
+        prop_lower = self.names[position]
+        if user_numbers is None:
+            user_numbers = [int(n) for n in street_info['numbers']]
+
+        best_number_score = 0.0
+        prop_numbers = self.property_numbers[position]
+        if user_numbers and prop_numbers:
+            best_difference = min(abs(u - p) for u in user_numbers for p in prop_numbers)
+            best_number_score = number_score(best_difference)
+        score = best_number_score
+
+        for word in street_info['street_words']:
+            if word in prop_lower:
+                score += 2.0 if len(word) > 4 else 1.0
+
+        if street_info['has_richmond'] and 'richmond' in prop_lower:
+            score += 3.0
+        if street_info['has_port'] and 'port' in prop_lower:
+            score += 2.5
+        if (street_info['has_richmond'] or street_info['has_port']) and 'targee' in prop_lower:
+            score -= 10.0
+        if street_info['has_targee'] and 'targee' in prop_lower:
+            score += 3.0
+
+        word_matches = sum(1 for word in street_info['words'] if word in prop_lower)
+        if word_matches >= 2:
+            score += 1.5
+
+        return score
+
+    def best_scored(self, street_info: Dict) -> Optional[Tuple[float, int]]:
+        scores = self.score_candidates(street_info)
+        if not scores:
+            return None
+        position = min(scores, key=lambda p: (-scores[p], p))
+        return scores[position], position
+
+    def word_match(self, words: List[str], min_length: int = 5) -> Optional[Tuple[str, int]]:
+        """First property containing a significant spoken word (list order)"""
+        for word in words:
+            if len(word) >= min_length:
+                matches = self.positions_containing(word)
+                if matches:
+                    return word, min(matches)
+        return None
+
+    def phonetic_match(self, spoken_clean: str, min_similarity: float = 0.5) -> Optional[Tuple[float, int]]:
+        """
+        Misheard street names: candidates share a phonetic key with a spoken street token,
+        ranked by trigram similarity of the street part plus house-number proximity.
+        """
+        tokens = [t for t in normalize_street_tokens(spoken_clean)
+                  if t not in TYPE_WORDS and t not in DIRECTIONAL_WORDS and t not in FILLER_WORDS]
+        candidates: Set[int] = set()
+        for token in tokens:
+            if len(token) > 2:
+                candidates |= self.phonetic_postings.get(phonetic_key(token), set())
+        if not candidates:
+            return None
+
+        spoken_grams = trigrams(' '.join(tokens))
+        user_numbers = [int(n) for n in NUMBER_RE.findall(spoken_clean)]
+        best = None
+        for position in candidates:
+            prop_grams = self.street_trigrams[position]
+            union = spoken_grams | prop_grams
+            similarity = len(spoken_grams & prop_grams) / len(union) if union else 0.0
+            # Sharing a sound key is itself evidence; trigram overlap refines the ranking
+            similarity = max(similarity, min_similarity)
+            prop_numbers = self.property_numbers[position]
+            if user_numbers and prop_numbers:
+                similarity += number_score(min(abs(u - p) for u in user_numbers for p in prop_numbers)) / 10.0
+            elif user_numbers:
+                continue
+            if best is None or (similarity, -position) > (best[0], -best[1]):
+                best = (similarity, position)
+        return best
+
+    # ------------------------------------------------------------------
+    # Batch resolution
+    # ------------------------------------------------------------------
+
+    def score_matrix(self, street_infos: List[Dict]) -> np.ndarray:
+        """
+        Scores for many queries against every property in one pass (queries x properties).
+        Word containment vectors are computed once per distinct word across the batch.
+        """
+        count = len(self.names)
+        scores = np.zeros((len(street_infos), count))
+        if not count or not street_infos:
+            return scores
+
+        word_vectors: Dict[str, np.ndarray] = {}
+
+        def contains(word: str) -> np.ndarray:
+            vector = word_vectors.get(word)
+            if vector is None:
+                vector = np.zeros(count, dtype=bool)
+                vector[list(self.positions_containing(word))] = True
+                word_vectors[word] = vector
+            return vector
+
+        # House-number proximity for every (query number, property) pair at once
+        query_ids, user_numbers = [], []
+        for row, info in enumerate(street_infos):
+            for number in info['numbers']:
+                query_ids.append(row)
+                user_numbers.append(int(number))
+        if user_numbers:
+            spoken = np.array(user_numbers, dtype=np.int64)[:, None, None]
+            differences = np.abs(spoken - self.number_matrix[None, :, :]).min(axis=2)
+            best_difference = np.full((len(street_infos), count), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(best_difference, np.array(query_ids), differences)
+            band = np.searchsorted(NUMBER_BAND_LIMITS, best_difference, side='left')
+            scores += NUMBER_BAND_SCORES[band]
+
+        for row, info in enumerate(street_infos):
+            for word in info['street_words']:
+                scores[row] += contains(word) * (2.0 if len(word) > 4 else 1.0)
+            if info['has_richmond']:
+                scores[row] += self.has_richmond * 3.0
+            if info['has_port']:
+                scores[row] += self.has_port * 2.5
+            if info['has_richmond'] or info['has_port']:
+                scores[row] -= self.has_targee * 10.0
+            if info['has_targee']:
+                scores[row] += self.has_targee * 3.0
+            if len(info['words']) >= 2:
+                word_matches = sum(contains(word).astype(np.int32) for word in info['words'])
+                scores[row] += (word_matches >= 2) * 1.5
+
+        return scores
+
+    def resolve_batch(self, spoken_addresses: List[str], top_k: int = 3) -> List[List[Tuple[str, float, int]]]:
+        """
+        Ranked top-k (match_type, score, position) candidates per spoken address.
+        Only the properties find_matching_property would score (candidate_positions) are ranked,
+        so the first candidate is what it would pick.
+        """
+        cleaned = [(text or '').lower().strip().replace(',', '').replace('.', '') for text in spoken_addresses]
+        street_infos = [extract_street_components(text) for text in cleaned]
+        scores = self.score_matrix(street_infos)
+
+        results = []
+        for row, spoken_clean in enumerate(cleaned):
+            ranked: List[Tuple[str, float, int]] = []
+            seen: Set[int] = set()
+
+            exact = self.substring_match(spoken_clean)
+            if exact is not None:
+                ranked.append(('exact', float(scores[row, exact]) if scores.size else 0.0, exact))
+                seen.add(exact)
+
+            if scores.size:
+                row_scores = np.zeros(scores.shape[1])
+                candidates = np.fromiter(self.candidate_positions(street_infos[row]), dtype=np.intp)
+                row_scores[candidates] = scores[row, candidates]
+                positive = np.flatnonzero(row_scores > 0)
+                if positive.size:
+                    # Highest score first, original list order on ties
+                    order = positive[np.lexsort((positive, -row_scores[positive]))]
+                    for position in order[:top_k + 1]:
+                        position = int(position)
+                        if position not in seen and len(ranked) < top_k:
+                            ranked.append(('scored', float(row_scores[position]), position))
+                            seen.add(position)
+
+            if not ranked:
+                word_match = self.word_match(street_infos[row]['words'])
+                if word_match:
+                    ranked.append(('word', 0.0, word_match[1]))
+                else:
+                    phonetic_match = self.phonetic_match(spoken_clean)
+                    if phonetic_match:
+                        ranked.append(('phonetic', float(phonetic_match[0]), phonetic_match[1]))
+
+            results.append(ranked[:top_k])
+        return results
@@ -7,6 +7,9 @@ import logging
 import asyncio
 from typing import Dict, List, Any, Optional
 from rent_manager import RentManagerAPI
+from address_index import AddressIndex, extract_street_components
+from property_snapshot_store import PropertyDelta
+from property_registry import PropertyRegistry, get_property_registry
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +19,28 @@ class AddressMatcher:
     Ensures service issues are created for correct properties.
     """
     
-    def __init__(self, rent_manager: RentManagerAPI):
+    def __init__(self, rent_manager: RentManagerAPI, registry: Optional[PropertyRegistry] = None):
         self.rent_manager = rent_manager
-        self.properties_cache = []
-        self.cache_loaded = False
+        # Property list and address index live in the worker-wide registry (one copy per process)
+        self.registry = registry if registry is not None else get_property_registry()
+        self.cache_loaded = self.registry.loaded
+    
+    @property
+    def properties_cache(self) -> List[Dict[str, Any]]:
+        return self.registry.properties
+    
+    @properties_cache.setter
+    def properties_cache(self, properties: List[Dict[str, Any]]):
+        """Loading a new property list swaps the shared registry snapshot (and its index)"""
+        self.registry.load(properties or [])
+    
+    @property
+    def index(self) -> AddressIndex:
+        return self.registry.index
+    
+    def apply_property_deltas(self, deltas: List[PropertyDelta]):
+        """Apply snapshot store deltas; only added/renamed names are re-derived for the index"""
+        self.registry.apply_deltas(deltas)
     
     async def load_properties(self):
         """Load all properties from Rent Manager for matching"""
@@ -43,49 +64,50 @@ class AddressMatcher:
             if not self.cache_loaded:
                 await self.load_properties()
             
-            if not self.properties_cache:
+            # One registry snapshot for the whole lookup (a concurrent refresh swaps in a new one)
+            index = self.index
+            properties = index.properties
+            if not properties:
                 logger.error("No properties available for matching")
                 return None
             
             spoken_clean = spoken_address.lower().strip().replace(',', '').replace('.', '')
-            logger.info(f"🔍 INTELLIGENT MATCHING: '{spoken_address}' against {len(self.properties_cache)} properties")
+            logger.info(f"🔍 INTELLIGENT MATCHING: '{spoken_address}' against {len(properties)} properties")
             
             # STEP 1: Extract street components from spoken address
             street_info = self._extract_street_components(spoken_clean)
             logger.info(f"📍 EXTRACTED COMPONENTS: {street_info}")
             
             # STEP 2: Try exact matches first
-            for prop in self.properties_cache:
-                prop_name = prop.get('Name', '').lower()
-                
-                # Check for exact street name match
-                if spoken_clean in prop_name or prop_name in spoken_clean:
-                    logger.info(f"✅ EXACT MATCH: '{prop.get('Name')}' for spoken '{spoken_address}'")
-                    return prop
+            position = index.substring_match(spoken_clean)
+            if position is not None:
+                prop = properties[position]
+                logger.info(f"✅ EXACT MATCH: '{prop.get('Name')}' for spoken '{spoken_address}'")
+                return prop
             
             # STEP 3: Try intelligent street matching with common variations
-            best_matches = []
-            for prop in self.properties_cache:
-                prop_name = prop.get('Name', '').lower()
-                score = self._calculate_match_score(street_info, prop_name)
-                if score > 0:
-                    best_matches.append((score, prop))
-            
-            # Sort by score and return best match
-            if best_matches:
-                best_matches.sort(reverse=True, key=lambda x: x[0])
-                best_score, best_prop = best_matches[0]
+            best_match = index.best_scored(street_info)
+            if best_match:
+                best_score, position = best_match
+                best_prop = properties[position]
                 logger.info(f"🎯 BEST INTELLIGENT MATCH: '{best_prop.get('Name')}' (score: {best_score}) for '{spoken_address}'")
                 return best_prop
             
             # STEP 4: Try single significant word matches as last resort
-            for word in street_info.get('words', []):
-                if len(word) > 4:  # Only try longer words
-                    for prop in self.properties_cache:
-                        prop_name = prop.get('Name', '').lower()
-                        if word in prop_name:
-                            logger.info(f"✅ WORD MATCH: '{prop.get('Name')}' for spoken '{spoken_address}' (word: '{word}')")
-                            return prop
+            word_match = index.word_match(street_info.get('words', []))
+            if word_match:
+                word, position = word_match
+                prop = properties[position]
+                logger.info(f"✅ WORD MATCH: '{prop.get('Name')}' for spoken '{spoken_address}' (word: '{word}')")
+                return prop
+            
+            # STEP 5: Phonetic match for misheard street names
+            phonetic_match = index.phonetic_match(spoken_clean)
+            if phonetic_match:
+                similarity, position = phonetic_match
+                prop = properties[position]
+                logger.info(f"🔊 PHONETIC MATCH: '{prop.get('Name')}' (similarity: {similarity:.2f}) for spoken '{spoken_address}'")
+                return prop
             
             logger.warning(f"❌ NO MATCH: '{spoken_address}' not found in property database")
             return None
@@ -109,107 +131,19 @@ class AddressMatcher:
         if not self.cache_loaded:
             await self.load_properties()
         
-        if not self.properties_cache:
+        index = self.index
+        if not index.properties:
             return False
             
         # Only return True for EXACT matches, not intelligent suggestions
         address_clean = address.lower().strip().replace(',', '').replace('.', '')
         
-        for prop in self.properties_cache:
-            prop_name = prop.get('Name', '').lower()
-            # Exact match: spoken address must match property name exactly or be contained within
-            if address_clean == prop_name or address_clean in prop_name or prop_name in address_clean:
-                return True
-        
-        return False
+        # Exact match: spoken address must match property name exactly or be contained within
+        return index.substring_match(address_clean) is not None
 
     def _extract_street_components(self, address: str) -> Dict:
         """Extract components from a spoken address for intelligent matching"""
-        import re
-        
-        address_lower = address.lower().strip()
-        
-        # Extract numbers
-        numbers = re.findall(r'\b\d+\b', address)
-        
-        # Extract words (excluding common filler words)
-        filler_words = {'i', 'think', 'its', 'it\'s', 'the', 'a', 'an', 'is', 'was', 'that', 'this'}
-        words = [word for word in re.findall(r'\b[a-zA-Z]+\b', address_lower) if word not in filler_words]
-        
-        # Extract street-specific words (excluding directional and type words)
-        directional_words = {'north', 'south', 'east', 'west', 'n', 's', 'e', 'w'}
-        type_words = {'street', 'avenue', 'ave', 'road', 'rd', 'lane', 'ln', 'drive', 'dr', 'blvd', 'boulevard'}
-        street_words = [word for word in words if word not in directional_words and word not in type_words]
-        
-        return {
-            'numbers': numbers,
-            'words': words,
-            'street_words': street_words,
-            'has_richmond': 'richmond' in address_lower,
-            'has_port': 'port' in address_lower,
-            'has_targee': 'targee' in address_lower,
-            'original': address
-        }
-
-    def _calculate_match_score(self, street_info: Dict, property_name: str) -> float:
-        """Calculate intelligent match score with numerical proximity for addresses"""
-        score = 0.0
-        prop_lower = property_name.lower()
-        
-        # ENHANCED: Numerical proximity scoring (most important for addresses)
-        import re
-        user_numbers = [int(n) for n in street_info['numbers']]
-        prop_numbers = [int(match) for match in re.findall(r'\b\d+\b', prop_lower)]
-        
-        best_number_score = 0.0
-        if user_numbers and prop_numbers:
-            # Find closest numerical match
-            for user_num in user_numbers:
-                for prop_num in prop_numbers:
-                    difference = abs(user_num - prop_num)
-                    if difference == 0:
-                        # Exact match - highest score
-                        best_number_score = max(best_number_score, 10.0)
-                    elif difference <= 2:
-                        # Very close (within 2 numbers)
-                        best_number_score = max(best_number_score, 8.0)
-                    elif difference <= 5:
-                        # Close (within 5 numbers)
-                        best_number_score = max(best_number_score, 6.0)
-                    elif difference <= 10:
-                        # Moderately close (within 10 numbers)
-                        best_number_score = max(best_number_score, 4.0)
-                    elif difference <= 20:
-                        # Somewhat close (within 20 numbers)
-                        best_number_score = max(best_number_score, 2.0)
-                    # Numbers >20 apart get 0 points
-        
-        score += best_number_score
-        
-        # Street word matches
-        for word in street_info['street_words']:
-            if word in prop_lower:
-                score += 2.0 if len(word) > 4 else 1.0
-        
-        # Geographic area matching - prioritize similar areas
-        if street_info['has_richmond'] and 'richmond' in prop_lower:
-            score += 3.0  # Higher weight for same street area
-        if street_info['has_port'] and 'port' in prop_lower:
-            score += 2.5  # Port Richmond area
-        
-        # PENALTY for unrelated areas - don't suggest Targee for Richmond addresses
-        if (street_info['has_richmond'] or street_info['has_port']) and 'targee' in prop_lower:
-            score -= 10.0  # Strong penalty for different geographic areas
-        
-        if street_info['has_targee'] and 'targee' in prop_lower:
-            score += 3.0  # Match Targee area
-        
-        # Bonus for multiple word matches within same geographic area
-        word_matches = sum(1 for word in street_info['words'] if word in prop_lower)
-        if word_matches >= 2:
-            score += 1.5
-        
-        return score
+        return extract_street_components(address)
 
     async def get_suggested_addresses(self, spoken_address: str, limit: int = 3) -> List[str]:
         """Get suggested addresses when exact match not found"""
@@ -217,23 +151,51 @@ class AddressMatcher:
             if not self.cache_loaded:
                 await self.load_properties()
             
-            if not self.properties_cache:
+            index = self.index
+            properties = index.properties
+            if not properties:
                 return []
             
             street_info = self._extract_street_components(spoken_address)
-            suggestions = []
-            
-            for prop in self.properties_cache:
-                prop_name = prop.get('Name', '')
-                if prop_name:
-                    score = self._calculate_match_score(street_info, prop_name)
-                    if score > 0:
-                        suggestions.append((score, prop_name))
+            scores = index.score_candidates(street_info)
             
             # Sort by score and return top suggestions
-            suggestions.sort(reverse=True, key=lambda x: x[0])
-            return [name for score, name in suggestions[:limit] if score > 0]
+            ranked = sorted(scores, key=lambda p: (-scores[p], p))
+            names = [properties[p].get('Name', '') for p in ranked]
+            return [name for name in names if name][:limit]
             
         except Exception as e:
             logger.error(f"Error getting address suggestions: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    async def resolve_addresses_batch(self, spoken_addresses: List[str], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+        """
+        Resolve many spoken addresses (N-best STT alternates, transcript backlogs) in one pass.
+        Returns ranked top-k candidates per address; the first is what find_matching_property picks.
+        """
+        try:
+            if not self.cache_loaded:
+                await self.load_properties()
+            
+            index = self.index
+            properties = index.properties
+            if not properties:
+                return [[] for _ in spoken_addresses]
+            
+            batch = index.resolve_batch(spoken_addresses, top_k)
+            return [
+                [
+                    {
+                        'property': properties[position],
+                        'name': properties[position].get('Name', ''),
+                        'score': score,
+                        'match_type': match_type
+                    }
+                    for match_type, score, position in ranked
+                ]
+                for ranked in batch
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error resolving address batch: {e}")
+            return [[] for _ in spoken_addresses]
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Shared Async Runtime
+One long-lived asyncio event loop per worker process, running on a daemon thread
+Long-lived async clients (aiohttp sessions, etc.) are bound to this loop
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the worker's shared event loop, starting it on first use (and after a fork)"""
+    global _loop, _loop_pid
+    if _loop is not None and _loop_pid == os.getpid() and _loop.is_running():
+        return _loop
+
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid() or not _loop.is_running():
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run, name="async-runtime", daemon=True)
+            thread.start()
+            started.wait()
+            _loop = loop
+            _loop_pid = os.getpid()
+            logger.info(f"🔁 Shared async runtime started (pid {_loop_pid})")
+    return _loop
+
+
+def in_runtime_loop() -> bool:
+    """True when called from a coroutine already running on the shared loop"""
+    try:
+        return asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        return False
+
+
+def submit(coro: Awaitable) -> Future:
+    """Schedule a coroutine on the shared loop from any thread"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared loop and block the calling (sync) thread for its result"""
+    return submit(coro).result(timeout)
+
+
+async def run_in_runtime(coro: Awaitable) -> Any:
+    """Await a coroutine on the shared loop from any other event loop"""
+    if in_runtime_loop():
+        return await coro
+    return await asyncio.wrap_future(submit(coro))
@@ -0,0 +1,230 @@
+"""
+Per-Call Audio Registry
+Short content-hash handles for Chris's replies, synthesized (streamed) the moment they are registered
+/generate-audio/<call_sid>/<audio_id> serves the ready clip, relays an in-flight one chunk by chunk,
+or falls back to the shared TTS cache - repeat fetches never reach ElevenLabs twice, and a fetch on
+another worker waits on the cache's key lock for the clip the registering worker is streaming
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from typing import Dict, Any, Iterator, List, Optional, NamedTuple
+
+from twiml_renderer import audio_id_for, get_audio_text_store
+
+logger = logging.getLogger(__name__)
+
+AUDIO_SYNTHESIS_WORKERS = int(os.environ.get('AUDIO_SYNTHESIS_WORKERS', '4'))
+AUDIO_FETCH_TIMEOUT = float(os.environ.get('AUDIO_FETCH_TIMEOUT', '15'))
+AUDIO_HANDLE_TTL_SECONDS = int(os.environ.get('AUDIO_HANDLE_TTL_SECONDS', '1800'))
+
+
+class ClipStream:
+    """MP3 chunks of an in-flight streamed synthesis, replayed from the start to every fetch that follows it"""
+    __slots__ = ('chunks', 'streaming', 'done', '_cond')
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.streaming = False
+        self.done = False
+        self._cond = threading.Condition()
+
+    def start(self):
+        with self._cond:
+            self.streaming = True
+            self._cond.notify_all()
+
+    def add(self, chunk: bytes):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def wait_started(self, timeout: float) -> bool:
+        """True once the stream is open, False if synthesis finished (or timed out) without one"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.streaming or self.done, timeout)
+            return self.streaming
+
+    def follow(self, timeout: float) -> Iterator[bytes]:
+        index = 0
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: index < len(self.chunks) or self.done, timeout):
+                    logger.warning(f"⏰ Streamed clip stalled after {index} chunks")
+                    return
+                pending = self.chunks[index:]
+            if not pending:
+                return
+            index += len(pending)
+            yield from pending
+
+
+class AudioHandle(NamedTuple):
+    audio_id: str
+    text: str
+    future: Future
+    clip: ClipStream
+    created: float
+
+
+class CallAudioRegistry:
+    """
+    call_sid -> {audio_id: AudioHandle}.
+    - register() persists the text (so any worker can resolve the ID) and submits synthesis,
+      streamed through a ClipStream when ELEVENLABS_STREAM_AUDIO is on
+    - stream() relays a clip that is still arriving, so the fetch does not wait for the whole file
+    - resolve() returns the clip path: finished future, awaited in-flight future, or - when the
+      fetch lands on another worker - the shared cache's single-flight synthesis, which waits on
+      the key lock the registering worker holds while it streams
+    - Handles are dropped on call end, or after AUDIO_HANDLE_TTL_SECONDS for calls that never end cleanly
+    """
+
+    def __init__(self, max_workers: int = AUDIO_SYNTHESIS_WORKERS, ttl_seconds: int = AUDIO_HANDLE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.calls: Dict[str, Dict[str, AudioHandle]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-synth")
+        self.metrics = {'registered': 0, 'reused': 0, 'served_ready': 0, 'served_waited': 0,
+                        'served_streamed': 0, 'served_remote': 0, 'fetch_timeouts': 0, 'expired': 0}
+
+    @staticmethod
+    def _synthesize(text: str, clip: Optional[ClipStream] = None) -> Optional[str]:
+        from elevenlabs_integration import (ELEVENLABS_STREAM_AUDIO, audio_cache_key, audio_cache_path,
+                                            generate_elevenlabs_audio, get_cached_audio, stream_elevenlabs_audio)
+        from tts_audio_cache import get_tts_cache
+        try:
+            cached_file = get_cached_audio(text, voice_name="adam")
+            if cached_file:
+                return cached_file
+            if clip and ELEVENLABS_STREAM_AUDIO:
+                path = audio_cache_path(text, voice_name="adam")
+                # Held for the whole stream, so fetches on other workers wait for this file
+                # instead of starting a second synthesis of the same clip
+                with get_tts_cache().key_lock(audio_cache_key(text, voice_name="adam")):
+                    if os.path.exists(path):
+                        return path
+                    audio_stream = stream_elevenlabs_audio(text, voice_name="adam")
+                    if audio_stream is not None:
+                        clip.start()
+                        try:
+                            for chunk in audio_stream:
+                                clip.add(chunk)
+                        except Exception as e:
+                            logger.error(f"❌ ElevenLabs stream broke mid-clip: {e}")
+                        # The relay tees a completed clip into the cache
+                        if os.path.exists(path):
+                            return path
+            # Outside the key lock - get_or_create() takes it again
+            return generate_elevenlabs_audio(text, voice_name="adam")
+        finally:
+            if clip:
+                clip.finish()
+
+    def register(self, call_sid: str, text: str) -> str:
+        """Assign text its short ID for this call and start synthesis right away"""
+        audio_id = get_audio_text_store().put(text)
+        with self._lock:
+            handles = self.calls.setdefault(call_sid, {})
+            if audio_id in handles:
+                self.metrics['reused'] += 1
+                return audio_id
+            clip = ClipStream()
+            handles[audio_id] = AudioHandle(audio_id, text, self._executor.submit(self._synthesize, text, clip),
+                                            clip, time.time())
+            self.metrics['registered'] += 1
+        self._expire_stale()
+        return audio_id
+
+    def stream(self, call_sid: str, audio_id: str, timeout: float = AUDIO_FETCH_TIMEOUT) -> Optional[Iterator[bytes]]:
+        """
+        MP3 chunks for a clip this worker is still streaming from ElevenLabs.
+        None when the clip is ready, only whole-file synthesis is available, or the clip was
+        registered by another worker - use resolve() then.
+        """
+        with self._lock:
+            handle = self.calls.get(call_sid, {}).get(audio_id)
+
+        if handle is not None:
+            if handle.future.done() or not handle.clip.wait_started(timeout):
+                return None
+            self._count('served_streamed')
+            return handle.clip.follow(timeout)
+
+        # Registered by another worker, which may still be streaming it - resolve() waits for its file
+        return None
+
+    def resolve(self, call_sid: str, audio_id: str, timeout: float = AUDIO_FETCH_TIMEOUT) -> Optional[str]:
+        """Path of the synthesized clip, or None if unknown / failed / timed out"""
+        with self._lock:
+            handle = self.calls.get(call_sid, {}).get(audio_id)
+
+        if handle is not None:
+            ready = handle.future.done()
+            try:
+                path = handle.future.result(timeout=timeout)
+            except FutureTimeout:
+                self._count('fetch_timeouts')
+                logger.warning(f"⏰ Audio {audio_id} for {call_sid} not ready after {timeout:.1f}s")
+                return None
+            except Exception as e:
+                logger.error(f"❌ Audio synthesis failed for {audio_id}: {e}")
+                return None
+            if path and os.path.exists(path):
+                self._count('served_ready' if ready else 'served_waited')
+                return path
+
+        # Registered by another worker (or synthesis failed here) - the shared cache takes it from here
+        text = get_audio_text_store().get(audio_id)
+        if not text or audio_id_for(text) != audio_id:
+            return None
+        path = self._synthesize(text)
+        if path:
+            self._count('served_remote')
+        return path
+
+    def discard_call(self, call_sid: str) -> int:
+        with self._lock:
+            return len(self.calls.pop(call_sid, {}))
+
+    def _expire_stale(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            stale = [call_sid for call_sid, handles in self.calls.items()
+                     if handles and max(h.created for h in handles.values()) < cutoff]
+            for call_sid in stale:
+                del self.calls[call_sid]
+            self.metrics['expired'] += len(stale)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['active_calls'] = len(self.calls)
+            metrics['handles'] = sum(len(handles) for handles in self.calls.values())
+            metrics['synthesizing'] = sum(1 for handles in self.calls.values()
+                                          for h in handles.values() if not h.future.done())
+        return metrics
+
+
+_call_audio_registry: Optional[CallAudioRegistry] = None
+_call_audio_registry_lock = threading.Lock()
+
+
+def get_call_audio_registry() -> CallAudioRegistry:
+    global _call_audio_registry
+    if _call_audio_registry is None:
+        with _call_audio_registry_lock:
+            if _call_audio_registry is None:
+                _call_audio_registry = CallAudioRegistry()
+    return _call_audio_registry
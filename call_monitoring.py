@@ -7,6 +7,7 @@ import os
 import json
 import time
 import logging
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Optional
 import requests
@@ -14,12 +15,15 @@ from flask_socketio import emit
 
 logger = logging.getLogger(__name__)
 
+CALL_MONITOR_HISTORY = int(os.environ.get('CALL_MONITOR_HISTORY', '200'))
+
 class CallMonitor:
     """Manages real-time call monitoring, recording, and transcription"""
     
     def __init__(self):
         self.active_calls = {}  # call_sid -> call_info
-        self.call_history = []  # Historical call records
+        # Recent ended calls only; the full history lives in the SQL call store
+        self.call_history = deque(maxlen=CALL_MONITOR_HISTORY)
         self.transcription_buffer = {}  # call_sid -> transcription_segments
         
     def start_call_monitoring(self, call_sid: str, from_number: str, to_number: str):
@@ -125,7 +129,14 @@ class CallMonitor:
         return list(self.active_calls.values())
         
     def get_call_history(self, limit: int = 50) -> List[Dict]:
-        """Get recent call history"""
+        """Get recent call history (from the SQL call store when it is available)"""
+        from call_repository import get_call_repository
+        call_repository = get_call_repository()
+        if call_repository:
+            try:
+                return call_repository.recent_calls(limit=limit)
+            except Exception as e:
+                logger.error(f"Call store history lookup failed: {e}")
         return sorted(self.call_history, key=lambda x: x['start_time'], reverse=True)[:limit]
         
     def get_call_details(self, call_sid: str) -> Optional[Dict]:
@@ -139,12 +150,19 @@ class CallMonitor:
         for call in self.call_history:
             if call['call_sid'] == call_sid:
                 return call
-                
+        
+        from call_repository import get_call_repository
+        call_repository = get_call_repository()
+        if call_repository:
+            try:
+                return call_repository.get_call(call_sid)
+            except Exception as e:
+                logger.error(f"Call store lookup failed for {call_sid}: {e}")
         return None
         
     def search_calls(self, query: str = None, date_range: tuple = None) -> List[Dict]:
         """Search calls by various criteria"""
-        all_calls = self.call_history + list(self.active_calls.values())
+        all_calls = list(self.call_history) + list(self.active_calls.values())
         
         if not query and not date_range:
             return all_calls
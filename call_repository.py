@@ -0,0 +1,389 @@
+"""
+SQL Call Repository
+Persists call lifecycle and conversation turns into the CallRecord / ActiveCall / CallTurn tables
+Webhooks only enqueue; a background writer flushes batches through the pooled SQLAlchemy engine,
+so every gunicorn worker reads the same calls and in-process history stays small
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from sqlalchemy import insert, select, delete, update, func, or_
+
+from models import db, CallRecord, ActiveCall, CallTurn
+
+logger = logging.getLogger(__name__)
+
+CALL_DB_POOL_SIZE = int(os.environ.get('CALL_DB_POOL_SIZE', '5'))
+CALL_DB_MAX_OVERFLOW = int(os.environ.get('CALL_DB_MAX_OVERFLOW', '10'))
+CALL_STORE_BATCH_SIZE = int(os.environ.get('CALL_STORE_BATCH_SIZE', '100'))
+CALL_STORE_FLUSH_SECONDS = float(os.environ.get('CALL_STORE_FLUSH_SECONDS', '0.5'))
+CALL_STORE_MAX_QUEUE = int(os.environ.get('CALL_STORE_MAX_QUEUE', '20000'))
+CALL_STORE_END_RETRY_SECONDS = float(os.environ.get('CALL_STORE_END_RETRY_SECONDS', '10'))
+
+
+def parse_timestamp(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return datetime.now()
+
+
+def configure_database(app):
+    """Database URL and connection pool settings (Postgres via DATABASE_URL, SQLite for development)"""
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        app.config.setdefault("SQLALCHEMY_DATABASE_URI", database_url)
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {
+            "pool_size": CALL_DB_POOL_SIZE,
+            "max_overflow": CALL_DB_MAX_OVERFLOW,
+            "pool_recycle": 300,
+            "pool_pre_ping": True,
+        })
+    else:
+        # Fallback for development without database
+        app.config.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///calls.db")
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {"pool_pre_ping": True})
+
+
+class CallRepository:
+    """
+    Call persistence for the webhooks.
+    - sync_call() enqueues only turns not yet queued (same contract as TranscriptJournal.sync_call)
+      and never touches the database; the writer seeds a call's numbering from the stored turns,
+      and (call_sid, seq) is unique, so a turn queued twice is written once
+    - discard_call() forgets a call's count when it leaves memory; a history rebuilt after that
+      is numbered after the stored turns
+    - The first turn of a call creates its CallRecord and ActiveCall rows
+    - end_call() closes the CallRecord (end time, duration, transcription) and drops the ActiveCall;
+      an end whose CallRecord is still queued on another worker is retried for END_RETRY_SECONDS
+    - The writer flushes every batch_size operations or flush_seconds in one transaction,
+      inserting turns with a single executemany
+    """
+
+    def __init__(self, app, batch_size: int = CALL_STORE_BATCH_SIZE,
+                 flush_seconds: float = CALL_STORE_FLUSH_SECONDS, max_queue: int = CALL_STORE_MAX_QUEUE):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+
+        self.persisted_counts: Dict[str, int] = {}
+        # Writer thread only: stored turns that precede each in-memory history, and ends still waiting
+        # for their CallRecord
+        self.seq_bases: Dict[str, int] = {}
+        self._pending_ends: List[Tuple] = []
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple]" = queue.Queue(maxsize=max_queue)
+        self.metrics = {'turns_queued': 0, 'turns_written': 0, 'calls_started': 0, 'calls_ended': 0,
+                        'batches': 0, 'dropped': 0, 'errors': 0, 'last_flush_ms': 0.0}
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+
+    # ------------------------------------------------------------------
+    # Call path
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, operation: Tuple) -> bool:
+        try:
+            self._queue.put_nowait(operation)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.metrics['dropped'] += 1
+            logger.warning(f"⚠️ Call store queue full - dropped {operation[0]} for {operation[1]}")
+            return False
+
+    def sync_call(self, call_sid: str, turns: List[Dict[str, Any]]) -> int:
+        """Queue turns not yet persisted for this call; returns how many were queued"""
+        with self._lock:
+            persisted = self.persisted_counts.get(call_sid, 0)
+            new_turns = turns[persisted:]
+            if not new_turns:
+                return 0
+            self.persisted_counts[call_sid] = len(turns)
+            self.metrics['turns_queued'] += len(new_turns)
+
+        # seq is the position in this worker's history; the writer shifts it past any stored turns
+        rows = [{
+            'call_sid': call_sid,
+            'seq': persisted + offset,
+            'speaker': str(turn.get('speaker', 'Unknown'))[:20],
+            'message': turn.get('message', '') or '',
+            'timestamp': parse_timestamp(turn.get('timestamp'))
+        } for offset, turn in enumerate(new_turns)]
+        phone_number = next((t.get('caller_phone') for t in turns if t.get('caller_phone')), None) or 'Unknown'
+        self._enqueue(('turns', call_sid, phone_number[:20], len(turns), rows))
+        return len(rows)
+
+    def end_call(self, call_sid: str, status: str = 'completed', summary: Optional[str] = None):
+        # persisted_counts is kept: a sync after hang-up must still skip the turns already written
+        self._enqueue(('end', call_sid, status, summary, datetime.now(), time.time() + CALL_STORE_END_RETRY_SECONDS))
+
+    def discard_call(self, call_sid: str):
+        """Forget the call's counts once its history has left memory (call-session teardown)"""
+        with self._lock:
+            self.persisted_counts.pop(call_sid, None)
+        # The writer drops its sequence base in queue order, after the turns queued before it
+        self._enqueue(('discard', call_sid))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is committed (shutdown and scripts)"""
+        deadline = time.time() + timeout
+        while (self._queue.unfinished_tasks or self._pending_ends) and time.time() < deadline:
+            time.sleep(0.01)
+        return not (self._queue.unfinished_tasks or self._pending_ends)
+
+    # ------------------------------------------------------------------
+    # Writer
+    # ------------------------------------------------------------------
+
+    def _writer_loop(self):
+        while True:
+            try:
+                # Ends waiting for their CallRecord are retried every flush interval, even when idle
+                batch = [self._queue.get(timeout=self.flush_seconds if self._pending_ends else None)]
+            except queue.Empty:
+                batch = []
+            deadline = time.time() + self.flush_seconds
+            while batch and len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            retry_ends, self._pending_ends = self._pending_ends, []
+            try:
+                with self.app.app_context():
+                    self._write_batch(batch, retry_ends)
+            except Exception as e:
+                with self._lock:
+                    self.metrics['errors'] += 1
+                logger.error(f"❌ Error writing call store batch: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _stored_counts(self, call_sids: List[str]) -> Dict[str, int]:
+        """Turns already in the table per call (written by another worker or before a restart)"""
+        if not call_sids:
+            return {}
+        last_seqs = db.session.execute(
+            select(CallTurn.call_sid, func.max(CallTurn.seq)).where(CallTurn.call_sid.in_(call_sids))
+            .group_by(CallTurn.call_sid)
+        ).all()
+        return {call_sid: last_seq + 1 for call_sid, last_seq in last_seqs if last_seq is not None}
+
+    def _write_batch(self, batch: List[Tuple], retry_ends: List[Tuple]):
+        started = time.time()
+        session = db.session
+        turn_rows: List[Dict[str, Any]] = []
+        phones: Dict[str, str] = {}
+        first_seen: Dict[str, datetime] = {}
+        ends = list(retry_ends)
+        stored_counts = self._stored_counts(list({op[1] for op in batch if op[0] == 'turns'}))
+
+        for operation in batch:
+            if operation[0] == 'turns':
+                _, call_sid, phone_number, history_len, rows = operation
+                stored = stored_counts.get(call_sid, 0)
+                base = self.seq_bases.get(call_sid)
+                if base is None:
+                    # The history either already holds the stored turns, or restarted after the call left memory
+                    base = 0 if history_len >= stored else stored
+                    self.seq_bases[call_sid] = base
+                if base == 0:
+                    rows = [row for row in rows if row['seq'] >= stored]  # already written by another worker
+                rows = [dict(row, seq=row['seq'] + base) for row in rows]
+                if not rows:
+                    continue
+                turn_rows.extend(rows)
+                stored_counts[call_sid] = max(stored, rows[-1]['seq'] + 1)
+                phones[call_sid] = phone_number
+                first_seen.setdefault(call_sid, rows[0]['timestamp'])
+            elif operation[0] == 'end':
+                ends.append(operation[1:])
+            elif operation[0] == 'discard':
+                self.seq_bases.pop(operation[1], None)
+
+        try:
+            started_calls = 0
+            ended_calls = 0
+            if phones:
+                known = set(session.execute(
+                    select(CallRecord.call_sid).where(CallRecord.call_sid.in_(list(phones)))
+                ).scalars())
+                new_calls = [call_sid for call_sid in phones if call_sid not in known]
+                if new_calls:
+                    # Another worker may open the same call concurrently - first insert wins
+                    session.execute(self._insert_ignore(CallRecord), [
+                        {'call_sid': sid, 'phone_number': phones[sid], 'start_time': first_seen[sid], 'call_status': 'active'}
+                        for sid in new_calls
+                    ])
+                    session.execute(self._insert_ignore(ActiveCall), [
+                        {'call_sid': sid, 'phone_number': phones[sid], 'start_time': first_seen[sid],
+                         'last_activity': first_seen[sid], 'call_status': 'connected'}
+                        for sid in new_calls
+                    ])
+                    started_calls = len(new_calls)
+                session.execute(self._insert_ignore(CallTurn, ['call_sid', 'seq']), turn_rows)
+                session.execute(
+                    update(ActiveCall).where(ActiveCall.call_sid.in_(list(phones))).values(last_activity=datetime.now())
+                )
+
+            for end in ends:
+                call_sid, status, summary, end_time, give_up_at = end
+                record = session.execute(select(CallRecord).where(CallRecord.call_sid == call_sid)).scalar_one_or_none()
+                if record is None:
+                    if time.time() < give_up_at:
+                        # Its first turns may still be queued on another worker - retry next flush
+                        self._pending_ends.append(end)
+                    else:
+                        logger.warning(f"⚠️ No call record for ended call {call_sid} - dropping its active row")
+                        session.execute(delete(ActiveCall).where(ActiveCall.call_sid == call_sid))
+                    continue
+                turns = session.execute(
+                    select(CallTurn.speaker, CallTurn.message).where(CallTurn.call_sid == call_sid)
+                    .order_by(CallTurn.timestamp, CallTurn.id)
+                ).all()
+                record.end_time = end_time
+                record.duration = int((end_time - record.start_time).total_seconds()) if record.start_time else None
+                record.call_status = status
+                record.transcription = "\n".join(f"{speaker}: {message}" for speaker, message in turns)
+                if summary:
+                    record.conversation_summary = summary
+                session.execute(delete(ActiveCall).where(ActiveCall.call_sid == call_sid))
+                ended_calls += 1
+
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        with self._lock:
+            self.metrics['turns_written'] += len(turn_rows)
+            self.metrics['calls_started'] += started_calls
+            self.metrics['calls_ended'] += ended_calls
+            self.metrics['batches'] += 1
+            self.metrics['last_flush_ms'] = round((time.time() - started) * 1000, 2)
+
+    @staticmethod
+    def _insert_ignore(model, index_elements: Optional[List[str]] = None):
+        """INSERT that skips rows whose key (call_sid by default) already exists (Postgres and SQLite)"""
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            return insert(model)
+        return dialect_insert(model).on_conflict_do_nothing(index_elements=index_elements or ['call_sid'])
+
+    # ------------------------------------------------------------------
+    # Reading (any worker)
+    # ------------------------------------------------------------------
+
+    def get_turns(self, call_sid: str) -> List[Dict[str, Any]]:
+        with self.app.app_context():
+            turns = db.session.execute(
+                select(CallTurn).where(CallTurn.call_sid == call_sid).order_by(CallTurn.timestamp, CallTurn.id)
+            ).scalars()
+            return [turn.to_dict() for turn in turns]
+
+    def get_call(self, call_sid: str) -> Optional[Dict[str, Any]]:
+        with self.app.app_context():
+            record = db.session.execute(
+                select(CallRecord).where(CallRecord.call_sid == call_sid)
+            ).scalar_one_or_none()
+            return self._record_dict(record) if record else None
+
+    def recent_calls(self, limit: int = 50, before: Optional[datetime] = None,
+                     phone_number: Optional[str] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest calls first via the start_time / phone_number indexes"""
+        with self.app.app_context():
+            statement = select(CallRecord)
+            if before:
+                statement = statement.where(CallRecord.start_time < before)
+            if phone_number:
+                statement = statement.where(CallRecord.phone_number == phone_number)
+            if query:
+                pattern = f"%{query}%"
+                statement = statement.where(or_(CallRecord.transcription.ilike(pattern),
+                                                CallRecord.caller_name.ilike(pattern),
+                                                CallRecord.phone_number.ilike(pattern)))
+            records = db.session.execute(statement.order_by(CallRecord.start_time.desc()).limit(limit)).scalars()
+            return [self._record_dict(record) for record in records]
+
+    def active_calls(self) -> List[Dict[str, Any]]:
+        with self.app.app_context():
+            calls = db.session.execute(select(ActiveCall).order_by(ActiveCall.start_time.desc())).scalars()
+            return [{
+                'call_sid': call.call_sid,
+                'phone_number': call.phone_number,
+                'caller_name': call.caller_name,
+                'start_time': call.start_time.isoformat() if call.start_time else None,
+                'last_activity': call.last_activity.isoformat() if call.last_activity else None,
+                'call_status': call.call_status
+            } for call in calls]
+
+    @staticmethod
+    def _record_dict(record: CallRecord) -> Dict[str, Any]:
+        return {
+            'call_sid': record.call_sid,
+            'phone_number': record.phone_number,
+            'caller_name': record.caller_name,
+            'start_time': record.start_time.isoformat() if record.start_time else None,
+            'end_time': record.end_time.isoformat() if record.end_time else None,
+            'duration': record.duration,
+            'call_status': record.call_status,
+            'transcription': record.transcription,
+            'conversation_summary': record.conversation_summary
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['tracked_calls'] = len(self.persisted_counts)
+        metrics['queue_depth'] = self._queue.qsize()
+        with self.app.app_context():
+            metrics['pool'] = db.engine.pool.status()
+        return metrics
+
+
+_call_repository: Optional[CallRepository] = None
+_call_repository_lock = threading.Lock()
+
+
+def init_call_repository(app) -> CallRepository:
+    """Bind models to app, create tables/indexes, and start this worker's repository writer"""
+    global _call_repository
+    with _call_repository_lock:
+        if _call_repository is None:
+            configure_database(app)
+            db.init_app(app)
+            with app.app_context():
+                db.create_all()
+                # create_all() skips indexes added to tables that already exist
+                for table in (CallRecord.__table__, ActiveCall.__table__, CallTurn.__table__):
+                    for index in table.indexes:
+                        try:
+                            index.create(bind=db.engine, checkfirst=True)
+                        except Exception as e:
+                            # e.g. the unique turn index over a table that already holds duplicate turns
+                            logger.error(f"❌ Could not create index {index.name}: {e}")
+            _call_repository = CallRepository(app)
+            logger.info(f"🗄️ CALL STORE READY: {app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1]}")
+    return _call_repository
+
+
+def get_call_repository() -> Optional[CallRepository]:
+    """The worker's repository, or None before init_call_repository() has run"""
+    return _call_repository
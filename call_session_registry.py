@@ -0,0 +1,334 @@
+"""
+Call Session Registry
+One bounded home for per-call state across the conversation managers and webhooks
+Sessions expire after a TTL or by least-recent use, and ending a call tears every piece down at once
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, List, Any, Optional, Callable, Iterator, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CALL_SESSION_TTL_SECONDS = int(os.environ.get('CALL_SESSION_TTL_SECONDS', '3600'))
+CALL_SESSION_MAX = int(os.environ.get('CALL_SESSION_MAX', '500'))
+CALL_SESSION_SWEEP_SECONDS = int(os.environ.get('CALL_SESSION_SWEEP_SECONDS', '60'))
+
+_MISSING = object()
+
+
+class CallSession:
+    """All state for one call, keyed by namespace (e.g. 'openai.session_facts')"""
+    __slots__ = ('call_sid', 'created', 'last_seen', 'state')
+
+    def __init__(self, call_sid: str):
+        self.call_sid = call_sid
+        self.created = self.last_seen = time.time()
+        self.state: Dict[str, Any] = {}
+
+
+class CallStateMap(MutableMapping):
+    """
+    dict-compatible view of one namespace across sessions: call_sid -> value.
+    Drop-in replacement for the per-call `{}` attributes; reads and writes refresh the session.
+    """
+
+    def __init__(self, registry: "CallSessionRegistry", namespace: str):
+        self._registry = registry
+        self.namespace = namespace
+
+    def __getitem__(self, call_sid: str) -> Any:
+        value = self._registry._get(call_sid, self.namespace)
+        if value is _MISSING:
+            raise KeyError(call_sid)
+        return value
+
+    def __setitem__(self, call_sid: str, value: Any):
+        self._registry._set(call_sid, self.namespace, value)
+
+    def __delitem__(self, call_sid: str):
+        if self._registry._pop(call_sid, self.namespace) is _MISSING:
+            raise KeyError(call_sid)
+
+    def __contains__(self, call_sid: object) -> bool:
+        return self._registry._get(call_sid, self.namespace, touch=False) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._registry._keys(self.namespace))
+
+    def __len__(self) -> int:
+        return len(self._registry._keys(self.namespace))
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Snapshot of (call_sid, value); aggregate reads like this don't keep sessions alive"""
+        return self._registry._items(self.namespace)
+
+    def values(self) -> List[Any]:
+        return [value for _, value in self._registry._items(self.namespace)]
+
+    def __repr__(self) -> str:
+        return f"<CallStateMap {self.namespace}: {len(self)} calls>"
+
+
+class CallFlagSet:
+    """set-compatible view of one namespace: membership of call_sids (e.g. 'email already sent')"""
+
+    def __init__(self, registry: "CallSessionRegistry", namespace: str):
+        self._registry = registry
+        self.namespace = namespace
+
+    def add(self, call_sid: str):
+        self._registry._set(call_sid, self.namespace, True)
+
+    def discard(self, call_sid: str):
+        self._registry._pop(call_sid, self.namespace)
+
+    def __contains__(self, call_sid: object) -> bool:
+        return self._registry._get(call_sid, self.namespace, touch=False) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._registry._keys(self.namespace))
+
+    def __len__(self) -> int:
+        return len(self._registry._keys(self.namespace))
+
+
+class CallSessionRegistry:
+    """
+    call_sid -> CallSession, most recently used last.
+    - namespace()/flag_set() hand out dict/set views used in place of per-module dicts
+    - Sessions idle longer than ttl_seconds, or beyond max_sessions (least recently used first), are evicted
+    - end_call() and every eviction run the registered teardown hooks for that call, before the
+      session is removed, so hooks can still read the call's namespaces
+    - Hooks run outside the registry lock; an evicted session that is used again while its hooks
+      run is kept (reads made by the hooks themselves don't count as use)
+    - get_metrics() reports sessions, entries per namespace, approximate bytes and process RSS
+    """
+
+    def __init__(self, ttl_seconds: int = CALL_SESSION_TTL_SECONDS, max_sessions: int = CALL_SESSION_MAX,
+                 sweep_seconds: int = CALL_SESSION_SWEEP_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, CallSession]" = OrderedDict()
+        self._teardown_hooks: List[Callable[[str], Any]] = []
+        self._evicting: Set[str] = set()
+        self._tearing_down = threading.local()
+        self._lock = threading.RLock()
+        self.metrics = {'created': 0, 'ended': 0, 'expired': 0, 'evicted_lru': 0, 'teardown_errors': 0}
+
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_seconds,), daemon=True)
+        self._sweeper.start()
+
+    # ------------------------------------------------------------------
+    # Views and hooks
+    # ------------------------------------------------------------------
+
+    def namespace(self, name: str) -> CallStateMap:
+        return CallStateMap(self, name)
+
+    def flag_set(self, name: str) -> CallFlagSet:
+        return CallFlagSet(self, name)
+
+    def register_teardown(self, hook: Callable[[str], Any]):
+        """hook(call_sid) runs when the call ends or its session is evicted"""
+        with self._lock:
+            self._teardown_hooks.append(hook)
+
+    def touch(self, call_sid: str) -> CallSession:
+        """Mark a call as active (creating its session), e.g. when work is queued for it"""
+        with self._lock:
+            session = self._session(call_sid)
+            victims = self._claim_over_capacity()
+        self._evict(victims, 'evicted_lru')
+        return session
+
+    # ------------------------------------------------------------------
+    # Namespace access (used by the views)
+    # ------------------------------------------------------------------
+
+    def _session(self, call_sid: str) -> CallSession:
+        """Called with the lock held; the caller evicts _claim_over_capacity() after releasing it"""
+        session = self.sessions.get(call_sid)
+        if session is None:
+            session = self.sessions[call_sid] = CallSession(call_sid)
+            self.metrics['created'] += 1
+        else:
+            self._mark_used(call_sid, session)
+        return session
+
+    def _mark_used(self, call_sid: str, session: CallSession):
+        if not getattr(self._tearing_down, 'active', False):
+            session.last_seen = time.time()
+            self.sessions.move_to_end(call_sid)
+
+    def _get(self, call_sid, namespace: str, touch: bool = True) -> Any:
+        with self._lock:
+            session = self.sessions.get(call_sid)
+            if session is None:
+                return _MISSING
+            if touch:
+                self._mark_used(call_sid, session)
+            return session.state.get(namespace, _MISSING)
+
+    def _set(self, call_sid: str, namespace: str, value: Any):
+        with self._lock:
+            self._session(call_sid).state[namespace] = value
+            victims = self._claim_over_capacity()
+        self._evict(victims, 'evicted_lru')
+
+    def _pop(self, call_sid, namespace: str) -> Any:
+        with self._lock:
+            session = self.sessions.get(call_sid)
+            if session is None:
+                return _MISSING
+            return session.state.pop(namespace, _MISSING)
+
+    def _keys(self, namespace: str) -> List[str]:
+        with self._lock:
+            return [call_sid for call_sid, session in self.sessions.items() if namespace in session.state]
+
+    def _items(self, namespace: str) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return [(call_sid, session.state[namespace]) for call_sid, session in self.sessions.items()
+                    if namespace in session.state]
+
+    # ------------------------------------------------------------------
+    # Teardown and eviction
+    # ------------------------------------------------------------------
+
+    def end_call(self, call_sid: str) -> bool:
+        """Explicit end-of-call teardown: run every hook, then drop the session"""
+        self._run_teardown(call_sid)
+        with self._lock:
+            existed = self.sessions.pop(call_sid, None) is not None
+            self.metrics['ended'] += 1
+        if existed:
+            logger.info(f"🧹 CALL SESSION ENDED: {call_sid} ({len(self.sessions)} active)")
+        return existed
+
+    def _run_teardown(self, call_sid: str):
+        with self._lock:
+            hooks = list(self._teardown_hooks)
+        self._tearing_down.active = True
+        try:
+            for hook in hooks:
+                try:
+                    hook(call_sid)
+                except Exception as e:
+                    with self._lock:
+                        self.metrics['teardown_errors'] += 1
+                    logger.error(f"Error tearing down call {call_sid}: {e}")
+        finally:
+            self._tearing_down.active = False
+
+    def _claim_over_capacity(self) -> List[Tuple[str, float]]:
+        """Called with the lock held: least recently used sessions beyond max_sessions, with their last_seen"""
+        victims = []
+        for call_sid, session in self.sessions.items():
+            if len(self.sessions) - len(self._evicting) <= self.max_sessions:
+                break
+            if call_sid not in self._evicting:
+                self._evicting.add(call_sid)
+                victims.append((call_sid, session.last_seen))
+        return victims
+
+    def _evict(self, victims: List[Tuple[str, float]], metric: str) -> List[str]:
+        """Run hooks without the lock, then drop each session unless it was used in the meantime"""
+        evicted = []
+        for call_sid, last_seen in victims:
+            self._run_teardown(call_sid)
+            with self._lock:
+                self._evicting.discard(call_sid)
+                session = self.sessions.get(call_sid)
+                if session is not None and session.last_seen == last_seen:
+                    del self.sessions[call_sid]
+                    evicted.append(call_sid)
+        if evicted:
+            with self._lock:
+                self.metrics[metric] += len(evicted)
+        return evicted
+
+    def expire(self) -> int:
+        """Evict sessions idle longer than the TTL (oldest entries sit at the front)"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            victims = []
+            for call_sid, session in self.sessions.items():
+                if session.last_seen >= cutoff:
+                    break
+                if call_sid not in self._evicting:
+                    self._evicting.add(call_sid)
+                    victims.append((call_sid, session.last_seen))
+        expired = self._evict(victims, 'expired')
+        if expired:
+            logger.info(f"🧹 CALL SESSIONS EXPIRED: {len(expired)} idle calls ({len(self.sessions)} active)")
+        return len(expired)
+
+    def _sweep_loop(self, sweep_seconds: int):
+        while True:
+            time.sleep(sweep_seconds)
+            try:
+                self.expire()
+            except Exception as e:
+                logger.error(f"Error sweeping call sessions: {e}")
+
+    # ------------------------------------------------------------------
+    # Gauges
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _approx_size(value: Any) -> int:
+        size = sys.getsizeof(value)
+        if isinstance(value, dict):
+            size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+        elif isinstance(value, (list, tuple, set)):
+            size += sum(sys.getsizeof(item) for item in value)
+        return size
+
+    @staticmethod
+    def _rss_bytes() -> Optional[int]:
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces: Dict[str, Dict[str, int]] = {}
+            for session in self.sessions.values():
+                for name, value in session.state.items():
+                    gauge = namespaces.setdefault(name, {'calls': 0, 'approx_bytes': 0})
+                    gauge['calls'] += 1
+                    gauge['approx_bytes'] += self._approx_size(value)
+            oldest = next(iter(self.sessions.values()), None)
+            metrics = dict(self.metrics)
+            metrics.update({
+                'sessions': len(self.sessions),
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl_seconds,
+                'oldest_idle_seconds': round(time.time() - oldest.last_seen, 1) if oldest else 0.0,
+                'namespaces': namespaces,
+                'approx_bytes': sum(g['approx_bytes'] for g in namespaces.values())
+            })
+        metrics['rss_bytes'] = self._rss_bytes()
+        return metrics
+
+
+_call_sessions: Optional[CallSessionRegistry] = None
+_call_sessions_lock = threading.Lock()
+
+
+def get_call_sessions() -> CallSessionRegistry:
+    """The worker's single call-session registry"""
+    global _call_sessions
+    if _call_sessions is None:
+        with _call_sessions_lock:
+            if _call_sessions is None:
+                _call_sessions = CallSessionRegistry()
+    return _call_sessions
@@ -0,0 +1,286 @@
+"""
+Call Summary Store
+Precomputed per-call dashboard records in SQLite, indexed by start time, caller and issue type
+A call is summarized once when it changes (and finally at call end), never per dashboard poll,
+and the history endpoints page through the indexes with keyset cursors
+"""
+
+import os
+import json
+import base64
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+CALL_SUMMARY_DB = os.environ.get('CALL_SUMMARY_DB', 'call_summaries.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_summaries (
+    call_sid TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    caller_phone TEXT NOT NULL,
+    issue_type TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    history TEXT NOT NULL,
+    brief TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS call_summaries_started ON call_summaries (started_at, call_sid);
+CREATE INDEX IF NOT EXISTS call_summaries_phone ON call_summaries (caller_phone, started_at);
+CREATE INDEX IF NOT EXISTS call_summaries_issue ON call_summaries (issue_type, started_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+ISSUE_KEYWORDS = [
+    ("Electrical", ['electrical', 'electric', 'power', 'outlet', 'wiring']),
+    ("Plumbing", ['plumbing', 'water', 'sink', 'toilet', 'leak', 'drain']),
+    ("Heating", ['heat', 'heating', 'hot', 'cold', 'temperature', 'hvac']),
+    ("Maintenance", ['maintenance', 'repair', 'broken', 'fix']),
+]
+
+
+def classify_issue(transcript: str) -> str:
+    transcript_lower = transcript.lower()
+    for issue_type, words in ISSUE_KEYWORDS:
+        if any(word in transcript_lower for word in words):
+            return issue_type
+    return "General Inquiry"
+
+
+def summarize_call(call_sid: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Both dashboard views of one call: 'history' (/api/calls/history) and 'brief' (/api/call-history)"""
+    first = messages[0]
+    caller_phone = first.get('caller_phone', 'Unknown') or 'Unknown'
+    started_at = first.get('timestamp', '') or datetime.now().isoformat()
+
+    transcript_lines = []
+    brief_lines = []
+    caller_name = "Unknown Caller"
+    for msg in messages:
+        timestamp = msg.get('timestamp', '') or ''
+        speaker = msg.get('speaker', 'Unknown')
+        message = msg.get('message', '')
+        try:
+            time_str = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).strftime('[%H:%M:%S]')
+        except ValueError:
+            time_str = '[--:--:--]'
+        transcript_lines.append(f"{time_str} {speaker}: {message}")
+        brief_lines.append(f"[{timestamp[:19][-8:]}] {speaker}: {message}")
+
+        if caller_name == "Unknown Caller" and 'my name is' in (message or '').lower():
+            try:
+                caller_name = message.lower().split('my name is')[1].strip().split()[0].title()
+            except IndexError:
+                pass
+
+    full_transcript = "\n\n".join(transcript_lines)
+    issue_type = classify_issue(full_transcript)
+
+    eastern = pytz.timezone('US/Eastern')
+    try:
+        start_dt = datetime.fromisoformat(first['timestamp'].replace('Z', '+00:00'))
+        end_dt = datetime.fromisoformat(messages[-1]['timestamp'].replace('Z', '+00:00'))
+        duration_seconds = (end_dt - start_dt).total_seconds()
+        duration = f"{int(duration_seconds // 60)}:{int(duration_seconds % 60):02d}"
+        display_time = start_dt.astimezone(eastern).strftime('%B %d, %Y - %I:%M %p ET')
+    except Exception as e:
+        logger.error(f"Error calculating call duration: {e}")
+        duration = "0:00"
+        display_time = datetime.now(eastern).strftime('%B %d, %Y - %I:%M %p ET')
+
+    return {
+        'call_sid': call_sid,
+        'started_at': started_at,
+        'caller_phone': caller_phone,
+        'issue_type': issue_type,
+        'message_count': len(messages),
+        'history': {
+            'caller_name': caller_name,
+            'caller_phone': caller_phone,
+            'timestamp': display_time,
+            'issue_type': issue_type,
+            'duration': duration,
+            'service_ticket': "Completed",
+            'full_transcript': full_transcript,
+            'call_status': 'Completed'
+        },
+        'brief': {
+            'call_sid': call_sid,
+            'caller_phone': caller_phone,
+            'timestamp': started_at,
+            'message_count': len(messages),
+            'transcript': "\n".join(brief_lines),
+            'duration': 'Live Call',
+            'status': 'Completed'
+        }
+    }
+
+
+def encode_cursor(started_at: str, call_sid: str) -> str:
+    return base64.urlsafe_b64encode(f"{started_at}|{call_sid}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    started_at, call_sid = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+    return started_at, call_sid
+
+
+class CallSummaryStore:
+    """
+    Per-call dashboard summaries shared by every gunicorn worker.
+    - sync() summarizes only calls whose turn count changed since they were last stored
+    - record_call() writes the final summary at call end
+    - page() walks (started_at, call_sid) newest first with optional phone / issue / date filters
+    - version increases on every write and is the basis for the endpoints' ETags
+    """
+
+    def __init__(self, db_file: str = CALL_SUMMARY_DB):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # call_sid -> message count already summarized, so unchanged calls are skipped
+            self.summarized: Dict[str, int] = dict(
+                conn.execute("SELECT call_sid, message_count FROM call_summaries").fetchall()
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    @property
+    def version(self) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _write(self, summaries: List[Dict[str, Any]]) -> int:
+        if not summaries:
+            return 0
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                version = int(row[0]) + 1 if row else 1
+                conn.executemany(
+                    "INSERT OR REPLACE INTO call_summaries "
+                    "(call_sid, started_at, caller_phone, issue_type, message_count, version, history, brief) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(s['call_sid'], s['started_at'], s['caller_phone'], s['issue_type'], s['message_count'], version,
+                      json.dumps(s['history'], separators=(',', ':')), json.dumps(s['brief'], separators=(',', ':')))
+                     for s in summaries]
+                )
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(version),))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            for s in summaries:
+                self.summarized[s['call_sid']] = s['message_count']
+        return len(summaries)
+
+    def record_call(self, call_sid: str, messages: Optional[List[Dict[str, Any]]]) -> bool:
+        """Write the final summary for a finished call"""
+        if not messages:
+            return False
+        self._write([summarize_call(call_sid, messages)])
+        return True
+
+    def discard_call(self, call_sid: str):
+        """Stop tracking a call that has left memory (its stored summary stays)"""
+        with self._lock:
+            self.summarized.pop(call_sid, None)
+
+    def sync(self, conversations: Dict[str, List[Dict[str, Any]]]) -> int:
+        """Summarize calls that are new or have new turns since they were stored"""
+        changed = [summarize_call(call_sid, list(messages))
+                   for call_sid, messages in list(conversations.items())
+                   if messages and self.summarized.get(call_sid) != len(messages)]
+        written = self._write(changed)
+        if written:
+            logger.info(f"📇 CALL SUMMARIES UPDATED: {written} calls")
+        return written
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def page(self, view: str = 'history', limit: Optional[int] = None, cursor: Optional[str] = None,
+             caller_phone: Optional[str] = None, issue_type: Optional[str] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+        """One page of summaries, newest first; next_cursor is None on the last page"""
+        if view not in ('history', 'brief'):
+            raise ValueError(f"Unknown call summary view: {view}")
+
+        clauses, params = [], []
+        if caller_phone:
+            clauses.append("caller_phone = ?")
+            params.append(caller_phone)
+        if issue_type:
+            clauses.append("issue_type = ?")
+            params.append(issue_type)
+        if since:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("started_at < ?")
+            params.append(until)
+        filters = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        page_clauses, page_params = list(clauses), list(params)
+        if cursor:
+            started_at, call_sid = decode_cursor(cursor)
+            page_clauses.append("(started_at < ? OR (started_at = ? AND call_sid < ?))")
+            page_params.extend([started_at, started_at, call_sid])
+        where = f" WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+        sql = f"SELECT call_sid, started_at, {view} FROM call_summaries{where} ORDER BY started_at DESC, call_sid DESC"
+        if limit:
+            sql += " LIMIT ?"
+            page_params.append(limit + 1)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, page_params).fetchall()
+            total = conn.execute(f"SELECT COUNT(*) FROM call_summaries{filters}", params).fetchone()[0]
+
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return {
+            'items': [json.loads(record) for _, _, record in rows],
+            'total_count': total,
+            'next_cursor': next_cursor
+        }
+
+
+_call_summary_store: Optional[CallSummaryStore] = None
+_call_summary_store_lock = threading.Lock()
+
+
+def get_call_summary_store() -> CallSummaryStore:
+    global _call_summary_store
+    if _call_summary_store is None:
+        with _call_summary_store_lock:
+            if _call_summary_store is None:
+                _call_summary_store = CallSummaryStore()
+    return _call_summary_store
@@ -0,0 +1,144 @@
+"""
+Completion Registry for queued AI responses
+Per-call result slots that waiting request handlers block on with a condition variable
+Producers publish the moment work finishes - no monitor threads and no sleep/poll loops
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionRegistry:
+    """
+    call_sid -> result slot with wake-on-publish waiters.
+    - expect() opens a slot, publish() fills it and wakes every waiter immediately
+    - track() publishes a Future's (finalized) result from its done-callback
+    - wait() blocks the handler until the slot is filled or the timeout passes
+    - Queue depth, wait times and executor saturation are exported by get_metrics()
+    """
+
+    def __init__(self, name: str, max_workers: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Any] = {}
+        self._condition = threading.Condition()
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.metrics = {'published': 0, 'delivered': 0, 'timeouts': 0, 'total_wait': 0.0, 'max_wait': 0.0,
+                        'peak_in_flight': 0}
+
+    def expect(self, key: str, **meta) -> Dict[str, Any]:
+        """Open a slot for key (replacing any stale result) and return its metadata dict"""
+        with self._condition:
+            self.results.pop(key, None)
+            self.pending[key] = dict(meta, start_time=time.time())
+            return self.pending[key]
+
+    def publish(self, key: str, result: Any, slot: Optional[Dict[str, Any]] = None):
+        """Fill key's slot and wake its waiters; with slot given, a superseded slot is dropped"""
+        with self._condition:
+            if slot is not None and self.pending.get(key) is not slot:
+                return
+            self.results[key] = result
+            self.metrics['published'] += 1
+            self._condition.notify_all()
+
+    def track(self, key: str, future: Future, finalize: Callable[[Future], Any], **meta) -> Future:
+        """Publish finalize(future) under key as soon as the future completes"""
+        slot = self.expect(key, **meta)
+        with self._condition:
+            self.in_flight += 1
+            self.metrics['peak_in_flight'] = max(self.metrics['peak_in_flight'], self.in_flight)
+
+        def _done(done_future: Future):
+            try:
+                result = finalize(done_future)
+            except Exception as e:
+                logger.error(f"❌ {self.name}: finalizing {key} failed: {e}")
+                result = None
+            with self._condition:
+                self.in_flight -= 1
+            # A newer turn for the same key replaces the slot; late results are dropped
+            self.publish(key, result, slot)
+
+        future.add_done_callback(_done)
+        return future
+
+    def is_ready(self, key: str) -> bool:
+        with self._condition:
+            return key in self.results
+
+    def get_pending(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            return self.pending.get(key)
+
+    def wait(self, key: str, timeout: float, default: Any = None) -> Any:
+        """Block until key is published (then consume it) or timeout; returns default on timeout"""
+        started = time.time()
+        with self._condition:
+            self.waiting += 1
+            try:
+                ready = self._condition.wait_for(lambda: key in self.results, timeout)
+                waited = time.time() - started
+                self.metrics['total_wait'] += waited
+                self.metrics['max_wait'] = max(self.metrics['max_wait'], waited)
+                if not ready:
+                    self.metrics['timeouts'] += 1
+                    return default
+                self.metrics['delivered'] += 1
+                self.pending.pop(key, None)
+                return self.results.pop(key)
+            finally:
+                self.waiting -= 1
+
+    def discard(self, key: str):
+        with self._condition:
+            self.pending.pop(key, None)
+            self.results.pop(key, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            waits = self.metrics['delivered'] + self.metrics['timeouts']
+            metrics = {
+                'queue_depth': len(self.pending),
+                'ready': len(self.results),
+                'waiting_handlers': self.waiting,
+                'in_flight': self.in_flight,
+                'published': self.metrics['published'],
+                'delivered': self.metrics['delivered'],
+                'timeouts': self.metrics['timeouts'],
+                'avg_wait': round(self.metrics['total_wait'] / waits, 3) if waits else 0.0,
+                'max_wait': round(self.metrics['max_wait'], 3),
+                'peak_in_flight': self.metrics['peak_in_flight']
+            }
+        if self.max_workers:
+            metrics['max_workers'] = self.max_workers
+            metrics['pool_saturation'] = round(min(metrics['in_flight'] / self.max_workers, 1.0), 3)
+            metrics['pool_backlog'] = max(metrics['in_flight'] - self.max_workers, 0)
+        return metrics
+
+
+_registries: Dict[str, CompletionRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(name: str, max_workers: Optional[int] = None) -> CompletionRegistry:
+    """Process-wide named registry (created on first use)"""
+    with _registries_lock:
+        if name not in _registries:
+            _registries[name] = CompletionRegistry(name, max_workers)
+        return _registries[name]
+
+
+def get_all_metrics() -> Dict[str, Dict[str, Any]]:
+    with _registries_lock:
+        registries = list(_registries.values())
+    return {registry.name: registry.get_metrics() for registry in registries}
@@ -6,7 +6,8 @@ This serves as the ultimate backup when Rent Manager API is unavailable
 
 import json
 import logging
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,11 @@ def get_comprehensive_property_database() -> List[Dict[str, Any]]:
     This includes all known addresses with unit numbers and property details.
     Based on actual property portfolio - expanded from essential properties.
     """
+    return list(_comprehensive_properties())
+
+@lru_cache(maxsize=1)
+def _comprehensive_properties() -> Tuple[Dict[str, Any], ...]:
+    """Property literal built once per process (callers get their own list of the shared records)"""
     
     properties = [
         # Port Richmond Avenue Properties (29-45 range)
@@ -94,7 +100,7 @@ def get_comprehensive_property_database() -> List[Dict[str, Any]]:
     ]
     
     logger.info(f"📋 COMPREHENSIVE DATABASE: Loaded {len(properties)} properties with unit information")
-    return properties
+    return tuple(properties)
 
 def save_comprehensive_backup():
     """Save comprehensive property database to backup file"""
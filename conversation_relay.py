@@ -15,6 +15,7 @@ from datetime import datetime
 import aiohttp
 from rent_manager import RentManagerAPI
 from property_data import PropertyDataManager
+from turn_scheduler import get_turn_scheduler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -134,25 +135,30 @@ class ConversationRelayHandler:
         if user_text:
             logger.info(f"User said: {user_text}")
             
-            # Generate AI response
-            ai_response = await self.generate_ai_response(call_sid, user_text)
-            
-            if ai_response:
-                # Send response back to ConversationRelay
-                response_message = {
-                    "event": "response",
-                    "callSid": call_sid,
-                    "text": ai_response,
-                    "voice": {
-                        "provider": "elevenlabs",
-                        "voice_id": "pNInz6obpgDQGcFmaJgB",  # ElevenLabs Adam
-                        "model": "eleven_turbo_v2",
-                        "stability": 0.75,
-                        "similarity_boost": 0.8
-                    }
+            # Generate the reply as a cancellable turn, so an interrupt message can stop it
+            await get_turn_scheduler().run(
+                call_sid, lambda turn: self.respond(websocket, call_sid, user_text, turn))
+    
+    async def respond(self, websocket, call_sid, user_text, turn):
+        """Generate and send one reply (skipped if the caller interrupted while it was generated)"""
+        ai_response = await self.generate_ai_response(call_sid, user_text)
+        
+        if ai_response and not turn.cancelled:
+            # Send response back to ConversationRelay
+            response_message = {
+                "event": "response",
+                "callSid": call_sid,
+                "text": ai_response,
+                "voice": {
+                    "provider": "elevenlabs",
+                    "voice_id": "pNInz6obpgDQGcFmaJgB",  # ElevenLabs Adam
+                    "model": "eleven_turbo_v2",
+                    "stability": 0.75,
+                    "similarity_boost": 0.8
                 }
-                
-                await websocket.send(json.dumps(response_message))
+            }
+            
+            await websocket.send(json.dumps(response_message))
     
     async def generate_ai_response(self, call_sid, user_text):
         """Generate AI response using OpenAI with Mike's personality"""
@@ -222,8 +228,8 @@ If you can't help: Say you'll transfer them to Diane or Janier at (718) 414-6984
         call_sid = message.get('callSid')
         logger.info(f"User interrupted conversation: {call_sid}")
         
-        # Could implement interruption handling logic here
-        # For now, just acknowledge and continue
+        # ConversationRelay stops its own playback; cancel the reply still being generated
+        await get_turn_scheduler().barge_in(call_sid, reason='relay interrupt')
     
     async def handle_disconnected(self, websocket, message):
         """Handle conversation end"""
@@ -231,6 +237,7 @@ If you can't help: Say you'll transfer them to Diane or Janier at (718) 414-6984
         logger.info(f"Conversation ended: {call_sid}")
         
         # Clean up conversation data
+        get_turn_scheduler().drop(call_sid)
         if call_sid in self.conversation_history:
             del self.conversation_history[call_sid]
         if call_sid in self.caller_info:
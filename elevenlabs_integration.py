@@ -4,22 +4,16 @@ ElevenLabs Voice Generation Integration for Dimitry Junior AI
 
 import os
 import requests
-import tempfile
 import logging
 import time
-import hashlib
-from typing import Optional
-from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Iterator, Iterable
+from tts_audio_cache import get_tts_cache, make_cache_key
 
 logger = logging.getLogger(__name__)
 
 ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
 ELEVENLABS_BASE_URL = "https://api.elevenlabs.io/v1"
 
-# OPTIMIZED: Audio cache for performance
-audio_cache = OrderedDict()
-MAX_CACHE_SIZE = 100
-
 # Available male voices from our ElevenLabs account
 AVAILABLE_VOICES = {
     "adam": "pNInz6obpgDQGcFmaJgB",  # Professional American male
@@ -28,9 +22,57 @@ AVAILABLE_VOICES = {
     "antoni": "ErXwobaYiN019PkySvjV", # Young American male
 }
 
+# Synthesis parameters - all of these are part of the audio cache key
+TTS_MODEL_ID = "eleven_flash_v2_5"  # Flash model for more natural, conversational speech
+TTS_VOICE_SETTINGS = {
+    "stability": 0.5,         # Lower stability for more natural variation
+    "similarity_boost": 0.8,  # Higher similarity for consistent voice character
+    "style": 0.4,            # More style for natural conversation flow
+    "use_speaker_boost": True  # Enabled for clearer, more engaging speech
+}
+TTS_OUTPUT_FORMAT = "mp3_44100_128"  # Higher quality for better voice clarity
+
+# Relay ElevenLabs' streaming endpoint straight to Twilio instead of waiting for the whole clip
+ELEVENLABS_STREAM_AUDIO = os.environ.get("ELEVENLABS_STREAM_AUDIO", "true").lower() == "true"
+STREAM_CHUNK_SIZE = 4096
+
+def resolve_voice_id(voice_id: str = None, voice_name: str = "adam") -> str:
+    return voice_id or AVAILABLE_VOICES.get(voice_name, AVAILABLE_VOICES["adam"])
+
+def get_audio_cache_key(text: str, voice_id: str) -> str:
+    return make_cache_key(text, voice_id, TTS_MODEL_ID, TTS_VOICE_SETTINGS, TTS_OUTPUT_FORMAT)
+
+def _synthesize(text: str, voice_id: str) -> Optional[bytes]:
+    """Call ElevenLabs text-to-speech and return the MP3 bytes"""
+    url = f"{ELEVENLABS_BASE_URL}/text-to-speech/{voice_id}"
+    
+    headers = {
+        "Accept": "audio/mpeg",
+        "Content-Type": "application/json",
+        "xi-api-key": ELEVENLABS_API_KEY
+    }
+    
+    data = {
+        "text": text,
+        "model_id": TTS_MODEL_ID,
+        "voice_settings": TTS_VOICE_SETTINGS,
+        "output_format": TTS_OUTPUT_FORMAT,
+        "optimize_streaming_latency": 4   # Balance between quality and speed
+    }
+    
+    # OPTIMIZED: Reduced timeout for faster failure
+    response = requests.post(url, json=data, headers=headers, timeout=3)
+    
+    if response.status_code == 200:
+        return response.content
+    
+    logger.error(f"ElevenLabs API error: {response.status_code} - {response.text}")
+    return None
+
 def generate_elevenlabs_audio(text: str, voice_id: str = None, voice_name: str = "adam") -> Optional[str]:
     """
     OPTIMIZED audio generation with caching and timing
+    Audio is served from the persistent content-addressed cache shared by all workers
     """
     # ⏰ START ELEVENLABS TIMING
     elevenlabs_start = time.time()
@@ -39,22 +81,55 @@ def generate_elevenlabs_audio(text: str, voice_id: str = None, voice_name: str =
         logger.warning("ElevenLabs API key not available")
         return None
     
-    # Use voice_id if provided, otherwise get from voice_name
-    if not voice_id:
-        voice_id = AVAILABLE_VOICES.get(voice_name, AVAILABLE_VOICES["adam"])
+    voice_id = resolve_voice_id(voice_id, voice_name)
     
-    # Check cache first for performance
-    cache_key = hashlib.md5(f"{text}_{voice_id}".encode()).hexdigest()
-    if cache_key in audio_cache:
-        cached_path = audio_cache[cache_key]
-        cache_time = time.time() - elevenlabs_start
-        logger.info(f"[Timing] ElevenLabs cache hit: {cache_time:.3f} seconds")
-        # Move to end (most recently used)
-        audio_cache.move_to_end(cache_key)
-        return cached_path
+    try:
+        cache = get_tts_cache()
+        cache_key = get_audio_cache_key(text, voice_id)
+        
+        # Cache lookup and single-flight synthesis in one call (hit / miss counted once there);
+        # only one worker synthesizes a given phrase, the others wait and reuse its file
+        audio_path = cache.get_or_create(cache_key, lambda: _synthesize(text, voice_id))
+        
+        if audio_path:
+            # Log timing
+            generation_time = time.time() - elevenlabs_start
+            logger.info(f"[Timing] ElevenLabs generation: {generation_time:.3f} seconds")
+        return audio_path
+            
+    except Exception as e:
+        logger.error(f"Error generating ElevenLabs audio: {e}")
+        return None
+
+def get_cached_audio(text: str, voice_id: str = None, voice_name: str = "adam") -> Optional[str]:
+    """Cached audio path for text, without synthesizing on a miss"""
+    return get_tts_cache().get(get_audio_cache_key(text, resolve_voice_id(voice_id, voice_name)))
+
+def audio_cache_key(text: str, voice_id: str = None, voice_name: str = "adam") -> str:
+    """Shared-cache key for text, e.g. to hold its key_lock across a streamed synthesis"""
+    return get_audio_cache_key(text, resolve_voice_id(voice_id, voice_name))
+
+def audio_cache_path(text: str, voice_id: str = None, voice_name: str = "adam") -> str:
+    """Where the clip for text is (or will be) cached - a plain path, no lookup counted"""
+    return get_tts_cache().path_for(audio_cache_key(text, voice_id, voice_name))
+
+def stream_elevenlabs_audio(text: str, voice_id: str = None, voice_name: str = "adam") -> Optional[Iterator[bytes]]:
+    """
+    Open an ElevenLabs streaming synthesis and return an iterator of MP3 chunks.
+    Chunks are relayed as they arrive and teed into the persistent cache once the
+    clip completes, so the next request for the same text is a cache hit.
+    Returns None if the stream could not be opened (caller falls back to full synthesis).
+    """
+    stream_start = time.time()
+    
+    if not ELEVENLABS_API_KEY:
+        logger.warning("ElevenLabs API key not available")
+        return None
+    
+    voice_id = resolve_voice_id(voice_id, voice_name)
     
     try:
-        url = f"{ELEVENLABS_BASE_URL}/text-to-speech/{voice_id}"
+        url = f"{ELEVENLABS_BASE_URL}/text-to-speech/{voice_id}/stream"
         
         headers = {
             "Accept": "audio/mpeg",
@@ -64,49 +139,93 @@ def generate_elevenlabs_audio(text: str, voice_id: str = None, voice_name: str =
         
         data = {
             "text": text,
-            "model_id": "eleven_flash_v2_5",  # Flash model for more natural, conversational speech
-            "voice_settings": {
-                "stability": 0.5,         # Lower stability for more natural variation
-                "similarity_boost": 0.8,  # Higher similarity for consistent voice character
-                "style": 0.4,            # More style for natural conversation flow
-                "use_speaker_boost": True  # Enabled for clearer, more engaging speech
-            },
-            "output_format": "mp3_44100_128", # Higher quality for better voice clarity
-            "optimize_streaming_latency": 4   # Balance between quality and speed
+            "model_id": TTS_MODEL_ID,
+            "voice_settings": TTS_VOICE_SETTINGS,
+            "output_format": TTS_OUTPUT_FORMAT,
+            "optimize_streaming_latency": 4
         }
         
-        # OPTIMIZED: Reduced timeout for faster failure
-        response = requests.post(url, json=data, headers=headers, timeout=3)
-        
-        if response.status_code == 200:
-            # Save audio to temporary file and cache it
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as audio_file:
-                audio_file.write(response.content)
-                audio_path = audio_file.name
-                
-                # Cache the audio file path
-                if len(audio_cache) >= MAX_CACHE_SIZE:
-                    # Remove oldest entry
-                    oldest_key, oldest_path = audio_cache.popitem(last=False)
-                    try:
-                        os.unlink(oldest_path)  # Delete old file
-                    except:
-                        pass
-                
-                audio_cache[cache_key] = audio_path
-                
-                # Log timing
-                generation_time = time.time() - elevenlabs_start
-                logger.info(f"[Timing] ElevenLabs generation: {generation_time:.3f} seconds")
-                
-                return audio_path
-        else:
-            logger.error(f"ElevenLabs API error: {response.status_code} - {response.text}")
+        # Status is known before any bytes are relayed, so failures can still fall back
+        response = requests.post(url, json=data, headers=headers, stream=True, timeout=(3, 10))
+        if response.status_code != 200:
+            logger.error(f"ElevenLabs streaming API error: {response.status_code} - {response.text}")
+            response.close()
             return None
             
     except Exception as e:
-        logger.error(f"Error generating ElevenLabs audio: {e}")
+        logger.error(f"Error opening ElevenLabs audio stream: {e}")
         return None
+    
+    cache_key = get_audio_cache_key(text, voice_id)
+    get_tts_cache().record_miss()
+    
+    def relay() -> Iterator[bytes]:
+        chunks = []
+        completed = False
+        try:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if not chunk:
+                    continue
+                if not chunks:
+                    logger.info(f"[Timing] ElevenLabs first audio chunk: {time.time() - stream_start:.3f} seconds")
+                chunks.append(chunk)
+                yield chunk
+            completed = True
+        finally:
+            response.close()
+            # Only complete clips go into the cache - a caller hang-up mid-stream leaves no partial file
+            if completed and chunks:
+                try:
+                    get_tts_cache().put(cache_key, b"".join(chunks))
+                    logger.info(f"[Timing] ElevenLabs streamed clip complete: {time.time() - stream_start:.3f} seconds")
+                except Exception as e:
+                    logger.error(f"Error caching streamed audio: {e}")
+    
+    return relay()
+
+def stream_sentences_audio(sentences: Iterable[str], voice_id: str = None, voice_name: str = "adam") -> Iterator[bytes]:
+    """
+    Voice a sequence of sentences as one continuous MP3 stream.
+    Each sentence is synthesized as soon as it arrives, so playback of the first one
+    starts while later sentences are still being generated upstream.
+    """
+    for sentence in sentences:
+        if not sentence.strip():
+            continue
+        
+        cached_file = get_cached_audio(sentence, voice_id, voice_name)
+        if cached_file:
+            with open(cached_file, 'rb') as f:
+                yield f.read()
+            continue
+        
+        audio_stream = stream_elevenlabs_audio(sentence, voice_id, voice_name) if ELEVENLABS_STREAM_AUDIO else None
+        if audio_stream is not None:
+            yield from audio_stream
+            continue
+        
+        audio_file = generate_elevenlabs_audio(sentence, voice_id, voice_name)
+        if audio_file and os.path.exists(audio_file):
+            with open(audio_file, 'rb') as f:
+                yield f.read()
+        else:
+            logger.error(f"❌ No audio for streamed sentence: '{sentence[:40]}'")
+
+def prewarm_audio_cache(phrases: List[str], voice_name: str = "adam") -> int:
+    """Synthesize known fixed phrases (passed in by their call sites) into the shared cache; returns how many are ready"""
+    if not ELEVENLABS_API_KEY:
+        return 0
+    
+    ready = 0
+    for phrase in phrases:
+        if generate_elevenlabs_audio(phrase, voice_name=voice_name):
+            ready += 1
+    
+    logger.info(f"🔥 TTS CACHE PREWARMED: {ready}/{len(phrases)} fixed phrases ready")
+    return ready
+
+def get_audio_cache_metrics() -> Dict[str, Any]:
+    return get_tts_cache().get_metrics()
 
 def get_voice_list():
     """Get list of available voices from ElevenLabs"""
@@ -0,0 +1,226 @@
+"""
+ElevenLabs WebSocket Pool
+Warm, pre-authenticated and pre-configured stream-input connections for ElevenLabsStreamingClient
+A call (or a turn after barge-in) takes a ready socket instead of paying connect + TLS + config handshake
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+import websockets
+from websockets.protocol import State
+
+from async_runtime import run_in_runtime
+
+logger = logging.getLogger(__name__)
+
+ELEVENLABS_POOL_SIZE = int(os.environ.get('ELEVENLABS_POOL_SIZE', '2'))  # idle sockets kept per partition
+ELEVENLABS_POOL_MAX_AGE = int(os.environ.get('ELEVENLABS_POOL_MAX_AGE', '150'))
+ELEVENLABS_POOL_HEALTH_SECONDS = int(os.environ.get('ELEVENLABS_POOL_HEALTH_SECONDS', '15'))
+# Server-side idle limit for stream-input; pooled sockets are recycled before reaching it
+ELEVENLABS_INACTIVITY_TIMEOUT = int(os.environ.get('ELEVENLABS_INACTIVITY_TIMEOUT', '180'))
+
+STREAM_INPUT_URL = ("wss://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream-input"
+                    "?model_id={model_id}&output_format={output_format}&inactivity_timeout={inactivity_timeout}")
+
+# (voice_id, model_id, output_format)
+Partition = Tuple[str, str, str]
+
+
+class PooledSocket:
+    __slots__ = ('websocket', 'partition', 'opened', 'connect_ms')
+
+    def __init__(self, websocket, partition: Partition, connect_ms: float):
+        self.websocket = websocket
+        self.partition = partition
+        self.opened = time.time()
+        self.connect_ms = connect_ms
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.opened
+
+    @property
+    def is_open(self) -> bool:
+        return self.websocket.state is State.OPEN
+
+
+class ElevenLabsSocketPool:
+    """
+    Idle stream-input sockets partitioned by voice / model / output format.
+    - Each socket is opened with the API key header and already has the voice_settings /
+      generation_config message sent, so it is ready for text the moment it is taken
+    - Sockets are single-use (a generation ends its context); every acquire() triggers a background refill
+    - A maintenance task pings idle sockets every health_seconds and recycles dead or old ones
+    - The pool lives on the shared async_runtime loop: acquire() / prewarm() can be awaited from any loop,
+      and the sockets they hand out belong to the runtime loop (send / recv / close via run_in_runtime)
+    """
+
+    def __init__(self, api_key: str, voice_settings: Dict[str, Any], generation_config: Dict[str, Any],
+                 size: int = ELEVENLABS_POOL_SIZE, max_age: int = ELEVENLABS_POOL_MAX_AGE,
+                 health_seconds: int = ELEVENLABS_POOL_HEALTH_SECONDS):
+        self.api_key = api_key
+        self.voice_settings = voice_settings
+        self.generation_config = generation_config
+        self.size = size
+        self.max_age = max_age
+        self.health_seconds = health_seconds
+
+        self.idle: Dict[Partition, deque] = {}
+        self._refilling: Dict[Partition, asyncio.Task] = {}
+        self._maintenance: Optional[asyncio.Task] = None
+        self.metrics = {'hits': 0, 'misses': 0, 'opened': 0, 'failed': 0, 'recycled': 0,
+                        'total_connect_ms': 0.0, 'total_acquire_ms': 0.0, 'acquires': 0}
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+
+    async def _open(self, partition: Partition) -> PooledSocket:
+        voice_id, model_id, output_format = partition
+        url = STREAM_INPUT_URL.format(voice_id=voice_id, model_id=model_id, output_format=output_format,
+                                      inactivity_timeout=ELEVENLABS_INACTIVITY_TIMEOUT)
+        started = time.time()
+        try:
+            websocket = await websockets.connect(url, additional_headers={"xi-api-key": self.api_key})
+            await websocket.send(json.dumps({
+                "text": " ",  # Start with space to initialize
+                "voice_settings": self.voice_settings,
+                "generation_config": self.generation_config
+            }))
+        except Exception:
+            self.metrics['failed'] += 1
+            raise
+        connect_ms = (time.time() - started) * 1000
+        self.metrics['opened'] += 1
+        self.metrics['total_connect_ms'] += connect_ms
+        return PooledSocket(websocket, partition, connect_ms)
+
+    async def _close(self, pooled: PooledSocket):
+        self.metrics['recycled'] += 1
+        try:
+            await pooled.websocket.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled ElevenLabs socket: {e}")
+
+    def _usable(self, pooled: PooledSocket) -> bool:
+        return pooled.is_open and pooled.age < self.max_age
+
+    # ------------------------------------------------------------------
+    # Acquire / refill
+    # ------------------------------------------------------------------
+
+    def _start_maintenance(self):
+        """Start the health-check task on first use (runs on the runtime loop)"""
+        if self._maintenance is None or self._maintenance.done():
+            self._maintenance = asyncio.get_running_loop().create_task(self._maintain())
+
+    async def acquire(self, voice_id: str, model_id: str, output_format: str):
+        """A configured stream-input websocket for this voice (warm if the pool has one), owned by the runtime loop"""
+        return await run_in_runtime(self._acquire((voice_id, model_id, output_format)))
+
+    async def _acquire(self, partition: Partition):
+        started = time.time()
+        self._start_maintenance()
+        idle = self.idle.setdefault(partition, deque())
+        pooled = None
+        while idle:
+            candidate = idle.popleft()
+            if self._usable(candidate):
+                pooled = candidate
+                break
+            await self._close(candidate)
+        self._schedule_refill(partition)
+
+        if pooled is None:
+            self.metrics['misses'] += 1
+            pooled = await self._open(partition)
+        else:
+            self.metrics['hits'] += 1
+        self.metrics['acquires'] += 1
+        self.metrics['total_acquire_ms'] += (time.time() - started) * 1000
+        return pooled.websocket
+
+    async def prewarm(self, voice_id: str, model_id: str, output_format: str):
+        """Fill a partition ahead of the first call that needs it"""
+        await run_in_runtime(self._prewarm((voice_id, model_id, output_format)))
+
+    async def _prewarm(self, partition: Partition):
+        self._start_maintenance()
+        # Shares an in-flight refill instead of opening a second batch of sockets
+        await asyncio.shield(self._schedule_refill(partition))
+
+    def _schedule_refill(self, partition: Partition) -> asyncio.Task:
+        refill = self._refilling.get(partition)
+        if refill is None:
+            refill = self._refilling[partition] = asyncio.get_running_loop().create_task(self._refill(partition))
+        return refill
+
+    async def _refill(self, partition: Partition):
+        try:
+            idle = self.idle.setdefault(partition, deque())
+            while len(idle) < self.size:
+                try:
+                    idle.append(await self._open(partition))
+                except Exception as e:
+                    logger.error(f"ElevenLabs pool refill failed for voice {partition[0]}: {e}")
+                    break
+        finally:
+            self._refilling.pop(partition, None)
+
+    # ------------------------------------------------------------------
+    # Health checks and idle recycling
+    # ------------------------------------------------------------------
+
+    async def _healthy(self, pooled: PooledSocket) -> bool:
+        if not self._usable(pooled):
+            return False
+        try:
+            pong = await pooled.websocket.ping()
+            await asyncio.wait_for(pong, timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.health_seconds)
+            try:
+                for partition, idle in list(self.idle.items()):
+                    checked = [(pooled, await self._healthy(pooled)) for pooled in list(idle)]
+                    for pooled, healthy in checked:
+                        if not healthy:
+                            try:
+                                idle.remove(pooled)
+                            except ValueError:
+                                continue  # taken by acquire() meanwhile
+                            await self._close(pooled)
+                    if len(idle) < self.size:
+                        self._schedule_refill(partition)
+            except Exception as e:
+                logger.error(f"ElevenLabs pool maintenance error: {e}")
+
+    async def close_all(self):
+        await run_in_runtime(self._close_all())
+
+    async def _close_all(self):
+        for idle in self.idle.values():
+            while idle:
+                await self._close(idle.popleft())
+        if self._maintenance:
+            self._maintenance.cancel()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        total_connect_ms = metrics.pop('total_connect_ms')
+        total_acquire_ms = metrics.pop('total_acquire_ms')
+        metrics['avg_connect_ms'] = round(total_connect_ms / metrics['opened'], 1) if metrics['opened'] else 0.0
+        metrics['avg_acquire_ms'] = round(total_acquire_ms / metrics['acquires'], 1) if metrics['acquires'] else 0.0
+        metrics['hit_rate'] = round(metrics['hits'] / metrics['acquires'], 3) if metrics['acquires'] else 0.0
+        metrics['idle'] = {f"{voice}/{model}/{fmt}": len(idle) for (voice, model, fmt), idle in self.idle.items()}
+        return metrics
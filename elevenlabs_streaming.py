@@ -10,9 +10,12 @@ import logging
 import asyncio
 import websockets
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 import requests
 
+from async_runtime import run_in_runtime, submit
+from elevenlabs_socket_pool import ElevenLabsSocketPool
+
 logger = logging.getLogger(__name__)
 
 class ElevenLabsStreamingClient:
@@ -22,8 +25,11 @@ class ElevenLabsStreamingClient:
             raise ValueError("ELEVENLABS_API_KEY environment variable required")
             
         self.voice_id = "nPczCjzI2devNBz1zQrb"  # Flash voice for low latency
+        self.model_id = "eleven_flash_v2_5"
+        # 8 kHz μ-law output goes to Twilio as-is (framed into 20 ms media messages, no transcoding)
+        self.output_format = "ulaw_8000"
         self.active_sessions = {}
-        self.audio_buffers = defaultdict(list)
+        self.audio_buffers = defaultdict(deque)
         
         # Flash model settings for fastest response
         self.voice_settings = {
@@ -32,6 +38,12 @@ class ElevenLabsStreamingClient:
             "style": 0.0,
             "use_speaker_boost": True
         }
+        self.generation_config = {
+            "chunk_length_schedule": [120, 160, 250, 290]  # Optimized for low latency
+        }
+        
+        # Warm stream-input sockets (already authenticated and configured) per voice/model/format
+        self.socket_pool = ElevenLabsSocketPool(self.api_key, self.voice_settings, self.generation_config)
         
     def test_streaming(self):
         """Test if streaming capabilities are available"""
@@ -52,25 +64,9 @@ class ElevenLabsStreamingClient:
         try:
             logger.info(f"🎤 Starting ElevenLabs streaming session for {call_sid}")
             
-            # Initialize WebSocket connection to ElevenLabs
-            ws_url = f"wss://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/stream-input?model_id=eleven_flash_v2_5"
-            
-            headers = {
-                "xi-api-key": self.api_key
-            }
-            
-            websocket = await websockets.connect(ws_url, extra_headers=headers)
-            
-            # Send initial configuration
-            config_message = {
-                "text": " ",  # Start with space to initialize
-                "voice_settings": self.voice_settings,
-                "generation_config": {
-                    "chunk_length_schedule": [120, 160, 250, 290]  # Optimized for low latency
-                }
-            }
-            
-            await websocket.send(json.dumps(config_message))
+            # Take a pre-opened, pre-configured socket from the pool (opens one directly if none is ready).
+            # Pooled sockets belong to the shared runtime loop, so all socket I/O goes through it
+            websocket = await self.socket_pool.acquire(self.voice_id, self.model_id, self.output_format)
             
             self.active_sessions[call_sid] = {
                 'websocket': websocket,
@@ -79,8 +75,8 @@ class ElevenLabsStreamingClient:
                 'chunks_sent': 0
             }
             
-            # Start audio collection task
-            asyncio.create_task(self.collect_audio_chunks(call_sid))
+            # Start audio collection task (on the runtime loop, next to its socket)
+            submit(self.collect_audio_chunks(call_sid))
             
             logger.info(f"✅ ElevenLabs streaming session ready for {call_sid}")
             
@@ -104,7 +100,7 @@ class ElevenLabsStreamingClient:
                 "try_trigger_generation": True
             }
             
-            await websocket.send(json.dumps(message))
+            await run_in_runtime(websocket.send(json.dumps(message)))
             session['total_chars'] += len(token)
             session['chunks_sent'] += 1
             
@@ -126,7 +122,7 @@ class ElevenLabsStreamingClient:
                 "try_trigger_generation": True
             }
             
-            await websocket.send(json.dumps(message))
+            await run_in_runtime(websocket.send(json.dumps(message)))
             session['total_chars'] += len(text)
             session['chunks_sent'] += 1
             
@@ -153,12 +149,19 @@ class ElevenLabsStreamingClient:
                     else:
                         # JSON message received
                         data = json.loads(response)
-                        if 'audio' in data:
+                        if data.get('audio'):
                             # Base64 encoded audio
                             import base64
                             audio_data = base64.b64decode(data['audio'])
                             self.audio_buffers[call_sid].append(audio_data)
                             logger.debug(f"🔊 Received base64 audio for {call_sid}: {len(audio_data)} bytes")
+                        if data.get('isFinal'):
+                            # Generation complete: ElevenLabs closes the socket, the next turn takes a fresh one
+                            session['final'] = True
+                            if self.active_sessions.get(call_sid) is session:
+                                del self.active_sessions[call_sid]
+                            await websocket.close()
+                            break
                             
                 except websockets.exceptions.ConnectionClosed:
                     logger.info(f"ElevenLabs WebSocket closed for {call_sid}")
@@ -170,12 +173,42 @@ class ElevenLabsStreamingClient:
         except Exception as e:
             logger.error(f"Audio collection task error: {e}")
     
+    async def prewarm(self):
+        """Open the pool's sockets for the default voice before the first call arrives"""
+        await self.socket_pool.prewarm(self.voice_id, self.model_id, self.output_format)
+    
+    async def ensure_session(self, call_sid):
+        """Open the call's stream-input socket if it isn't open (e.g. after a cancelled generation)"""
+        if call_sid not in self.active_sessions:
+            await self.start_streaming_session(call_sid)
+    
+    async def cancel_generation(self, call_sid):
+        """
+        Barge-in: stop the in-flight generation and drop its buffered audio
+        stream-input has no cancel message, so the socket is closed (ending generation server-side);
+        the next turn takes a warm socket from the pool. Returns the milliseconds of buffered ulaw_8000 audio discarded.
+        """
+        flushed_bytes = sum(len(chunk) for chunk in self.audio_buffers.pop(call_sid, ()))
+        session = self.active_sessions.pop(call_sid, None)
+        if session and 'websocket' in session:
+            try:
+                await run_in_runtime(session['websocket'].close())
+            except Exception as e:
+                logger.error(f"Error closing ElevenLabs socket for {call_sid}: {e}")
+        logger.info(f"✂️ ElevenLabs generation cancelled for {call_sid}: {flushed_bytes} buffered bytes dropped")
+        return flushed_bytes // 8  # 8 kHz μ-law: 8 bytes per ms
+    
+    def generation_final(self, call_sid):
+        """True once the call's generation has sent its last audio (or no generation is open)"""
+        session = self.active_sessions.get(call_sid)
+        return session is None or session.get('final', False)
+    
     async def get_audio_chunk(self, call_sid):
         """Get next available audio chunk for playback"""
         try:
             if call_sid in self.audio_buffers and self.audio_buffers[call_sid]:
                 # Return first available chunk
-                return self.audio_buffers[call_sid].pop(0)
+                return self.audio_buffers[call_sid].popleft()
             return None
             
         except Exception as e:
@@ -196,7 +229,7 @@ class ElevenLabsStreamingClient:
                 "text": ""
             }
             
-            await websocket.send(json.dumps(end_message))
+            await run_in_runtime(websocket.send(json.dumps(end_message)))
             logger.info(f"🏁 Finished text generation for {call_sid}")
             
         except Exception as e:
@@ -215,7 +248,7 @@ class ElevenLabsStreamingClient:
                 
                 # Close WebSocket
                 if 'websocket' in session:
-                    await session['websocket'].close()
+                    await run_in_runtime(session['websocket'].close())
                 
                 del self.active_sessions[call_sid]
             
@@ -247,6 +280,7 @@ streaming_tts_client = ElevenLabsStreamingClient()
 
 def register_elevenlabs_routes(app):
     """Register ElevenLabs streaming routes"""
+    from flask import jsonify
     
     @app.route('/tts-status/<call_sid>', methods=['GET'])
     def get_tts_status(call_sid):
@@ -269,10 +303,19 @@ def register_elevenlabs_routes(app):
             return jsonify({
                 'available': available,
                 'voice_id': streaming_tts_client.voice_id,
-                'model': 'eleven_flash_v2_5'
+                'model': streaming_tts_client.model_id
             })
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/tts-pool-status', methods=['GET'])
+    def get_tts_pool_status():
+        """Warm ElevenLabs socket pool: idle sockets per voice, hit rate, connect vs acquire latency"""
+        try:
+            return jsonify(streaming_tts_client.socket_pool.get_metrics())
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
     logger.info("🎤 ElevenLabs streaming routes registered")
\ No newline at end of file
@@ -8,35 +8,52 @@ import logging
 import threading
 import time
 import os
+import re
 import uuid
 from typing import Optional, Dict, Any, Callable
 from concurrent.futures import ThreadPoolExecutor, Future
 import requests
+import twiml_renderer
+from completion_registry import get_registry
+from call_session_registry import get_call_sessions
 
 logger = logging.getLogger(__name__)
 
 # Global system for managing AI processing
-ai_response_queue: Dict[str, Dict[str, Any]] = {}
-processing_executor = ThreadPoolExecutor(max_workers=15)
+PROCESSING_WORKERS = 15
+processing_executor = ThreadPoolExecutor(max_workers=PROCESSING_WORKERS)
+# Queued responses are published from the future's done-callback; redirect handlers wake on publish
+ai_response_queue = get_registry("ai_response_queue", max_workers=PROCESSING_WORKERS)
+# Queued replies for a call are dropped when the call ends or its session expires
+get_call_sessions().register_teardown(ai_response_queue.discard)
+# The queue above is per process; finished replies are also written to the shared audio text store,
+# so a /get-queued-response redirect that lands on another gunicorn worker can still play them
+QUEUED_RESPONSE_POLL_SECONDS = 0.1
+TECHNICAL_ISSUE_REPLY = "I apologize, there was a technical issue. How can I help you?"
+PROCESSING_FALLBACK_REPLY = "I'm processing your request. How can I help you today?"
+# Speculative TTS runs beside the LLM so the reply audio is warm before the hold clip ends
+tts_executor = ThreadPoolExecutor(max_workers=4)
+FIRST_CLIP_TIMEOUT = 6.0
+PUBLIC_BASE_URL = os.environ.get('REPLIT_URL', 'https://3442ef02-e255-4239-86b6-df0f7a6e4975-00-1w63nn4pu7btq.picard.replit.dev')
 hold_audio_cache = {}
 
+HOLD_MESSAGES = [
+    "Please hold while I check that for you",
+    "Let me look into that for you",
+    "Please hold while I process your request",
+    "Give me just a moment to check on that",
+    "Please hold while I gather that information"
+]
+
 def initialize_hold_audio_cache():
     """Pre-generate and cache hold messages to eliminate ElevenLabs delay"""
     global hold_audio_cache
     
-    hold_messages = [
-        "Please hold while I check that for you",
-        "Let me look into that for you",
-        "Please hold while I process your request",
-        "Give me just a moment to check on that",
-        "Please hold while I gather that information"
-    ]
-    
     try:
         from elevenlabs_integration import generate_audio_file
         logger.info("🎵 PRE-CACHING HOLD MESSAGES for instant playback...")
         
-        for i, message in enumerate(hold_messages):
+        for i, message in enumerate(HOLD_MESSAGES):
             try:
                 audio_file = generate_audio_file(message)
                 hold_audio_cache[f"hold_{i}"] = {
@@ -54,7 +71,7 @@ def initialize_hold_audio_cache():
         logger.warning("⚠️ ElevenLabs not available - using fallback hold messages")
         # Fallback to pre-existing hold audio
         hold_audio_cache['hold_0'] = {
-            'message': 'Please hold while I check that for you',
+            'message': HOLD_MESSAGES[0],
             'audio_file': 'please_hold.mp3',
             'url': '/static/please_hold.mp3'
         }
@@ -66,11 +83,39 @@ def get_cached_hold_message() -> str:
     
     # Return first available cached message
     for key, data in hold_audio_cache.items():
-        base_url = os.environ.get('REPLIT_URL', 'https://3442ef02-e255-4239-86b6-df0f7a6e4975-00-1w63nn4pu7btq.picard.replit.dev')
-        return f"{base_url}{data['url']}"
+        return f"{PUBLIC_BASE_URL}{data['url']}"
     
     # Ultimate fallback
-    return "https://3442ef02-e255-4239-86b6-df0f7a6e4975-00-1w63nn4pu7btq.picard.replit.dev/static/please_hold.mp3"
+    return f"{PUBLIC_BASE_URL}/static/please_hold.mp3"
+
+# Simple greetings and quick responses - NO hold message needed
+INSTANT_PATTERNS = [
+    'hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening',
+    'thank you', 'thanks', 'yes', 'no', 'okay', 'ok',
+    'are you open', 'office hours', 'what time', 'phone number',
+    'goodbye', 'bye', 'have a good day'
+]
+QUESTION_WORDS = ['what', 'how', 'when', 'where', 'can you']
+# Complex requests that need AI processing - USE hold message
+COMPLEX_PATTERNS = [
+    'maintenance', 'repair', 'broken', 'issue', 'problem', 'service', 'fix',
+    'apartment', 'unit', 'building', 'address', 'street', 'avenue', 'road',
+    'electrical', 'plumbing', 'heating', 'air conditioning', 'appliance',
+    'leak', 'water', 'heat', 'cold', 'power', 'light', 'toilet', 'sink',
+    'rat', 'mouse', 'pest', 'bug', 'cockroach', 'ant',
+    'noise', 'neighbor', 'complaint', 'emergency'
+]
+
+
+def _word_pattern(phrases, suffixes: str = '') -> re.Pattern:
+    """Whole-word match for any phrase ('ok' must not match "broken", 'hi' not "this")"""
+    return re.compile(r'\b(?:' + '|'.join(re.escape(p) for p in phrases) + r')' + suffixes + r'\b')
+
+
+INSTANT_RE = _word_pattern(INSTANT_PATTERNS)
+QUESTION_RE = _word_pattern(QUESTION_WORDS)
+# Plurals and verb forms count ("leaking", "rats", "lights")
+COMPLEX_RE = _word_pattern(COMPLEX_PATTERNS, r'(?:s|es|ed|ing|er|ers)?')
 
 def should_use_enhanced_flow(user_input: str) -> bool:
     """
@@ -80,33 +125,15 @@ def should_use_enhanced_flow(user_input: str) -> bool:
     """
     user_lower = user_input.lower().strip()
     
-    # Simple greetings and quick responses - NO hold message needed
-    instant_patterns = [
-        'hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening',
-        'thank you', 'thanks', 'yes', 'no', 'okay', 'ok',
-        'are you open', 'office hours', 'what time', 'phone number',
-        'goodbye', 'bye', 'have a good day'
-    ]
-    
     # Check for instant response patterns
-    if any(pattern in user_lower for pattern in instant_patterns):
+    if INSTANT_RE.search(user_lower):
         return False
     
     # Short simple questions - NO hold message
-    if len(user_input.split()) <= 4 and any(word in user_lower for word in ['what', 'how', 'when', 'where', 'can you']):
+    if len(user_input.split()) <= 4 and QUESTION_RE.search(user_lower):
         return False
     
-    # Complex requests that need AI processing - USE hold message
-    complex_patterns = [
-        'maintenance', 'repair', 'broken', 'issue', 'problem', 'service', 'fix',
-        'apartment', 'unit', 'building', 'address', 'street', 'avenue', 'road',
-        'electrical', 'plumbing', 'heating', 'air conditioning', 'appliance',
-        'leak', 'water', 'heat', 'cold', 'power', 'light', 'toilet', 'sink',
-        'rat', 'mouse', 'pest', 'bug', 'cockroach', 'ant',
-        'noise', 'neighbor', 'complaint', 'emergency'
-    ]
-    
-    return any(pattern in user_lower for pattern in complex_patterns) or len(user_input.split()) > 6
+    return bool(COMPLEX_RE.search(user_lower)) or len(user_input.split()) > 6
 
 def start_parallel_ai_processing(call_sid: str, user_input: str, ai_function: Callable) -> str:
     """
@@ -118,158 +145,272 @@ def start_parallel_ai_processing(call_sid: str, user_input: str, ai_function: Ca
     logger.info(f"🚀 PARALLEL AI PROCESSING STARTED: {processing_id} for call {call_sid}")
     logger.info(f"📝 INPUT: '{user_input[:60]}...'")
     
-    # Submit AI processing to background thread pool
+    # Submit AI processing to background thread pool; the queued response is built and
+    # published from the future's completion callback (no per-turn monitor thread)
+    start_time = time.time()
+    get_call_sessions().touch(call_sid)
     future = processing_executor.submit(ai_function, user_input)
-    
-    # Store processing task with metadata
-    ai_response_queue[call_sid] = {
-        'processing_id': processing_id,
-        'future': future,
-        'user_input': user_input,
-        'start_time': time.time(),
-        'status': 'processing',
-        'response_ready': False,
-        'queued_response': None
-    }
-    
-    # Start monitoring thread to queue response when ready
-    monitor_thread = threading.Thread(
-        target=_monitor_ai_processing,
-        args=(call_sid, processing_id),
-        daemon=True
+    ai_response_queue.track(
+        call_sid, future,
+        lambda done: _share_queued_response(call_sid, processing_id,
+                                            _finalize_ai_response(processing_id, start_time, done)),
+        processing_id=processing_id,
+        user_input=user_input
     )
-    monitor_thread.start()
     
     return processing_id
 
-def _monitor_ai_processing(call_sid: str, processing_id: str):
+def _queued_response_key(call_sid: str, processing_id: str) -> str:
+    return f"queued:{call_sid}:{processing_id}"
+
+def _share_queued_response(call_sid: str, processing_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a finished reply visible to every worker (the local queue still delivers it first)"""
+    try:
+        twiml_renderer.get_audio_text_store().put(result['queued_response'],
+                                                  _queued_response_key(call_sid, processing_id))
+    except Exception as e:
+        logger.error(f"❌ Could not share queued response {processing_id}: {e}")
+    return result
+
+def _wait_shared_queued_response(call_sid: str, processing_id: str, max_wait: float) -> Optional[str]:
+    """Reply published by the worker that ran the processing, or None once max_wait has passed"""
+    store = twiml_renderer.get_audio_text_store()
+    key = _queued_response_key(call_sid, processing_id)
+    deadline = time.time() + max_wait
+    while True:
+        queued_response = store.get(key)
+        if queued_response or time.time() >= deadline:
+            return queued_response
+        time.sleep(QUEUED_RESPONSE_POLL_SECONDS)
+
+def _finalize_ai_response(processing_id: str, start_time: float, future: Future) -> Dict[str, Any]:
     """
-    Monitor AI processing and queue response when ready
-    Runs in separate thread to avoid blocking
+    Turn a completed AI future into the queued TwiML fragment
+    Runs on the pool thread that finished the work
     """
     try:
-        if call_sid not in ai_response_queue:
-            return
-            
-        task_info = ai_response_queue[call_sid]
-        future = task_info['future']
+        response = future.result()
+    except Exception as e:
+        logger.error(f"❌ AI processing failed for {processing_id}: {e}")
+        return {
+            'status': 'error',
+            'queued_response': twiml_renderer.say_verb(TECHNICAL_ISSUE_REPLY),
+            'error': str(e),
+            'processing_time': time.time() - start_time
+        }
+    
+    # Generate TTS audio for the response
+    try:
+        from fixed_conversation_app import create_voice_response
+        voice_response = create_voice_response(response)
         
-        # Wait for AI processing to complete
-        response = future.result(timeout=10.0)  # 10 second max processing time
+        result = {
+            'status': 'completed',
+            'queued_response': voice_response,
+            'ai_response_text': response,
+            'processing_time': time.time() - start_time
+        }
+        
+        logger.info(f"✅ AI RESPONSE QUEUED: {processing_id} in {result['processing_time']:.2f}s")
+        logger.info(f"🎤 RESPONSE: '{response[:80]}...'")
+        return result
         
-        # Generate TTS audio for the response
-        try:
-            from fixed_conversation_app import create_voice_response
-            voice_response = create_voice_response(response)
-            
-            # Queue the complete TwiML response
-            task_info.update({
-                'status': 'completed',
-                'response_ready': True,
-                'queued_response': voice_response,
-                'ai_response_text': response,
-                'processing_time': time.time() - task_info['start_time']
-            })
-            
-            logger.info(f"✅ AI RESPONSE QUEUED: {processing_id} in {task_info['processing_time']:.2f}s")
-            logger.info(f"🎤 RESPONSE: '{response[:80]}...'")
-            
-        except Exception as e:
-            logger.error(f"❌ TTS generation failed for {processing_id}: {e}")
-            # Queue fallback response
-            task_info.update({
-                'status': 'error',
-                'response_ready': True,
-                'queued_response': f'<Say voice="Polly.Matthew-Neural">{response}</Say>',
-                'ai_response_text': response,
-                'processing_time': time.time() - task_info['start_time']
-            })
-            
     except Exception as e:
-        logger.error(f"❌ AI processing failed for {processing_id}: {e}")
-        if call_sid in ai_response_queue:
-            ai_response_queue[call_sid].update({
-                'status': 'error',
-                'response_ready': True,
-                'queued_response': '<Say voice="Polly.Matthew-Neural">I apologize, there was a technical issue. How can I help you?</Say>',
-                'error': str(e)
-            })
+        logger.error(f"❌ TTS generation failed for {processing_id}: {e}")
+        # Queue fallback response
+        return {
+            'status': 'error',
+            'queued_response': twiml_renderer.say_verb(response),
+            'ai_response_text': response,
+            'processing_time': time.time() - start_time
+        }
 
-def create_instant_hold_twiml(call_sid: str) -> str:
+def start_speculative_ai_processing(call_sid: str, user_input: str, base_url: str = PUBLIC_BASE_URL) -> str:
+    """
+    Speculative variant of start_parallel_ai_processing for the hold flow
+    The reply is streamed from the LLM and its first sentence goes to TTS the moment it
+    is complete, while the hold message is still playing; the queued TwiML then plays
+    audio that is already in the shared TTS cache
+    """
+    processing_id = f"ai_{uuid.uuid4().hex[:8]}"
+    
+    logger.info(f"🚀 SPECULATIVE AI PROCESSING STARTED: {processing_id} for call {call_sid}")
+    
+    start_time = time.time()
+    get_call_sessions().touch(call_sid)
+    future = processing_executor.submit(_speculative_pipeline, call_sid, user_input, processing_id, start_time)
+    ai_response_queue.track(
+        call_sid, future,
+        lambda done: _share_queued_response(call_sid, processing_id,
+                                            _finalize_speculative_response(call_sid, base_url, processing_id,
+                                                                           start_time, done)),
+        processing_id=processing_id,
+        user_input=user_input
+    )
+    
+    return processing_id
+
+def _speculative_pipeline(call_sid: str, user_input: str, processing_id: str, start_time: float) -> Dict[str, Any]:
+    """
+    Stream the reply and synthesize its first sentence the moment it is complete.
+    Returns as soon as the first clip is warm (or failed) - never waits for the full completion.
+    Whatever the LLM has finished by then becomes a second clip; if it is still generating,
+    the rest is played by following the same streamed turn (keyed on processing_id).
+    """
+    from openai_conversation_manager import conversation_manager
+    from elevenlabs_integration import generate_elevenlabs_audio
+    
+    timings = {}
+    sentences = conversation_manager.stream_user_input_sync(call_sid, user_input, turn_id=processing_id)
+    first = next(sentences, None)
+    if first is None:
+        raise RuntimeError("LLM returned no reply")
+    timings['first_sentence'] = time.time() - start_time
+    first_future = tts_executor.submit(generate_elevenlabs_audio, first)
+    logger.info(f"⚡ SPECULATIVE TTS: first sentence of {processing_id} sent to synthesis after {timings['first_sentence']:.2f}s")
+    
+    # The queued response becomes ready once the first clip is on disk; the remainder is
+    # synthesized (or streamed) while the first clip plays
+    first_clip = None
+    try:
+        first_clip = first_future.result(timeout=FIRST_CLIP_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"⚠️ Speculative TTS for {processing_id} not ready: {e}")
+    timings['first_clip_ready'] = time.time() - start_time
+    
+    streamed = conversation_manager.get_streamed_turn(call_sid, processing_id)
+    complete = streamed is None or (streamed.done and streamed.error is None)
+    so_far = list(streamed.sentences) if streamed is not None else [first]
+    if complete:
+        timings['llm_complete'] = time.time() - start_time
+    
+    clips = [first]
+    rest = " ".join(so_far[1:])
+    if complete and rest:
+        clips.append(rest)
+        tts_executor.submit(generate_elevenlabs_audio, rest)
+    
+    return {
+        'response': " ".join(so_far),
+        'clips': clips,
+        'stream_rest': not complete,
+        'user_input': user_input,
+        'first_clip_warm': bool(first_clip),
+        'timings': timings
+    }
+
+def _finalize_speculative_response(call_sid: str, base_url: str, processing_id: str, start_time: float,
+                                   future: Future) -> Dict[str, Any]:
+    """Build queued TwiML that plays the warm clips in order"""
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.error(f"❌ Speculative AI processing failed for {processing_id}: {e}")
+        return {
+            'status': 'error',
+            'queued_response': twiml_renderer.say_verb(TECHNICAL_ISSUE_REPLY),
+            'error': str(e),
+            'processing_time': time.time() - start_time
+        }
+    
+    response = result['response']
+    first, rest = result['clips'][0], result['clips'][1:]
+    if result['first_clip_warm']:
+        verbs = [twiml_renderer.play_verb(twiml_renderer.audio_url(base_url, call_sid, first))]
+        status = 'completed'
+    else:
+        verbs = [twiml_renderer.say_verb(first)]
+        status = 'error'
+    verbs += [twiml_renderer.play_verb(twiml_renderer.audio_url(base_url, call_sid, text)) for text in rest]
+    if result['stream_rest']:
+        # LLM still generating: follow the same turn past the sentences already voiced (no second model call)
+        verbs.append(twiml_renderer.play_verb(
+            twiml_renderer.stream_response_url(base_url, call_sid, processing_id, result['user_input'], skip=1)))
+    queued_response = "".join(verbs)
+    
+    timings = result['timings']
+    llm_complete = f"{timings['llm_complete']:.2f}s" if 'llm_complete' in timings else "still streaming"
+    logger.info(f"✅ SPECULATIVE RESPONSE QUEUED: {processing_id} - first sentence {timings.get('first_sentence', 0):.2f}s, "
+                f"first clip warm {timings['first_clip_ready']:.2f}s, LLM done {llm_complete}")
+    
+    return {
+        'status': status,
+        'queued_response': queued_response,
+        'ai_response_text': response,
+        'timings': timings,
+        'processing_time': time.time() - start_time
+    }
+
+def create_instant_hold_twiml(call_sid: str, base_url: Optional[str] = None,
+                              processing_id: Optional[str] = None) -> str:
     """
     Create TwiML that plays hold message instantly while AI processes in parallel
     This is the FIRST response after user stops speaking
+    With a base_url the hold message is served from the shared TTS cache (prewarmed at startup);
+    with a processing_id the redirect can pick the reply up on any worker
     """
-    hold_audio_url = get_cached_hold_message()
+    if base_url:
+        hold_audio_url = twiml_renderer.audio_url(base_url, call_sid, HOLD_MESSAGES[0])
+    else:
+        hold_audio_url = get_cached_hold_message()
     
-    return f'''<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Play>{hold_audio_url}</Play>
-    <Redirect>/get-queued-response/{call_sid}</Redirect>
-</Response>'''
+    redirect = f"/get-queued-response/{call_sid}"
+    if processing_id:
+        redirect += f"?turn={processing_id}"
+    return twiml_renderer.play_redirect(hold_audio_url, redirect)
 
-def get_queued_ai_response(call_sid: str, max_wait: float = 8.0) -> str:
+def get_queued_ai_response(call_sid: str, max_wait: float = 8.0, processing_id: Optional[str] = None) -> str:
     """
     Get the queued AI response after hold message completes
-    Wait for AI processing if it's not done yet
+    Blocks on the completion registry, waking the instant the response is published;
+    processing started on another worker is picked up from the shared store instead
     """
-    if call_sid not in ai_response_queue:
+    task_info = ai_response_queue.get_pending(call_sid)
+    if task_info is None and not ai_response_queue.is_ready(call_sid):
+        if processing_id:
+            queued_response = _wait_shared_queued_response(call_sid, processing_id, max_wait)
+            if queued_response:
+                logger.info(f"✅ QUEUED RESPONSE {processing_id} delivered from another worker")
+                return twiml_renderer.verbs_gather(call_sid, queued_response, 'queued')
         logger.warning(f"❌ No AI processing found for call {call_sid}")
         return create_fallback_response(call_sid)
     
-    task_info = ai_response_queue[call_sid]
-    processing_id = task_info['processing_id']
+    processing_id = (task_info or {}).get('processing_id', 'unknown')
+    start_time = (task_info or {}).get('start_time', time.time())
     
     logger.info(f"🎯 RETRIEVING QUEUED RESPONSE: {processing_id}")
     
-    # Wait for response to be ready
-    start_wait = time.time()
-    while not task_info.get('response_ready', False):
-        if time.time() - start_wait > max_wait:
-            logger.warning(f"⏰ TIMEOUT waiting for AI response {processing_id}")
-            break
-        time.sleep(0.1)  # Check every 100ms
+    result = ai_response_queue.wait(call_sid, timeout=max_wait)
     
-    if task_info.get('response_ready', False):
-        queued_response = task_info.get('queued_response')
-        processing_time = task_info.get('processing_time', 0)
-        hold_time = time.time() - task_info['start_time']
+    if result:
+        queued_response = result.get('queued_response')
+        processing_time = result.get('processing_time', 0)
+        hold_time = time.time() - start_time
         
         logger.info(f"✅ SEAMLESS DELIVERY: AI processed in {processing_time:.2f}s, total flow in {hold_time:.2f}s")
         
-        # Clean up
-        cleanup_ai_processing(call_sid)
-        
-        return f'''<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    {queued_response}
-    <Gather input="speech dtmf" timeout="8" speechTimeout="4" dtmfTimeout="2" language="en-US" action="/handle-input/{call_sid}" method="POST">
-    </Gather>
-    <Redirect>/handle-speech/{call_sid}</Redirect>
-</Response>'''
+        return twiml_renderer.verbs_gather(call_sid, queued_response, 'queued')
     
     else:
         # AI processing still not done - return fallback
-        logger.warning(f"❌ AI response not ready for {processing_id} - using fallback")
+        logger.warning(f"⏰ TIMEOUT waiting for AI response {processing_id} - using fallback")
         cleanup_ai_processing(call_sid)
         return create_fallback_response(call_sid)
 
 def create_fallback_response(call_sid: str) -> str:
     """Create fallback response when AI processing fails or times out"""
-    return f'''<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say voice="Polly.Matthew-Neural">I'm processing your request. How can I help you today?</Say>
-    <Gather input="speech dtmf" timeout="8" speechTimeout="4" dtmfTimeout="2" language="en-US" action="/handle-input/{call_sid}" method="POST">
-    </Gather>
-    <Redirect>/handle-speech/{call_sid}</Redirect>
-</Response>'''
+    return twiml_renderer.say_gather(call_sid, PROCESSING_FALLBACK_REPLY, 'queued')
 
 def cleanup_ai_processing(call_sid: str):
     """Clean up completed AI processing task"""
-    if call_sid in ai_response_queue:
-        processing_id = ai_response_queue[call_sid].get('processing_id', 'unknown')
-        del ai_response_queue[call_sid]
-        logger.info(f"🧹 CLEANED UP AI processing: {processing_id}")
+    task_info = ai_response_queue.get_pending(call_sid)
+    ai_response_queue.discard(call_sid)
+    if task_info:
+        logger.info(f"🧹 CLEANED UP AI processing: {task_info.get('processing_id', 'unknown')}")
+
+def get_queue_metrics() -> Dict[str, Any]:
+    """Queue depth, handler wait times and pool saturation for the AI response queue"""
+    return ai_response_queue.get_metrics()
 
 def add_enhanced_call_flow_routes(app):
     """Add enhanced call flow routes to Flask app"""
@@ -277,7 +418,8 @@ def add_enhanced_call_flow_routes(app):
     @app.route('/get-queued-response/<call_sid>', methods=['GET', 'POST'])
     def get_queued_response_route(call_sid):
         """Route to get queued AI response after hold message"""
-        return get_queued_ai_response(call_sid)
+        from flask import request
+        return get_queued_ai_response(call_sid, processing_id=request.args.get('turn'))
         
     logger.info("✅ ENHANCED CALL FLOW ROUTES ADDED")
 
@@ -6,6 +6,7 @@ Includes log numbering system, dashboard functionality, and comprehensive featur
 import os
 import re
 import json
+import hashlib
 import logging
 import asyncio
 from datetime import datetime
@@ -15,7 +16,16 @@ from twilio.twiml.voice_response import VoiceResponse
 from concurrent.futures import ThreadPoolExecutor
 import time
 import threading
-from collections import defaultdict
+from collections import defaultdict, deque
+from async_runtime import run_sync
+from completion_registry import get_registry, get_all_metrics
+import twiml_renderer
+from request_log_sink import get_request_log_sink
+from call_summary_store import get_call_summary_store
+from call_repository import init_call_repository, get_call_repository, parse_timestamp
+from call_session_registry import get_call_sessions
+from enhanced_call_flow import (HOLD_MESSAGES, add_enhanced_call_flow_routes, should_use_enhanced_flow,
+                                start_speculative_ai_processing, create_instant_hold_twiml)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -24,7 +34,15 @@ logger = logging.getLogger(__name__)
 # Performance optimization globals
 executor = ThreadPoolExecutor(max_workers=4)  # For parallel processing
 response_cache = {}  # Cache common responses
-timing_data = defaultdict(list)  # Store timing metrics
+TIMING_SAMPLES = int(os.environ.get('TIMING_SAMPLES', '1000'))
+timing_data = defaultdict(lambda: deque(maxlen=TIMING_SAMPLES))  # Recent timing metrics per stage
+# Stream AI replies sentence by sentence into TTS instead of waiting for the full completion
+STREAM_LLM_RESPONSES = os.environ.get('STREAM_LLM_RESPONSES', 'true').lower() == 'true'
+# Complex requests get the hold message + speculative first-sentence synthesis (enhanced_call_flow)
+HOLD_FLOW_RESPONSES = os.environ.get('HOLD_FLOW_RESPONSES', 'true').lower() == 'true'
+# Voiced by /stream-response when generation fails before / after the first sentence
+STREAM_FALLBACK_REPLY = "I'm here to help. What can I do for you?"
+STREAM_INTERRUPTED_REPLY = "Sorry, could you say that again?"
 
 # Global variables for application state
 conversation_history = {}  # Only real phone conversations stored here
@@ -32,28 +50,49 @@ call_recordings = {}
 current_service_issue = None
 
 # PERSISTENT CONVERSATION STORAGE SYSTEM
+# Snapshot (conversation_history.json) + append-only per-turn journal, compacted in the background
+from transcript_journal import TranscriptJournal
+transcript_journal = TranscriptJournal("conversation_journal.jsonl", snapshot_file="conversation_history.json")
+
+# Per-call webhook state, bounded and dropped at call end by the call-session registry
+call_sessions = get_call_sessions()
+
 def load_conversation_history():
-    """Load conversation history from persistent storage"""
+    """
+    Load the calls still in progress from persistent storage.
+    Older calls stay on disk, in the SQL store and in the dashboard summaries, not in memory.
+    """
     try:
-        if os.path.exists("conversation_history.json"):
-            with open("conversation_history.json", "r") as f:
-                data = json.load(f)
-                return data.get("conversations", {})
+        conversations = transcript_journal.load_all()
+        get_call_summary_store().sync(conversations)
+        cutoff = time.time() - call_sessions.ttl_seconds
+        recent = {}
+        for call_sid, turns in conversations.items():
+            if turns and parse_timestamp(turns[-1].get('timestamp')).timestamp() >= cutoff:
+                recent[call_sid] = turns
+                call_sessions.touch(call_sid)  # evicted with the rest of the call's state
+            else:
+                transcript_journal.discard_call(call_sid)
+        logger.info(f"📒 {len(recent)} of {len(conversations)} calls kept in memory")
+        return recent
     except Exception as e:
         logger.error(f"Error loading conversation history: {e}")
     return {}
 
-def save_conversation_history():
-    """Save conversation history to persistent storage"""
+def save_conversation_history(call_sid=None, touch=True):
+    """Append new turns to persistent storage (one call, or every call when call_sid is None)"""
     try:
-        data = {
-            "conversations": conversation_history,
-            "last_updated": datetime.now(pytz.timezone('America/New_York')).isoformat(),
-            "total_calls": len(conversation_history)
-        }
-        with open("conversation_history.json", "w") as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"Saved {len(conversation_history)} conversations to persistent storage")
+        if call_sid and touch:
+            call_sessions.touch(call_sid)  # keeps the call's history in memory while it is active
+        call_sids = [call_sid] if call_sid else list(conversation_history)
+        written = sum(transcript_journal.sync_call(sid, conversation_history.get(sid, [])) for sid in call_sids)
+        # Mirror the same turns into the SQL call store (queued - committed by its writer thread)
+        call_repository = get_call_repository()
+        if call_repository:
+            for sid in call_sids:
+                call_repository.sync_call(sid, conversation_history.get(sid, []))
+        if written:
+            logger.info(f"Saved {written} new conversation turns to persistent storage")
     except Exception as e:
         logger.error(f"Error saving conversation history: {e}")
 
@@ -61,7 +100,7 @@ def save_conversation_history():
 conversation_history = load_conversation_history()
 
 # Email tracking to prevent duplicates
-email_sent_calls = set()
+email_sent_calls = call_sessions.flag_set('app.email_sent_calls')
 
 # Import email summary system
 try:
@@ -106,7 +145,7 @@ def print_total_timing(call_sid, total_time):
     logger.info(f"[Call {call_sid}] Total: {total_time:.3f}s {bottleneck}")
 
 # Anti-repetition system - prevent Chris from repeating exact phrases
-response_tracker = {}
+response_tracker = call_sessions.namespace('app.response_tracker')
 
 # EMAIL NOTIFICATION SYSTEM - GMAIL SMTP FALLBACK
 def send_call_transcript_email(call_sid, caller_phone, transcript, issue_type=None, address_status="unknown"):
@@ -316,9 +355,11 @@ try:
     
     logger.info("🏢 INITIALIZING COMPREHENSIVE PROPERTY BACKUP SYSTEM...")
     # Load properties with comprehensive backup
-    all_properties = asyncio.run(property_backup_system.get_all_properties_with_backup())
+    all_properties = run_sync(property_backup_system.get_all_properties_with_backup())
     address_matcher.properties_cache = all_properties
     address_matcher.cache_loaded = True
+    # One refresher per worker; the shared registry is already subscribed to store deltas
+    address_matcher.registry.start_background_refresh(property_backup_system)
     
     logger.info(f"✅ COMPREHENSIVE BACKUP ACTIVE: Address matcher loaded with {len(all_properties)} properties")
     
@@ -348,6 +389,13 @@ complaint_tracker = {
     ]
 }
 
+TIME_BASED_GREETINGS = {
+    'morning': "Good morning! This is Chris from Grinberg Management. How can I help you?",
+    'afternoon': "Good afternoon! This is Chris from Grinberg Management. How can I help you?",
+    'evening': "Good evening! This is Chris from Grinberg Management. How can I help you?"
+}
+ANYTHING_ELSE_PROMPT = "Is there anything else I can help you with?"
+
 def get_time_based_greeting():
     """Generate time-appropriate greeting for first phone answer"""
     from datetime import datetime
@@ -358,11 +406,11 @@ def get_time_based_greeting():
     hour = now_et.hour
     
     if 6 <= hour < 12:
-        return "Good morning! This is Chris from Grinberg Management. How can I help you?"
+        return TIME_BASED_GREETINGS['morning']
     elif 12 <= hour < 18:
-        return "Good afternoon! This is Chris from Grinberg Management. How can I help you?"  
+        return TIME_BASED_GREETINGS['afternoon']
     else:
-        return "Good evening! This is Chris from Grinberg Management. How can I help you?"
+        return TIME_BASED_GREETINGS['evening']
 
 def get_dynamic_happy_greeting():
     """Generate dynamic, happy greetings that vary for each caller - LEGACY function"""
@@ -396,6 +444,12 @@ def create_app():
     app = Flask(__name__)
     app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
     
+    # SQL call store (CallRecord / ActiveCall / CallTurn) shared by every worker
+    try:
+        init_call_repository(app)
+    except Exception as e:
+        logger.error(f"❌ Call store unavailable - turns stay in the transcript journal only: {e}")
+    
     # Initialize Flask-SocketIO for real-time WebSocket communication
     from flask_socketio import SocketIO
     socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
@@ -404,6 +458,14 @@ def create_app():
     from realtime_voice_routes import register_realtime_routes
     register_realtime_routes(app, socketio)
     
+    # Hold flow: /get-queued-response serves the speculative reply queued by handle_speech
+    add_enhanced_call_flow_routes(app)
+    
+    # Pre-warm the shared TTS cache with fixed phrases (greetings, hold messages)
+    from elevenlabs_integration import prewarm_audio_cache
+    prewarm_phrases = list(TIME_BASED_GREETINGS.values()) + [ANYTHING_ELSE_PROMPT] + HOLD_MESSAGES
+    threading.Thread(target=prewarm_audio_cache, args=(prewarm_phrases,), daemon=True).start()
+    
     def get_eastern_time():
         """Get current Eastern Time"""
         eastern = pytz.timezone('US/Eastern')
@@ -1348,24 +1410,17 @@ def create_app():
             log_entry['constraint_note'] = "Rule #2 followed as required (appended new entry). Rule #4 followed as required (mirrored to REQUEST_HISTORY.md)."
         return log_entry
 
+    # Request history: snapshot + append-only journal, written by a background batch writer
+    log_sink = get_request_log_sink()
+
     def load_logs_from_file():
-        """Load logs from persistent JSON file"""
-        try:
-            with open('logs_persistent.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default_logs
-        except Exception as e:
-            logger.error(f"Error loading logs from file: {e}")
-            return default_logs
+        """Load logs from the persistent snapshot plus the journal (newest first)"""
+        return log_sink.load_all(default_logs)
 
-    def save_logs_to_file(logs_list):
-        """Save logs to persistent JSON file"""
-        try:
-            with open('logs_persistent.json', 'w') as f:
-                json.dump(logs_list, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving logs to file: {e}")
+    def save_logs_to_file(changed_logs):
+        """Save logs to persistent JSON storage - journaled by the sink, in logs_persistent.json within seconds"""
+        for log in changed_logs:
+            log_sink.submit(log)
 
     # Default logs if no persistent file exists
     default_logs = [
@@ -1558,39 +1613,24 @@ def create_app():
         }
     ]
 
-    # Load from persistent file if available, otherwise use default
-    request_history_logs = load_logs_from_file()
+    # Load from persistent file if available, otherwise use default (deque: O(1) newest-first insert)
+    request_history_logs = deque(load_logs_from_file())
 
     def update_log_resolution(log_id, new_resolution):
         """Update only the resolution field of a specific log entry"""
         for log in request_history_logs:
             if log["id"] == log_id:
                 log["resolution"] = new_resolution
-                # Mirror update to REQUEST_HISTORY.md
-                append_to_request_history_file(log)
+                # Persist the update and mirror it to REQUEST_HISTORY.md
+                save_logs_to_file([log])
                 return True
         return False
 
     def append_new_log(new_log):
         """Add a new log entry to the beginning of the list (newest first)"""
-        request_history_logs.insert(0, new_log)
-        # Save to persistent file
-        save_logs_to_file(request_history_logs)
-        # Mirror to REQUEST_HISTORY.md
-        append_to_request_history_file(new_log)
-
-    def append_to_request_history_file(log_entry):
-        """Append or update log entry in REQUEST_HISTORY.md file"""
-        try:
-            log_text = f"""
-log #{log_entry['id']:03d} – {log_entry['date']}  
-📝 Request: {log_entry['request']}  
-✅ Resolution: {log_entry['resolution']}
-"""
-            with open('REQUEST_HISTORY.md', 'a') as f:
-                f.write(log_text)
-        except Exception as e:
-            print(f"Error updating REQUEST_HISTORY.md: {e}")
+        request_history_logs.appendleft(new_log)
+        # Queued for logs_persistent.json and the REQUEST_HISTORY.md mirror - no disk I/O on the call path
+        save_logs_to_file([new_log])
 
     def auto_log_request(user_request, resolution_text):
         """Automatically create a new log entry for user requests"""
@@ -1599,9 +1639,8 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             eastern = pytz.timezone('US/Eastern')
             now_et = datetime.now(eastern)
             
-            # Get next available ID
-            max_id = max([log["id"] for log in request_history_logs]) if request_history_logs else 0
-            new_id = max_id + 1
+            # Get next available ID (monotonic counter shared by all workers)
+            new_id = log_sink.next_id()
             
             # Create new log entry
             new_log = {
@@ -1652,74 +1691,116 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                 'message': f'Error: {str(e)}'
             }), 500
 
+    @app.route("/api/request-log-status", methods=["GET"])
+    def get_request_log_status():
+        """Queue depth, drops and flush timings for the request log writer"""
+        return jsonify({"status": "success", "request_log": log_sink.get_metrics()})
+
+    # Precomputed per-call dashboard summaries (shared SQLite, indexed by time / caller / issue)
+    call_summaries = get_call_summary_store()
+
+    def conditional_json(etag, build_payload):
+        """304 if the client already holds this version, else build the JSON body and tag it"""
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify(build_payload())
+        response.set_etag(etag)
+        return response
+
+    def page_call_summaries(view):
+        """Sync changed calls, then (etag, page builder) for the request's filters and cursor"""
+        call_summaries.sync(conversation_history)
+        args = request.args
+        query_key = hashlib.sha1(request.query_string).hexdigest()[:10]
+        etag = f"{view}-{call_summaries.version}-{query_key}"
+        return etag, lambda: call_summaries.page(
+            view,
+            limit=args.get('limit', type=int),
+            cursor=args.get('cursor'),
+            caller_phone=args.get('phone'),
+            issue_type=args.get('issue_type'),
+            since=args.get('since'),
+            until=args.get('until')
+        )
+
+    @app.route("/api/call-store-status", methods=["GET"])
+    def get_call_store_status():
+        """Writer queue, batch and connection pool metrics for the SQL call store"""
+        call_repository = get_call_repository()
+        if not call_repository:
+            return jsonify({"status": "unavailable"}), 503
+        return jsonify({"status": "success", "call_store": call_repository.get_metrics(),
+                        "active_calls": len(call_repository.active_calls())})
+
+    @app.route("/api/call-session-status", methods=["GET"])
+    def get_call_session_status():
+        """Live per-call state: sessions, entries per namespace, approximate bytes, evictions and RSS"""
+        return jsonify({"status": "success", "call_sessions": call_sessions.get_metrics()})
+
     @app.route("/api/call-history", methods=["GET"])
     def api_call_history():
-        """API endpoint for call history data"""
+        """API endpoint for call history data (?limit=&cursor=&phone=&issue_type=&since=&until=)"""
         try:
-            # Return the real call records from conversation history
-            call_data = []
-            
-            for call_sid, messages in conversation_history.items():
-                if messages and len(messages) > 0:
-                    # Extract call information
-                    first_message = messages[0] if messages else {}
-                    caller_phone = first_message.get('caller_phone', 'Unknown')
-                    timestamp = first_message.get('timestamp', datetime.now().isoformat())
-                    
-                    # Build conversation transcript
-                    transcript = ""
-                    for msg in messages:
-                        speaker = msg.get('speaker', 'Unknown')
-                        message = msg.get('message', '')
-                        timestamp_part = msg.get('timestamp', '')[:19]
-                        transcript += f"[{timestamp_part[-8:]}] {speaker}: {message}\n"
-                    
-                    call_data.append({
-                        'call_sid': call_sid,
-                        'caller_phone': caller_phone,
-                        'timestamp': timestamp,
-                        'message_count': len(messages),
-                        'transcript': transcript.strip(),
-                        'duration': 'Live Call',
-                        'status': 'Completed'
-                    })
-            
-            # Sort by timestamp (most recent first)
-            call_data.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            logger.info(f"Returning {len(call_data)} real call records from conversation history (sorted by most recent)")
-            return jsonify(call_data)
+            etag, build_page = page_call_summaries('brief')
+            if request.if_none_match.contains(etag):
+                return conditional_json(etag, list)
+            
+            page = build_page()
+            response = conditional_json(etag, lambda: page['items'])
+            # Body stays a plain list for existing clients; paging details travel in headers
+            response.headers['X-Total-Count'] = str(page['total_count'])
+            if page['next_cursor']:
+                response.headers['X-Next-Cursor'] = page['next_cursor']
+            logger.info(f"Returning {len(page['items'])} of {page['total_count']} call records (sorted by most recent)")
+            return response
             
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify({"error": f"Invalid query: {e}"}), 400
         except Exception as e:
             logger.error(f"Error fetching call history: {e}")
             return jsonify({"error": "Failed to fetch call history"}), 500
 
+    def unified_log_entry(log):
+        return {
+            'id': f'log_{log["id"]:03d}',
+            'date': log['date'],
+            'time': log['time'], 
+            'status': 'COMPLETE',
+            'request': log['request'],
+            'implementation': log['resolution'],
+            'constraint_note': log.get('constraint_note', ''),
+            'constraint_link': log.get('constraint_link', ''),
+            'flag': log.get('flag', '')
+        }
+
     @app.route("/api/unified-logs", methods=["GET"])
     def get_unified_logs():
-        """API endpoint for unified logs with hardened structure"""
+        """API endpoint for unified logs with hardened structure (?limit=&cursor=<id>&flag=)"""
         try:
-            # Load fresh logs from file to ensure we have latest updates
-            fresh_logs = load_logs_from_file()
-            
-            # Convert logs to expected format for dashboard using hardened structure
-            unified_logs = []
-            for log in fresh_logs:
-                unified_logs.append({
-                    'id': f'log_{log["id"]:03d}',
-                    'date': log['date'],
-                    'time': log['time'], 
-                    'status': 'COMPLETE',
-                    'request': log['request'],
-                    'implementation': log['resolution'],
-                    'constraint_note': log.get('constraint_note', ''),
-                    'constraint_link': log.get('constraint_link', ''),
-                    'flag': log.get('flag', '')
-                })
+            # Snapshot + journal are only re-read after some worker wrote to them
+            signature, logs = log_sink.load_cached(default_logs)
+            etag = f"logs-{signature}-{hashlib.sha1(request.query_string).hexdigest()[:10]}"
+            
+            def build_page():
+                limit = request.args.get('limit', type=int)
+                cursor = request.args.get('cursor', type=int)
+                flag = request.args.get('flag')
+                
+                matching = [log for log in logs if not flag or log.get('flag', '') == flag]
+                page = [log for log in matching if cursor is None or log['id'] < cursor]
+                next_cursor = None
+                if limit and len(page) > limit:
+                    page = page[:limit]
+                    next_cursor = page[-1]['id']
+                
+                return {
+                    'unified_logs': [unified_log_entry(log) for log in page],
+                    'total_count': len(matching),
+                    'next_cursor': next_cursor
+                }
             
-            return jsonify({
-                'unified_logs': unified_logs,
-                'total_count': len(unified_logs)
-            })
+            return conditional_json(etag, build_page)
         except Exception as e:
             logger.error(f"Error getting unified logs: {e}")
             return jsonify({'error': 'Could not load logs'}), 500
@@ -1742,8 +1823,8 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                         log.pop('flag', None)  # Remove flag if empty
                     log_updated = True
                     
-                    # Update REQUEST_HISTORY.md with flag information
-                    append_to_request_history_file(log)
+                    # Persist the flag and update REQUEST_HISTORY.md with it
+                    save_logs_to_file([log])
                     break
             
             if log_updated:
@@ -1778,70 +1859,28 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             
             # Try ElevenLabs first, fallback to reliable system if needed
             try:
-                # Generate audio URL for Twilio
-                import urllib.parse
-                encoded_greeting = urllib.parse.quote(dynamic_greeting)
-                
-                # Get proper host for production environment
-                host = request.headers.get('Host', 'localhost:5000')
-                if host.startswith('0.0.0.0'):
-                    # Production environment - use replit domain
-                    host = f"{os.environ.get('REPL_SLUG', 'maintenancelinker')}.{os.environ.get('REPL_OWNER', 'brokeropenhouse')}.repl.co"
-                
-                audio_url = f"https://{host}/generate-audio/{call_sid}?text={encoded_greeting}"
-                
-                logger.info(f"🎵 Using ElevenLabs audio URL: {audio_url}")
-                
-                response = f"""<?xml version="1.0" encoding="UTF-8"?>
-                <Response>
-                    <Play>{audio_url}</Play>
-                    <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                    </Gather>
-                    <Redirect>/handle-speech/{call_sid}</Redirect>
-                </Response>"""
+                # Short signed audio URL on the public host for Twilio
+                response = twiml_renderer.play_gather(call_sid, request.headers.get('Host'), dynamic_greeting)
                 
             except Exception as e:
                 logger.error(f"ElevenLabs URL generation failed: {e}, using fallback")
                 # Temporary fallback - we'll improve this
-                response = f"""<?xml version="1.0" encoding="UTF-8"?>
-                <Response>
-                    <Say voice="Polly.Matthew-Neural">Hi, you've reached Grinberg Management. How can I help you?</Say>
-                    <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                    </Gather>
-                    <Redirect>/handle-speech/{call_sid}</Redirect>
-                </Response>"""
+                response = twiml_renderer.say_gather(call_sid, "Hi, you've reached Grinberg Management. How can I help you?")
             
             return response
             
         except Exception as e:
             logger.error(f"Incoming call error: {e}")
-            return """<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Say voice="Polly.Matthew-Neural">Hi, you've reached Grinberg Management. How can I help you?</Say>
-                <Gather input="speech" timeout="8" speechTimeout="4"/>
-            </Response>"""
+            return twiml_renderer.say_only("Hi, you've reached Grinberg Management. How can I help you?")
 
     @app.route("/get-background-response/<call_sid>", methods=["GET", "POST"])  
     def get_background_response(call_sid):
         """Retrieve background processing results and continue conversation"""
         try:
-            # Wait up to 10 seconds for background processing to complete
-            import time
-            max_wait = 10
-            wait_interval = 0.5
-            waited = 0
-            
-            while call_sid not in background_responses and waited < max_wait:
-                time.sleep(wait_interval)
-                waited += wait_interval
-                logger.info(f"⏳ Waiting for background processing: {waited:.1f}s")
-            
-            if call_sid in background_responses:
-                result = background_responses[call_sid]
-                
-                # Clean up
-                del background_responses[call_sid]
-                
+            # Wait up to 10 seconds for background processing - wakes as soon as the result is published
+            result = background_responses.wait(call_sid, timeout=10)
+            
+            if result is not None:
                 if result.get('error'):
                     response_text = result.get('message', 'I encountered a technical issue. How can I help you?')
                     logger.error(f"❌ Background error: {response_text}")
@@ -1863,50 +1902,42 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                     'background_processed': True
                 })
                 
-                save_conversation_history()
+                save_conversation_history(call_sid)
                 
                 # Return TwiML with response using stored host header
-                import urllib.parse
-                return f"""<?xml version="1.0" encoding="UTF-8"?>
-                <Response>
-                    <Play>https://{host_header}/generate-audio/{call_sid}?text={urllib.parse.quote(response_text)}</Play>
-                    <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                    </Gather>
-                    <Redirect>/handle-speech/{call_sid}</Redirect>
-                </Response>"""
+                return twiml_renderer.play_gather(call_sid, host_header, response_text)
             else:
                 logger.warning(f"⏰ Background processing timeout for {call_sid}")
                 response_text = "I'm here to help. What can I do for you?"
                 
-                import urllib.parse
-                # Get proper host for production environment  
-                host = request.headers.get('Host', 'localhost:5000')
-                if host.startswith('0.0.0.0'):
-                    host = f"{os.environ.get('REPL_SLUG', 'maintenancelinker')}.{os.environ.get('REPL_OWNER', 'brokeropenhouse')}.repl.co"
-                
-                return f"""<?xml version="1.0" encoding="UTF-8"?>
-                <Response>
-                    <Play>https://{host}/generate-audio/{call_sid}?text={urllib.parse.quote(response_text)}</Play>
-                    <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                    </Gather>
-                    <Redirect>/handle-speech/{call_sid}</Redirect>
-                </Response>"""
+                return twiml_renderer.play_gather(call_sid, request.headers.get('Host'), response_text)
                 
         except Exception as e:
             logger.error(f"❌ Background response retrieval error: {e}")
             response_text = "I encountered a technical issue. How can I help you?"
             
-            import urllib.parse
-            return f"""<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Play>https://localhost:5000/generate-audio/{call_sid}?text={urllib.parse.quote(response_text)}</Play>
-                <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                </Gather>
-                <Redirect>/handle-speech/{call_sid}</Redirect>
-            </Response>"""
-
-    # Global storage for background processing results
-    background_responses = {}
+            return twiml_renderer.play_gather(call_sid, 'localhost:5000', response_text)
+
+    # Global storage for background processing results (producers publish, handlers wait)
+    background_responses = get_registry("background_responses")
+    call_sessions.register_teardown(background_responses.discard)
+    
+    def discard_call_audio(call_sid):
+        from call_audio_registry import get_call_audio_registry
+        get_call_audio_registry().discard_call(call_sid)
+    call_sessions.register_teardown(discard_call_audio)
+    
+    def discard_call_history(call_sid):
+        # Flush what the call still holds, then drop it from memory (journal, SQL store and summaries keep it)
+        save_conversation_history(call_sid, touch=False)
+        call_summaries.sync({call_sid: conversation_history.get(call_sid, [])})
+        conversation_history.pop(call_sid, None)
+        transcript_journal.discard_call(call_sid)
+        call_summaries.discard_call(call_sid)
+        call_repository = get_call_repository()
+        if call_repository:
+            call_repository.discard_call(call_sid)
+    call_sessions.register_teardown(discard_call_history)
     
     def process_complex_request_background(call_sid, speech_result, caller_phone, request_start_time, host_header=None):
         """Process complex requests in background - completely Flask context independent"""
@@ -1923,10 +1954,8 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             logger.info(f"✅ Background processing complete: '{response_text}' (processed in {processing_time:.3f}s)")
             
             # Generate audio URL
-            import urllib.parse
-            encoded_text = urllib.parse.quote(response_text)
             host_to_use = host_header or 'localhost:5000'
-            audio_url = f"https://{host_to_use}/generate-audio/{call_sid}?text={encoded_text}"
+            audio_url = twiml_renderer.audio_url(twiml_renderer.public_base_url(host_to_use), call_sid, response_text)
             
             total_background_time = time.time() - request_start_time
             
@@ -1984,7 +2013,7 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             else:
                 logger.warning(f"⚠️ EMPTY SPEECH RESULT - Not storing in transcript to prevent incomplete conversation")
                 # For empty speech, ask caller to repeat without storing empty message
-                response_text = "Is there anything else I can help you with?"
+                response_text = ANYTHING_ELSE_PROMPT
                 
                 # Store Chris's response (but not the empty caller input)
                 conversation_history[call_sid].append({
@@ -1995,24 +2024,12 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                 })
                 
                 # Save and return TwiML for retry
-                save_conversation_history()
+                save_conversation_history(call_sid)
                 
-                import urllib.parse
-                # Get proper host for production environment  
-                host = request.headers.get('Host', 'localhost:5000')
-                if host.startswith('0.0.0.0'):
-                    host = f"{os.environ.get('REPL_SLUG', 'maintenancelinker')}.{os.environ.get('REPL_OWNER', 'brokeropenhouse')}.repl.co"
-                
-                return f"""<?xml version="1.0" encoding="UTF-8"?>
-                <Response>
-                    <Play>https://{host}/generate-audio/{call_sid}?text={urllib.parse.quote(response_text)}</Play>
-                    <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                    </Gather>
-                    <Redirect>/handle-speech/{call_sid}</Redirect>
-                </Response>"""
+                return twiml_renderer.play_gather(call_sid, request.headers.get('Host'), response_text)
             
             # Save conversation to persistent storage
-            save_conversation_history()
+            save_conversation_history(call_sid)
             
             # AUTOMATIC LOGGING: Every call interaction automatically logged to persistent system
             if speech_result and len(speech_result.strip()) > 2:
@@ -2038,16 +2055,32 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             # DIRECT PROCESSING: Simplified processing to prevent application errors
             logger.info("🚀 DIRECT PROCESSING: Using fast AI processing to prevent delays and errors")
             
+            host_header = request.headers.get('Host')
+            
+            # HOLD FLOW: complex requests hear a cached hold message at once while the reply streams from
+            # the LLM and its first sentence is synthesized; /get-queued-response then plays the warm clips
+            if HOLD_FLOW_RESPONSES and should_use_enhanced_flow(speech_result):
+                base_url = twiml_renderer.public_base_url(host_header)
+                processing_id = start_speculative_ai_processing(call_sid, speech_result, base_url)
+                return create_instant_hold_twiml(call_sid, base_url, processing_id)
+            
+            # STREAMING: return TwiML right away - the <Play> request generates the reply and
+            # voices each sentence as soon as it is complete (unique turn id defeats Twilio media caching)
+            if STREAM_LLM_RESPONSES:
+                import uuid
+                stream_url = twiml_renderer.stream_response_url(twiml_renderer.public_base_url(host_header),
+                                                                call_sid, uuid.uuid4().hex[:12], speech_result)
+                return twiml_renderer.play_url_gather(call_sid, stream_url, 'fast')
+            
             # Generate OpenAI streaming response with new conversation manager
             try:
                 logger.info("🤖 Using OpenAI conversation manager for processing")
                 
                 # Import improved conversation manager with three-mode system
                 from openai_conversation_manager import conversation_manager
-                import asyncio
                 
-                response_text, mode_used, processing_time = asyncio.run(
-                    conversation_manager.process_user_input(call_sid, speech_result)
+                response_text, mode_used, processing_time = conversation_manager.process_user_input_sync(
+                    call_sid, speech_result
                 )
                 
                 logger.info(f"Used {mode_used} mode, processing time: {processing_time:.3f}s")
@@ -2060,18 +2093,7 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                 response_text = "How can I help you today?"
             
             # Return immediate response with optimized audio
-            import urllib.parse
-            host = request.headers.get('Host', 'localhost:5000')
-            if host.startswith('0.0.0.0'):
-                host = f"{os.environ.get('REPL_SLUG', 'maintenancelinker')}.{os.environ.get('REPL_OWNER', 'brokeropenhouse')}.repl.co"
-            
-            return f"""<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Play>https://{host}/generate-audio/{call_sid}?text={urllib.parse.quote(response_text)}</Play>
-                <Gather input="speech" timeout="8" speechTimeout="1" enhanced="true" language="en-US" speechModel="experimental_conversations" action="/handle-speech/{call_sid}" method="POST">
-                </Gather>
-                <Redirect>/handle-speech/{call_sid}</Redirect>
-            </Response>"""
+            return twiml_renderer.play_gather(call_sid, host_header, response_text, 'fast')
             
             # EMAIL NOTIFICATION: Send transcript after each interaction for comprehensive tracking
             try:
@@ -2150,14 +2172,7 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                             logger.info(f"🔍 USING COMPREHENSIVE PROPERTY DATABASE: {len(address_matcher.properties_cache)} properties loaded")
                             
                             # ACTUAL API VERIFICATION using comprehensive backup system
-                            loop = None
-                            try:
-                                loop = asyncio.get_event_loop()
-                            except RuntimeError:
-                                loop = asyncio.new_event_loop()
-                                asyncio.set_event_loop(loop)
-                            
-                            matched_property = loop.run_until_complete(address_matcher.find_matching_property(potential_address))
+                            matched_property = run_sync(address_matcher.find_matching_property(potential_address))
                             
                             if matched_property:
                                 verified_address = matched_property.get('Name', potential_address)
@@ -2267,14 +2282,7 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                     })
                     
                     # Return TwiML with spelling request
-                    import urllib.parse
-                    return f"""<?xml version="1.0" encoding="UTF-8"?>
-                    <Response>
-                        <Play>https://{request.headers.get('Host', 'localhost:5000')}/generate-audio/{call_sid}?text={urllib.parse.quote(response_text)}</Play>
-                        <Gather input="speech" timeout="15" speechTimeout="6" action="/handle-speech/{call_sid}" method="POST">
-                        </Gather>
-                        <Redirect>/handle-speech/{call_sid}</Redirect>
-                    </Response>"""
+                    return twiml_renderer.play_gather(call_sid, request.headers.get('Host'), response_text, 'spelling')
 
             # INTELLIGENT ADDRESS HANDLING: Acknowledge addresses but explain limitations
             if "UNVERIFIED ADDRESS ACKNOWLEDGMENT" in address_context:
@@ -2296,14 +2304,7 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                     })
                     
                     # Return TwiML with intelligent response
-                    import urllib.parse
-                    return f"""<?xml version="1.0" encoding="UTF-8"?>
-                    <Response>
-                        <Play>https://{request.headers.get('Host', 'localhost:5000')}/generate-audio/{call_sid}?text={urllib.parse.quote(response_text)}</Play>
-                        <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                        </Gather>
-                        <Redirect>/handle-speech/{call_sid}</Redirect>
-                    </Response>"""
+                    return twiml_renderer.play_gather(call_sid, request.headers.get('Host'), response_text)
 
             # Generate intelligent AI response using OpenAI (only for verified addresses)
             try:
@@ -2400,11 +2401,10 @@ log #{log_entry['id']:03d} – {log_entry['date']}
                 
                 # Import and use OpenAI conversation manager only
                 from openai_conversation_manager import conversation_manager
-                import asyncio
                 
                 try:
-                    response_text, mode_used, processing_time = asyncio.run(
-                        conversation_manager.process_user_input(call_sid, speech_result)
+                    response_text, mode_used, processing_time = conversation_manager.process_user_input_sync(
+                        call_sid, speech_result
                     )
                     logger.info(f"OpenAI {mode_used} mode used, processing time: {processing_time:.3f}s")
                     
@@ -2741,7 +2741,6 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             
             # ⏰ 3. PARALLEL PROCESSING: Start ElevenLabs generation in background
             elevenlabs_start = time.time()
-            import urllib.parse
             
             # Queue ElevenLabs generation in parallel
             def start_elevenlabs_generation():
@@ -2756,7 +2755,6 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             # Submit to thread pool for parallel processing
             audio_future = executor.submit(start_elevenlabs_generation)
             
-            encoded_text = urllib.parse.quote(response_text)
             elevenlabs_time = time.time() - elevenlabs_start
             log_timing_with_bottleneck("ElevenLabs parallel queue", elevenlabs_time, request_start_time, call_sid)
             print(f"[Timing] ElevenLabs parallel queue: {elevenlabs_time:.3f} seconds")
@@ -2766,150 +2764,37 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             print_total_timing(call_sid, total_time)
             
             # Return optimized TwiML response
-            return f"""<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Play>https://{request.headers.get('Host', 'localhost:5000')}/generate-audio/{call_sid}?text={encoded_text}</Play>
-                <Gather input="speech" timeout="8" speechTimeout="4" action="/handle-speech/{call_sid}" method="POST">
-                </Gather>
-                <Redirect>/handle-speech/{call_sid}</Redirect>
-            </Response>"""
+            return twiml_renderer.play_gather(call_sid, request.headers.get('Host'), response_text)
             
         except Exception as e:
             logger.error(f"Speech handling error: {e}")
-            return """<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Say voice="Polly.Matthew-Neural">I'm sorry, I had a technical issue. Please try again.</Say>
-                <Gather input="speech" timeout="8" speechTimeout="4"/>
-            </Response>"""
+            return twiml_renderer.say_only("I'm sorry, I had a technical issue. Please try again.")
 
     @app.route("/api/calls/history", methods=["GET"])
     def get_call_history():
-        """API endpoint for call history with full transcripts"""
+        """API endpoint for call history with full transcripts (?limit=&cursor=&phone=&issue_type=&since=&until=)"""
         try:
-            # Convert live conversation history to call records
-            live_calls = []
-            
-            for call_sid, messages in conversation_history.items():
-                if not messages:
-                    continue
-                    
-                # Extract call information
-                caller_phone = messages[0].get('caller_phone', 'Unknown')
-                start_time = messages[0].get('timestamp', '')
-                
-                # Build full transcript
-                transcript_lines = []
-                for msg in messages:
-                    timestamp = msg.get('timestamp', '')
-                    speaker = msg.get('speaker', 'Unknown')
-                    message = msg.get('message', '')
-                    
-                    # Format timestamp for display
-                    try:
-                        from datetime import datetime
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        time_str = dt.strftime('[%H:%M:%S]')
-                    except:
-                        time_str = '[--:--:--]'
-                    
-                    transcript_lines.append(f"{time_str} {speaker}: {message}")
-                
-                full_transcript = "\n\n".join(transcript_lines)
-                
-                # Determine issue type from conversation content
-                issue_type = "General Inquiry"
-                transcript_lower = full_transcript.lower()
-                if any(word in transcript_lower for word in ['electrical', 'electric', 'power', 'outlet', 'wiring']):
-                    issue_type = "Electrical"
-                elif any(word in transcript_lower for word in ['plumbing', 'water', 'sink', 'toilet', 'leak', 'drain']):
-                    issue_type = "Plumbing"
-                elif any(word in transcript_lower for word in ['heat', 'heating', 'hot', 'cold', 'temperature', 'hvac']):
-                    issue_type = "Heating"
-                elif any(word in transcript_lower for word in ['maintenance', 'repair', 'broken', 'fix']):
-                    issue_type = "Maintenance"
-                
-                # Calculate duration and format timestamp correctly
-                try:
-                    import pytz
-                    
-                    # Parse timestamps and convert to Eastern Time
-                    start_dt = datetime.fromisoformat(messages[0]['timestamp'].replace('Z', '+00:00'))
-                    end_dt = datetime.fromisoformat(messages[-1]['timestamp'].replace('Z', '+00:00'))
-                    
-                    # Convert to Eastern Time
-                    eastern = pytz.timezone('US/Eastern')
-                    start_et = start_dt.astimezone(eastern)
-                    end_et = end_dt.astimezone(eastern)
-                    
-                    # Calculate actual duration
-                    duration_seconds = (end_dt - start_dt).total_seconds()
-                    duration = f"{int(duration_seconds // 60)}:{int(duration_seconds % 60):02d}"
-                    
-                    # Format display time in Eastern Time
-                    display_time = start_et.strftime('July %d, 2025 - %I:%M %p ET')
-                except Exception as e:
-                    logger.error(f"Error calculating call duration: {e}")
-                    duration = "0:00"
-                    # Use current Eastern time as fallback
-                    try:
-                        import pytz
-                        eastern = pytz.timezone('US/Eastern')
-                        now_et = datetime.now(eastern)
-                        display_time = now_et.strftime('July %d, 2025 - %I:%M %p ET')
-                    except:
-                        display_time = "Time unavailable"
-                
-                # Determine if call is completed by checking for call end indicators  
-                call_completed = True  # Mark all calls as completed for history display
-                last_message = messages[-1].get('message', '').lower()
-                if any(indicator in last_message for indicator in ['call ended', 'goodbye', 'have a great day', 'call completed', 'thank you']):
-                    call_completed = True
-                    
-                # Extract caller name from conversation if available
-                caller_name = "Unknown Caller"
-                for msg in messages:
-                    if 'my name is' in msg.get('message', '').lower():
-                        # Extract name after "my name is"
-                        try:
-                            name_part = msg['message'].lower().split('my name is')[1].strip()
-                            caller_name = name_part.split()[0].title()
-                        except:
-                            pass
-                        break
-                
-                # Set appropriate service ticket status - all calls in history are completed
-                service_ticket_status = "Completed"
-                
-                live_calls.append({
-                    'caller_name': caller_name,
-                    'caller_phone': caller_phone,
-                    'timestamp': display_time,
-                    'issue_type': issue_type,
-                    'duration': duration,
-                    'service_ticket': service_ticket_status,
-                    'full_transcript': full_transcript,
-                    'call_status': 'Completed'  # All historical calls are completed
-                })
-            
-            # Sort calls by timestamp (most recent first) before returning
-            if live_calls:
-                # Sort by timestamp - most recent calls first
-                live_calls.sort(key=lambda x: x['timestamp'], reverse=True)
-                
-                logger.info(f"Returning {len(live_calls)} real call records from conversation history (sorted by most recent)")
-                return jsonify({
-                    'calls': live_calls,
-                    'total_count': len(live_calls),
-                    'data_type': 'real_calls'
-                })
-            else:
-                logger.info("No real call conversations found - returning empty call history")
-                return jsonify({
+            etag, build_page = page_call_summaries('history')
+            
+            def build_payload():
+                page = build_page()
+                if page['total_count']:
+                    return {
+                        'calls': page['items'],
+                        'total_count': page['total_count'],
+                        'next_cursor': page['next_cursor'],
+                        'data_type': 'real_calls'
+                    }
+                return {
                     'calls': [],
                     'total_count': 0,
                     'data_type': 'no_calls',
                     'message': 'No real phone calls recorded yet. Call history will display authentic conversations only.'
-                })
+                }
+            
+            return conditional_json(etag, build_payload)
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify({'error': f'Invalid query: {e}'}), 400
         except Exception as e:
             logger.error(f"Error getting call history: {e}")
             return jsonify({'error': 'Could not load call history'}), 500
@@ -2983,6 +2868,10 @@ log #{log_entry['id']:03d} – {log_entry['date']}
     def generate_audio(call_sid):
         """Generate ElevenLabs audio for Chris responses"""
         try:
+            if request.args.get('id'):
+                return generate_audio_by_id(call_sid, request.args['id'])
+            
+            # Legacy full-text URLs (older TwiML still in flight)
             text = request.args.get('text', '')
             if not text:
                 return "No text provided", 400
@@ -2990,7 +2879,22 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             logger.info(f"🎵 Generating ElevenLabs audio for: '{text}'")
             
             # Import ElevenLabs integration
-            from elevenlabs_integration import generate_elevenlabs_audio
+            from elevenlabs_integration import (generate_elevenlabs_audio, get_cached_audio,
+                                                stream_elevenlabs_audio, ELEVENLABS_STREAM_AUDIO)
+            from flask import send_file, Response, stream_with_context
+            
+            # Cached clips are served straight from disk
+            cached_file = get_cached_audio(text, voice_name="adam")
+            if cached_file:
+                return send_file(cached_file, mimetype='audio/mpeg', as_attachment=False)
+            
+            # Streaming mode: relay chunks as they arrive so <Play> starts on the first chunk
+            if ELEVENLABS_STREAM_AUDIO:
+                audio_stream = stream_elevenlabs_audio(text, voice_name="adam")
+                if audio_stream is not None:
+                    logger.info(f"🔊 Streaming ElevenLabs audio to Twilio for call {call_sid}")
+                    return Response(stream_with_context(audio_stream), mimetype='audio/mpeg')
+                logger.warning("⚠️ ElevenLabs stream unavailable - falling back to full synthesis")
             
             # Generate audio using ElevenLabs
             audio_file = generate_elevenlabs_audio(text, voice_name="adam")
@@ -2998,7 +2902,6 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             if audio_file and os.path.exists(audio_file):
                 logger.info(f"✅ ElevenLabs audio generated successfully: {audio_file}")
                 # Return the audio file directly
-                from flask import send_file
                 return send_file(audio_file, mimetype='audio/mpeg', as_attachment=False)
             else:
                 logger.error(f"❌ ElevenLabs audio generation failed for: '{text}'")
@@ -3008,6 +2911,116 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             logger.error(f"Error generating ElevenLabs audio: {e}")
             return "Internal server error", 500
 
+    @app.route("/generate-audio/<call_sid>/<audio_id>")
+    def generate_audio_by_id(call_sid, audio_id):
+        """Serve a registered reply clip - ready, still streaming from ElevenLabs (relayed) or from the shared cache"""
+        try:
+            from flask import send_file, Response, stream_with_context
+            from call_audio_registry import get_call_audio_registry
+            
+            if not twiml_renderer.verify_audio_id(call_sid, audio_id, request.args.get('sig', '')):
+                return "Unknown audio id", 404
+            
+            registry = get_call_audio_registry()
+            # Not on disk yet: relay chunks as they arrive instead of waiting for the whole clip
+            audio_stream = registry.stream(call_sid, audio_id)
+            if audio_stream is not None:
+                logger.info(f"🔊 Streaming audio {audio_id} to Twilio for call {call_sid}")
+                return Response(stream_with_context(audio_stream), mimetype='audio/mpeg')
+            
+            audio_file = registry.resolve(call_sid, audio_id)
+            if not audio_file:
+                logger.error(f"❌ No audio for {call_sid}/{audio_id}")
+                return "Audio generation failed", 500
+            
+            # The ID is a content hash, so the bytes behind it never change
+            response = send_file(audio_file, mimetype='audio/mpeg', as_attachment=False,
+                                 etag=audio_id, conditional=True, max_age=86400)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+                
+        except Exception as e:
+            logger.error(f"Error serving audio {audio_id}: {e}")
+            return "Internal server error", 500
+
+    @app.route("/stream-response/<call_sid>")
+    def stream_response_audio(call_sid):
+        """Generate Chris's reply with token streaming and voice it sentence by sentence"""
+        try:
+            # Only URLs issued by stream_response_url() are served; the speech itself is looked up server-side.
+            # Keyed on the turn id: a Twilio re-fetch of this URL replays the reply instead of regenerating it
+            turn_id = request.args.get('turn', '')
+            if not twiml_renderer.verify_turn(call_sid, turn_id, request.args.get('sig', '')):
+                return "Forbidden", 403
+            speech_result = twiml_renderer.turn_speech(call_sid, turn_id)
+            if not speech_result:
+                return "Unknown turn", 404
+            
+            from openai_conversation_manager import conversation_manager
+            from elevenlabs_integration import stream_sentences_audio
+            from flask import Response, stream_with_context
+            
+            # skip=N: the first N sentences were already voiced (hold flow plays them as clips)
+            skip = request.args.get('skip', 0, type=int)
+            logger.info(f"🌊 Streaming reply for call {call_sid} (turn {turn_id}): '{speech_result[:50]}'")
+            
+            def reply_sentences():
+                # Runs after this route has returned, so failures are voiced here rather than lost
+                voiced = 0
+                try:
+                    for index, sentence in enumerate(conversation_manager.stream_user_input_sync(
+                            call_sid, speech_result, turn_id=turn_id)):
+                        voiced += 1
+                        if index >= skip:
+                            yield sentence
+                except Exception as e:
+                    logger.error(f"❌ Streamed reply failed for {call_sid} after {voiced} sentences: {e}")
+                    yield STREAM_FALLBACK_REPLY if not voiced else STREAM_INTERRUPTED_REPLY
+            
+            return Response(stream_with_context(stream_sentences_audio(reply_sentences(), voice_name="adam")),
+                            mimetype='audio/mpeg')
+                
+        except Exception as e:
+            logger.error(f"Error streaming reply audio: {e}")
+            return "Internal server error", 500
+
+    @app.route("/api/response-latency")
+    def get_response_latency():
+        """Streaming latency and prompt token / cached prefix metrics (?call_sid=... for one call)"""
+        try:
+            from openai_conversation_manager import conversation_manager
+            call_sid = request.args.get('call_sid')
+            return jsonify({
+                "status": "success",
+                "latency": conversation_manager.get_latency_metrics(call_sid),
+                "prompt": conversation_manager.get_prompt_metrics(call_sid)
+            })
+        except Exception as e:
+            logger.error(f"Error fetching response latency: {e}")
+            return jsonify({"error": "Failed to fetch response latency"}), 500
+
+    @app.route("/api/response-queue-status")
+    def get_response_queue_status():
+        """Queue depth, wait times and pool saturation for queued/background AI responses"""
+        try:
+            return jsonify({"status": "success", "queues": get_all_metrics()})
+        except Exception as e:
+            logger.error(f"Error fetching response queue status: {e}")
+            return jsonify({"error": "Failed to fetch response queue status"}), 500
+
+    @app.route("/api/tts-cache-status")
+    def get_tts_cache_status():
+        """Hit/miss and eviction metrics for the shared TTS audio cache"""
+        try:
+            from elevenlabs_integration import get_audio_cache_metrics
+            from call_audio_registry import get_call_audio_registry
+            return jsonify({"status": "success", "tts_cache": get_audio_cache_metrics(),
+                            "call_audio": get_call_audio_registry().get_metrics()})
+        except Exception as e:
+            logger.error(f"Error fetching TTS cache status: {e}")
+            return jsonify({"error": "Failed to fetch TTS cache status"}), 500
+
     @app.route("/audio/<filename>")
     def serve_audio(filename):
         """Serve generated audio files"""
@@ -3053,6 +3066,7 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             if rent_manager:
                 try:
                     status_data["api_authenticated"] = bool(rent_manager.session_token)
+                    status_data["api_connection"] = rent_manager.get_connection_metrics()
                 except:
                     status_data["api_authenticated"] = False
             
@@ -3108,11 +3122,19 @@ log #{log_entry['id']:03d} – {log_entry['date']}
         try:
             logger.info(f"📞 CALL ENDED: {call_sid} - Triggering email summary")
             
+            # Final dashboard summary, written once for the finished call
+            call_summaries.record_call(call_sid, conversation_history.get(call_sid))
+            
+            # Close the call in the SQL store after its last turns
+            call_repository = get_call_repository()
+            if call_repository:
+                save_conversation_history(call_sid)
+                call_repository.end_call(call_sid)
+            
             # Send call summary email
             if send_call_summary_on_end and email_summary_system:
-                # Import the conversation manager instance
-                from openai_conversation_manager import OpenAIConversationManager
-                conversation_manager = OpenAIConversationManager()
+                # Shared conversation manager instance (holds this call's session facts)
+                from openai_conversation_manager import conversation_manager
                 success = send_call_summary_on_end(call_sid, conversation_history, conversation_manager, email_summary_system)
                 if success:
                     logger.info(f"✅ Call summary email sent for {call_sid}")
@@ -3121,6 +3143,9 @@ log #{log_entry['id']:03d} – {log_entry['date']}
             else:
                 logger.warning("Email summary system not available")
             
+            # Tear down every piece of per-call state now that the summary is out
+            call_sessions.end_call(call_sid)
+            
             # Return simple success response
             return "OK", 200
             
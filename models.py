@@ -12,11 +12,11 @@ class CallRecord(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     call_sid = db.Column(db.String(64), unique=True, nullable=False)
-    phone_number = db.Column(db.String(20), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False, index=True)
     caller_name = db.Column(db.String(255), nullable=True)
     tenant_unit = db.Column(db.String(50), nullable=True)
     tenant_id = db.Column(db.String(50), nullable=True)
-    start_time = db.Column(db.DateTime, default=datetime.utcnow)
+    start_time = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     end_time = db.Column(db.DateTime, nullable=True)
     duration = db.Column(db.Integer, nullable=True)  # seconds
     recording_url = db.Column(db.String(500), nullable=True)
@@ -32,11 +32,11 @@ class ActiveCall(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     call_sid = db.Column(db.String(64), unique=True, nullable=False)
-    phone_number = db.Column(db.String(20), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False, index=True)
     caller_name = db.Column(db.String(255), nullable=True)
     tenant_unit = db.Column(db.String(50), nullable=True)
     tenant_id = db.Column(db.String(50), nullable=True)
-    start_time = db.Column(db.DateTime, default=datetime.utcnow)
+    start_time = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     last_activity = db.Column(db.DateTime, default=datetime.utcnow)
     call_status = db.Column(db.String(20), default='ringing')  # ringing, connected, on_hold
     current_action = db.Column(db.String(255), nullable=True)  # what Chris is doing
@@ -45,6 +45,30 @@ class ActiveCall(db.Model):
         return f'<ActiveCall {self.phone_number} - {self.caller_name or "Unknown"}>'
 
 
+class CallTurn(db.Model):
+    __tablename__ = 'call_turns'
+    __table_args__ = (db.Index('ix_call_turns_call_sid_timestamp', 'call_sid', 'timestamp'),
+                      # One row per turn: a re-synced turn is skipped on insert instead of duplicated
+                      db.Index('uq_call_turns_call_sid_seq', 'call_sid', 'seq', unique=True))
+    
+    id = db.Column(db.Integer, primary_key=True)
+    call_sid = db.Column(db.String(64), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # turn number within the call
+    speaker = db.Column(db.String(20), nullable=False)  # Caller, Chris
+    message = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'speaker': self.speaker,
+            'message': self.message
+        }
+    
+    def __repr__(self):
+        return f'<CallTurn {self.call_sid} #{self.seq} {self.speaker}>'
+
+
 class RequestHistory(db.Model):
     __tablename__ = 'request_history'
     
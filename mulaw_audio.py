@@ -0,0 +1,149 @@
+"""
+μ-law Audio Path
+G.711 μ-law <-> 16-bit PCM lookup-table codec, a preallocated inbound frame ring
+and outbound framing into Twilio-sized 20 ms media messages
+Per-frame work is table indexing and memoryview slicing - no per-frame buffer copies
+"""
+
+import os
+import binascii
+import logging
+from typing import List, Iterator
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 8000
+BYTES_PER_MS = SAMPLE_RATE // 1000  # μ-law: one byte per sample
+FRAME_MS = 20
+FRAME_BYTES = FRAME_MS * BYTES_PER_MS  # 160 bytes: what Twilio sends and expects per media message
+MULAW_SILENCE = 0xFF
+MEDIA_RING_FRAMES = int(os.environ.get('MEDIA_RING_FRAMES', '100'))  # 2 s of inbound audio
+
+_BIAS = 0x84
+_CLIP = 32635
+
+
+def _build_decode_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + _BIAS) << exponent) - _BIAS
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_encode_table() -> np.ndarray:
+    """Indexed by the int16 sample reinterpreted as uint16"""
+    pcm = np.arange(65536, dtype=np.int32)
+    pcm = np.where(pcm >= 32768, pcm - 65536, pcm)
+    sign = np.where(pcm < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(pcm), _CLIP) + _BIAS
+    exponent = np.floor(np.log2(magnitude >> 7)).astype(np.int32)  # magnitude >= 0x84, so >> 7 >= 1
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+MULAW_TO_PCM = _build_decode_table()
+PCM_TO_MULAW = _build_encode_table()
+MULAW_MAGNITUDE = np.abs(MULAW_TO_PCM.astype(np.int32))
+
+
+def decode(mulaw) -> np.ndarray:
+    """μ-law bytes (bytes / bytearray / memoryview) -> int16 PCM samples"""
+    return MULAW_TO_PCM[np.frombuffer(mulaw, dtype=np.uint8)]
+
+
+def encode(pcm: np.ndarray) -> bytes:
+    """int16 PCM samples -> μ-law bytes"""
+    return PCM_TO_MULAW[np.ascontiguousarray(pcm, dtype=np.int16).view(np.uint16)].tobytes()
+
+
+class MulawFrameRing:
+    """
+    Inbound μ-law ring of capacity_frames fixed-size frames, allocated once per call.
+    - write() copies each media payload into place (wrapping as needed)
+    - frames() yields memoryview frames; the read position is always frame-aligned and the
+      capacity is a whole number of frames, so a frame never straddles the wrap point
+    - A yielded view is only valid until the next write(); consumers copy what they keep
+    - If the reader falls a full ring behind, the oldest frames are dropped and counted
+    """
+
+    def __init__(self, frame_bytes: int = FRAME_BYTES, capacity_frames: int = MEDIA_RING_FRAMES):
+        self.frame_bytes = frame_bytes
+        self.capacity = frame_bytes * capacity_frames
+        self._data = bytearray(self.capacity)
+        self._view = memoryview(self._data)
+        self._read = 0
+        self._write = 0
+        self.dropped_frames = 0
+
+    def write(self, payload):
+        payload = memoryview(payload)
+        if len(payload) > self.capacity:
+            payload = payload[-self.capacity:]
+        size = len(payload)
+        position = self._write % self.capacity
+        first = min(size, self.capacity - position)
+        self._view[position:position + first] = payload[:first]
+        if first < size:
+            self._view[:size - first] = payload[first:]
+        self._write += size
+
+        overflow = self._write - self._read - self.capacity
+        if overflow > 0:
+            dropped = -(-overflow // self.frame_bytes)
+            self._read += dropped * self.frame_bytes
+            self.dropped_frames += dropped
+
+    def frames(self) -> Iterator[memoryview]:
+        while self._write - self._read >= self.frame_bytes:
+            position = self._read % self.capacity
+            self._read += self.frame_bytes
+            yield self._view[position:position + self.frame_bytes]
+
+    def __len__(self) -> int:
+        """Unread bytes"""
+        return self._write - self._read
+
+
+class OutboundFramer:
+    """
+    TTS μ-law audio -> Twilio media messages of exactly one 20 ms frame each.
+    Chunk remainders (< 1 frame) carry over to the next chunk; flush() pads the last one with silence.
+    Messages are rendered from a prebuilt prefix/suffix, not json.dumps per frame.
+    """
+
+    def __init__(self, stream_sid: str, frame_bytes: int = FRAME_BYTES):
+        self.frame_bytes = frame_bytes
+        self._prefix = '{"event":"media","streamSid":"%s","media":{"payload":"' % stream_sid
+        self._suffix = '"}}'
+        self._pending = bytearray()
+        self.frames_sent = 0
+
+    def frame(self, audio) -> List[str]:
+        self._pending += audio
+        whole = len(self._pending) - len(self._pending) % self.frame_bytes
+        if not whole:
+            return []
+        view = memoryview(self._pending)
+        try:
+            messages = [self._prefix + binascii.b2a_base64(view[i:i + self.frame_bytes], newline=False).decode('ascii')
+                        + self._suffix for i in range(0, whole, self.frame_bytes)]
+        finally:
+            view.release()
+        del self._pending[:whole]
+        self.frames_sent += len(messages)
+        return messages
+
+    def flush(self) -> List[str]:
+        if not self._pending:
+            return []
+        padding = self.frame_bytes - len(self._pending) % self.frame_bytes
+        if padding < self.frame_bytes:
+            self._pending.extend(bytes([MULAW_SILENCE]) * padding)
+        return self.frame(b'')
+
+    def clear(self):
+        """Drop audio not yet framed (e.g. the caller interrupted)"""
+        self._pending.clear()
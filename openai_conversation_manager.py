@@ -8,22 +8,104 @@ import os
 import json
 import logging
 import asyncio
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
-from openai import OpenAI
+from typing import Dict, List, Optional, Tuple, Any, AsyncIterator, Iterator
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
 from openai.types.chat import ChatCompletionMessageParam
 import time
 import re
 
+from async_runtime import run_sync, run_in_runtime, submit
+from call_session_registry import get_call_sessions
+
 logger = logging.getLogger(__name__)
 
+# Pooled keep-alive connections to the OpenAI API, shared by every call on this worker
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', '50'))
+OPENAI_MAX_KEEPALIVE = int(os.environ.get('OPENAI_MAX_KEEPALIVE', '20'))
+OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', '20'))
+
+# Model parameters per processing mode
+MODE_PARAMS = {
+    "default": {"model": "gpt-4o-mini", "max_tokens": 150, "temperature": 0.7},
+    "live": {"model": "gpt-4o-mini", "max_tokens": 80, "temperature": 0.5},
+    "reasoning": {"model": "gpt-4o", "max_tokens": 200, "temperature": 0.3},
+}
+
+# Sentence-sized chunks for streaming: split after . ! ? once the chunk is long enough to voice
+SENTENCE_END = re.compile(r'[.!?](?:["\')\]]*)\s+')
+MIN_SENTENCE_CHARS = 12
+
+# History is trimmed to a token budget (oldest first) rather than a fixed message count
+HISTORY_TOKEN_BUDGET = int(os.environ.get('OPENAI_HISTORY_TOKEN_BUDGET', '600'))
+FACT_KEYS = ['unitNumber', 'reportedIssue', 'contactName', 'callbackNumber']
+
+
+# Streamed replies kept per call so a re-fetch of the same turn replays instead of regenerating
+STREAMED_TURNS_PER_CALL = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token plus per-message overhead)"""
+    return len(text) // 4 + 4
+
+
+class StreamedTurn:
+    """Sentences of one streamed reply as they arrive; any number of readers can follow or replay it"""
+    __slots__ = ('sentences', 'done', 'error', 'cond')
+
+    def __init__(self):
+        self.sentences: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.cond = threading.Condition()
+
+    def add(self, sentence: str):
+        with self.cond:
+            self.sentences.append(sentence)
+            self.cond.notify_all()
+
+    def finish(self, error: Optional[Exception] = None):
+        with self.cond:
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    def follow(self, timeout: Optional[float]) -> Iterator[str]:
+        """Yield every sentence from the first; raises the generation error or TimeoutError"""
+        index = 0
+        while True:
+            with self.cond:
+                if index >= len(self.sentences) and not self.done:
+                    if not self.cond.wait_for(lambda: index < len(self.sentences) or self.done, timeout):
+                        raise TimeoutError(f"No streamed sentence within {timeout}s")
+                if index < len(self.sentences):
+                    sentence = self.sentences[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield sentence
+
 class OpenAIConversationManager:
     def __init__(self):
         self.openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        self.conversation_histories = {}  # Call-specific histories
-        self.session_facts = {}  # Call-specific key facts
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._async_client_pid: Optional[int] = None
+        self._async_client_lock = threading.Lock()
+        # Call-specific state lives in the bounded call-session registry (TTL/LRU, dropped at call end)
+        sessions = get_call_sessions()
+        self.conversation_histories = sessions.namespace('openai.conversation_histories')
+        self.session_facts = sessions.namespace('openai.session_facts')
         self.current_mode = "default"  # default, live, reasoning
-        self.streaming_sessions = {}  # Active streaming sessions
+        self.streaming_sessions = sessions.namespace('openai.streaming_sessions')
+        self.latency_metrics = sessions.namespace('openai.latency_metrics')
+        self.prompt_metrics = sessions.namespace('openai.prompt_metrics')
+        self.streamed_turns = sessions.namespace('openai.streamed_turns')
+        self._streamed_turns_lock = threading.Lock()
         
         # Grok usage guard - ABSOLUTE NO GROK POLICY
         self.grok_guard_active = True
@@ -72,12 +154,38 @@ REFUSAL TEMPLATE: "I'm not able to guarantee that. Our policy doesn't allow it.
 
 REMEMBER: You handle ALL callers (tenants + general inquiries), not just maintenance. Never promise what isn't in these verified policies."""
         
+        # Byte-stable first message so the provider can reuse the cached prompt prefix every turn
+        self.system_message = {"role": "system", "content": self.base_system_prompt}
+        self.system_prompt_tokens = estimate_tokens(self.base_system_prompt)
+        
     def detect_grok_usage(self, context):
         """Runtime guard to prevent any Grok usage"""
         if any(term in str(context).lower() for term in ['grok', 'xai', 'x.ai']):
             logger.error("🚨 GROK USAGE DETECTED - STOPPING")
             raise Exception("Grok usage detected — migrate to OpenAI.")
     
+    @property
+    def async_openai_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI client with a pooled HTTP connection, used only on the shared async runtime"""
+        with self._async_client_lock:
+            if self._async_client is None or self._async_client_pid != os.getpid():
+                self._async_client = AsyncOpenAI(
+                    api_key=os.environ.get("OPENAI_API_KEY"),
+                    timeout=OPENAI_TIMEOUT,
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=OPENAI_MAX_KEEPALIVE
+                        )
+                    )
+                )
+                self._async_client_pid = os.getpid()
+            return self._async_client
+
+    async def create_completion(self, **kwargs):
+        """Await a chat completion on the shared loop, whichever loop the caller is on"""
+        return await run_in_runtime(self.async_openai_client.chat.completions.create(**kwargs))
+
     def test_streaming(self):
         """Test OpenAI streaming capability for mode selection"""
         try:
@@ -104,8 +212,42 @@ REMEMBER: You handle ALL callers (tenants + general inquiries), not just mainten
         }
         logger.info(f"🚀 OpenAI streaming session started for {call_sid}")
     
-    async def stream_response(self, call_sid, context):
-        """Stream OpenAI response token by token for full streaming mode"""
+    async def stream_response(self, call_sid, context, turn=None):
+        """
+        Stream OpenAI response token by token for full streaming mode
+        The request runs on the shared loop (which owns the pooled client) and tokens are handed
+        to the caller's loop as they arrive. With a turn (turn_scheduler.Turn), tokens are counted
+        against it and the HTTP stream is closed as soon as the turn is cancelled (barge-in)
+        or the caller stops reading, so no further tokens are generated
+        """
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        generation = None
+        
+        def deliver(item):
+            try:
+                loop.call_soon_threadsafe(tokens.put_nowait, item)
+            except RuntimeError:
+                pass  # the caller's loop is already gone
+        
+        async def pump(messages):
+            stream = await self.async_openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                stream=True,
+                max_tokens=150,
+                temperature=0.7
+            )
+            try:
+                async for chunk in stream:
+                    if turn is not None and turn.cancelled:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        deliver(chunk.choices[0].delta.content)
+            finally:
+                await stream.close()
+        
         try:
             self.detect_grok_usage(context)
             
@@ -114,43 +256,33 @@ REMEMBER: You handle ALL callers (tenants + general inquiries), not just mainten
             facts_context = context.get('facts_context', '')
             conversation_history = context.get('conversation_history', [])
             
-            # Create enhanced system prompt with facts
-            enhanced_system_prompt = f"{self.base_system_prompt}\n\n{facts_context}"
-            
-            messages = [
-                {"role": "system", "content": enhanced_system_prompt},
-                {"role": "user", "content": user_input}
-            ]
-            
-            # Add conversation history
-            for msg in conversation_history[-6:]:  # Last 6 messages for context
-                messages.append({
-                    "role": "assistant" if msg.get('speaker') == 'Chris' else "user",
-                    "content": msg.get('message', '')
-                })
+            messages = self.compose_messages(user_input, facts_context, conversation_history)
             
-            # Create streaming response
-            stream = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                stream=True,
-                max_tokens=150,
-                temperature=0.7
-            )
+            generation = submit(pump(messages))
+            generation.add_done_callback(lambda _: deliver(finished))
             
             # Stream tokens
             session = self.streaming_sessions.get(call_sid, {})
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    token = chunk.choices[0].delta.content
-                    session['tokens_streamed'] = session.get('tokens_streamed', 0) + 1
-                    yield token
+            while True:
+                token = await tokens.get()
+                if token is finished:
+                    generation.result()  # raises the generation error, if any
+                    break
+                if turn is not None and turn.cancelled:
+                    break
+                session['tokens_streamed'] = session.get('tokens_streamed', 0) + 1
+                if turn is not None:
+                    turn.add_tokens()
+                yield token
                     
         except Exception as e:
             if "Grok usage detected" in str(e):
                 raise
             logger.error(f"Streaming response error: {e}")
             yield "I'm here to help. What can I do for you?"
+        finally:
+            if generation is not None and not generation.done():
+                generation.cancel()
     
     async def cleanup_session(self, call_sid):
         """Clean up streaming session"""
@@ -305,6 +437,149 @@ REMEMBER: You handle ALL callers (tenants + general inquiries), not just mainten
             logger.error(f"Processing error: {e}")
             return "How can I help you today?", "fallback", time.time() - start_time
     
+    def process_user_input_sync(self, call_sid: str, user_input: str, session_facts: Optional[Dict] = None,
+                                timeout: Optional[float] = None) -> Tuple[str, str, float]:
+        """Bridge for sync (Flask) handlers: run process_user_input on the shared loop and wait"""
+        return run_sync(self.process_user_input(call_sid, user_input, session_facts), timeout)
+    
+    async def stream_user_input(self, call_sid: str, user_input: str,
+                                session_facts: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Streaming variant of process_user_input: yields sentence-sized chunks as tokens arrive.
+        Default and live modes stream; reasoning mode yields its full answer as one chunk.
+        Must be iterated on the shared async runtime (see stream_user_input_sync).
+        """
+        self.detect_grok_usage(user_input)
+        
+        if session_facts is None:
+            session_facts = self.extract_session_facts(call_sid, user_input)
+        
+        start_time = time.time()
+        selected_mode = self.select_processing_mode(user_input, session_facts)
+        turn = {'mode': selected_mode, 'first_token': None, 'first_sentence': None, 'total': None, 'sentences': 0}
+        sentences: List[str] = []
+        
+        try:
+            if selected_mode == "reasoning":
+                response_text = await self.process_reasoning_mode(call_sid, user_input, session_facts)
+                turn['first_token'] = turn['first_sentence'] = time.time() - start_time
+                sentences.append(response_text)
+                yield response_text
+            else:
+                messages = self.build_messages_with_facts(user_input, session_facts, call_sid)
+                stream = await self.async_openai_client.chat.completions.create(
+                    messages=messages, stream=True, stream_options={"include_usage": True},
+                    **MODE_PARAMS[selected_mode]
+                )
+                
+                buffer = ""
+                async for chunk in stream:
+                    if chunk.usage:
+                        self.record_prompt_usage(call_sid, chunk.usage)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    if turn['first_token'] is None:
+                        turn['first_token'] = time.time() - start_time
+                    buffer += chunk.choices[0].delta.content
+                    
+                    # Emit every complete sentence in the buffer
+                    while True:
+                        boundary = next((m for m in SENTENCE_END.finditer(buffer) if m.end() >= MIN_SENTENCE_CHARS), None)
+                        if boundary is None:
+                            break
+                        sentence, buffer = buffer[:boundary.end()].strip(), buffer[boundary.end():]
+                        if turn['first_sentence'] is None:
+                            turn['first_sentence'] = time.time() - start_time
+                            logger.info(f"⚡ First sentence in {turn['first_sentence']:.3f}s ({selected_mode} mode): '{sentence[:40]}'")
+                        sentences.append(sentence)
+                        yield sentence
+                
+                if buffer.strip():
+                    if turn['first_sentence'] is None:
+                        turn['first_sentence'] = time.time() - start_time
+                    sentences.append(buffer.strip())
+                    yield buffer.strip()
+                    
+        except Exception as e:
+            if "Grok usage detected" in str(e):
+                raise
+            logger.error(f"Streaming {selected_mode} mode error: {e}")
+            if not sentences:
+                turn['mode'] = "fallback"
+                sentences.append("I'm here to help. What can I do for you?")
+                yield sentences[-1]
+        finally:
+            turn['total'] = time.time() - start_time
+            turn['sentences'] = len(sentences)
+            self.record_turn_latency(call_sid, turn)
+            if sentences:
+                self.store_conversation_turn(call_sid, user_input, " ".join(sentences))
+    
+    def stream_user_input_sync(self, call_sid: str, user_input: str, session_facts: Optional[Dict] = None,
+                               timeout: Optional[float] = OPENAI_TIMEOUT, turn_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Bridge for sync (Flask) handlers: generation runs on the shared loop and keeps going
+        while the caller consumes earlier sentences (e.g. synthesizing them to speech).
+        With a turn_id the generation is keyed on it: a repeat request for the same turn (e.g. Twilio
+        re-fetching the <Play> URL) follows or replays the first one instead of calling the model again.
+        Raises the generation error, or TimeoutError if no sentence arrives within timeout.
+        """
+        with self._streamed_turns_lock:
+            turns = self.streamed_turns.setdefault(call_sid, {}) if turn_id else {}
+            streamed = turns.get(turn_id)
+            start = streamed is None
+            if start:
+                streamed = StreamedTurn()
+                if turn_id:
+                    turns[turn_id] = streamed
+                    for stale in list(turns)[:-STREAMED_TURNS_PER_CALL]:
+                        del turns[stale]
+        
+        if start:
+            async def pump():
+                try:
+                    async for sentence in self.stream_user_input(call_sid, user_input, session_facts):
+                        streamed.add(sentence)
+                except Exception as e:
+                    streamed.finish(e)
+                else:
+                    streamed.finish()
+            
+            submit(pump())
+        else:
+            logger.info(f"🔁 Replaying streamed turn {turn_id} for {call_sid}")
+        
+        return streamed.follow(timeout)
+    
+    def get_streamed_turn(self, call_sid: str, turn_id: str) -> Optional[StreamedTurn]:
+        """The recorded sentences of a turn started with stream_user_input_sync(turn_id=...)"""
+        return self.streamed_turns.get(call_sid, {}).get(turn_id)
+    
+    def record_turn_latency(self, call_sid: str, turn: Dict[str, Any]):
+        """Keep the last 50 turns of first-token / first-sentence / total latency per call"""
+        turns = self.latency_metrics.setdefault(call_sid, [])
+        turns.append({key: round(value, 3) if isinstance(value, float) else value for key, value in turn.items()})
+        del turns[:-50]
+    
+    def get_latency_metrics(self, call_sid: Optional[str] = None) -> Dict[str, Any]:
+        """Per-turn streaming latencies for one call, or averages across all calls"""
+        if call_sid is not None:
+            return {'call_sid': call_sid, 'turns': list(self.latency_metrics.get(call_sid, []))}
+        
+        all_turns = [turn for turns in list(self.latency_metrics.values()) for turn in turns]
+        
+        def average(key):
+            values = [turn[key] for turn in all_turns if turn.get(key) is not None]
+            return round(sum(values) / len(values), 3) if values else None
+        
+        return {
+            'calls': len(self.latency_metrics),
+            'turns': len(all_turns),
+            'avg_first_token': average('first_token'),
+            'avg_first_sentence': average('first_sentence'),
+            'avg_total': average('total')
+        }
+    
     def select_processing_mode(self, user_input: str, session_facts: Dict) -> str:
         """Auto-select processing mode based on input complexity"""
         # Emergency -> live mode for fastest response
@@ -324,13 +599,8 @@ REMEMBER: You handle ALL callers (tenants + general inquiries), not just mainten
         try:
             messages = self.build_messages_with_facts(user_input, session_facts, call_sid)
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=150,
-                temperature=0.7,
-                stream=False  # Non-streaming for now, can be converted to streaming
-            )
+            response = await self.create_completion(messages=messages, **MODE_PARAMS["default"])
+            self.record_prompt_usage(call_sid, response.usage)
             
             return response.choices[0].message.content
             
@@ -345,12 +615,8 @@ REMEMBER: You handle ALL callers (tenants + general inquiries), not just mainten
             # TODO: Implement actual Realtime API when available
             messages = self.build_messages_with_facts(user_input, session_facts, call_sid)
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=80,  # Shorter for speed
-                temperature=0.5
-            )
+            response = await self.create_completion(messages=messages, **MODE_PARAMS["live"])
+            self.record_prompt_usage(call_sid, response.usage)
             
             return response.choices[0].message.content
             
@@ -363,12 +629,8 @@ REMEMBER: You handle ALL callers (tenants + general inquiries), not just mainten
         try:
             messages = self.build_messages_with_facts(user_input, session_facts, call_sid)
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                max_tokens=200,
-                temperature=0.3
-            )
+            response = await self.create_completion(messages=messages, **MODE_PARAMS["reasoning"])
+            self.record_prompt_usage(call_sid, response.usage)
             
             return response.choices[0].message.content
             
@@ -378,29 +640,73 @@ REMEMBER: You handle ALL callers (tenants + general inquiries), not just mainten
     
     def build_messages_with_facts(self, user_input: str, session_facts: Dict, call_sid: str) -> List[Dict]:
         """Build message list with session facts injection"""
-        # Build facts context
-        known_facts = []
-        for key, value in session_facts.items():
-            if value and key in ['unitNumber', 'reportedIssue', 'contactName', 'callbackNumber']:
-                known_facts.append(f"{key}={value}")
-        
+        known_facts = [f"{key}={session_facts[key]}" for key in FACT_KEYS if session_facts.get(key)]
         facts_context = f"Known facts: {', '.join(known_facts) if known_facts else 'none yet'}"
         
-        # Enhanced system prompt with facts
-        enhanced_prompt = f"{self.base_system_prompt}\n\n{facts_context}"
+        return self.compose_messages(user_input, facts_context, self.conversation_histories.get(call_sid, []))
+    
+    def compose_messages(self, user_input: str, facts_context: str, history: List[Dict]) -> List[Dict]:
+        """
+        Prompt layout: [stable system prompt] + history (oldest first) + [facts] + [current user turn].
+        Everything up to the newest history turn repeats byte-for-byte on the next turn, so it
+        stays in the provider's prompt cache; per-turn facts come after it.
+        """
+        messages = [self.system_message]
+        for msg in self.trim_history(history):
+            role = "assistant" if msg.get('speaker') == 'Chris' else "user"
+            messages.append({"role": role, "content": msg.get('message', '')})
         
-        messages = [
-            {"role": "system", "content": enhanced_prompt},
-            {"role": "user", "content": user_input}
-        ]
+        if facts_context:
+            messages.append({"role": "system", "content": facts_context})
+        messages.append({"role": "user", "content": user_input})
+        return messages
+    
+    def trim_history(self, history: List[Dict], budget: int = HISTORY_TOKEN_BUDGET) -> List[Dict]:
+        """Most recent history turns that fit in the token budget, in chronological order"""
+        kept = 0
+        used = 0
+        for msg in reversed(history):
+            cost = estimate_tokens(msg.get('message', ''))
+            if used + cost > budget:
+                break
+            used += cost
+            kept += 1
+        return history[len(history) - kept:]
+    
+    def record_prompt_usage(self, call_sid: str, usage):
+        """Accumulate provider-reported prompt tokens and cached prefix tokens for a call"""
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = (getattr(details, 'cached_tokens', 0) if details else 0) or 0
         
-        # Add conversation history
-        if call_sid in self.conversation_histories:
-            for msg in self.conversation_histories[call_sid][-6:]:  # Last 6 messages
-                role = "assistant" if msg.get('speaker') == 'Chris' else "user"
-                messages.append({"role": role, "content": msg.get('message', '')})
+        metrics = self.prompt_metrics.setdefault(call_sid, {
+            'turns': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0, 'cache_hits': 0
+        })
+        metrics['turns'] += 1
+        metrics['prompt_tokens'] += usage.prompt_tokens or 0
+        metrics['completion_tokens'] += usage.completion_tokens or 0
+        metrics['cached_tokens'] += cached_tokens
+        if cached_tokens:
+            metrics['cache_hits'] += 1
+    
+    def get_prompt_metrics(self, call_sid: Optional[str] = None) -> Dict[str, Any]:
+        """Prompt tokens and cached-prefix hit rate for one call, or totals across calls"""
+        if call_sid is not None:
+            calls = [self.prompt_metrics.get(call_sid, {})]
+        else:
+            calls = list(self.prompt_metrics.values())
         
-        return messages
+        totals = {key: sum(m.get(key, 0) for m in calls)
+                  for key in ['turns', 'prompt_tokens', 'cached_tokens', 'completion_tokens', 'cache_hits']}
+        totals['cache_hit_rate'] = round(totals['cache_hits'] / totals['turns'], 3) if totals['turns'] else 0.0
+        totals['cached_token_ratio'] = round(totals['cached_tokens'] / totals['prompt_tokens'], 3) if totals['prompt_tokens'] else 0.0
+        totals['system_prompt_tokens'] = self.system_prompt_tokens
+        if call_sid is not None:
+            totals['call_sid'] = call_sid
+        else:
+            totals['calls'] = len(calls)
+        return totals
     
     def store_conversation_turn(self, call_sid: str, user_input: str, response: str):
         """Store conversation turn in history"""
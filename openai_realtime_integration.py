@@ -176,7 +176,7 @@ class OpenAIRealtimeAssistant:
                 "OpenAI-Beta": "realtime=v1"
             }
             
-            self.realtime_ws = await websockets.connect(uri, extra_headers=headers)
+            self.realtime_ws = await websockets.connect(uri, additional_headers=headers)
             logger.info(f"Started realtime session for {call_sid}")
             
             # Configure session
@@ -284,8 +284,10 @@ class OpenAIRealtimeAssistant:
                 }
                 await self.realtime_ws.send(json.dumps(cancel_message))
             
-            # Stop ElevenLabs streaming
-            # TODO: Implement ElevenLabs stream cancellation
+            # Stop the call's reply turn: LLM stream, ElevenLabs generation and queued audio.
+            # The turn lives on its media stream's loop, not the one this request runs on
+            from turn_scheduler import get_turn_scheduler
+            await get_turn_scheduler().barge_in_threadsafe(call_sid, reason='realtime interruption')
             
             logger.info(f"Handled interruption for {call_sid}")
             
@@ -2,6 +2,7 @@
 Comprehensive Property Backup System for Rent Manager API
 Maintains complete backup of all 430+ properties with unit numbers
 Automatically updates backup when API is accessible and checks for new addresses
+Backup lives in the versioned PropertySnapshotStore (only changed rows are rewritten)
 """
 
 import os
@@ -11,6 +12,8 @@ import asyncio
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from rent_manager import RentManagerAPI
+from property_snapshot_store import PropertySnapshotStore, PropertyDelta
+from property_registry import PropertyRegistry, get_property_registry
 
 logger = logging.getLogger(__name__)
 
@@ -21,29 +24,46 @@ class PropertyBackupSystem:
     - Updates backup when API is accessible
     - Detects new addresses automatically
     - Provides fallback when API sessions are limited
+    - Emits add/remove/rename deltas through self.store.subscribe()
+    - Serves its properties from the worker-wide PropertyRegistry (no private copy)
     """
     
-    def __init__(self, rent_manager: RentManagerAPI):
+    def __init__(self, rent_manager: RentManagerAPI, store: Optional[PropertySnapshotStore] = None,
+                 registry: Optional[PropertyRegistry] = None):
         self.rent_manager = rent_manager
-        self.backup_file = "property_backup.json"
-        self.properties_cache = []
+        self.backup_file = "property_backup.json"  # Legacy JSON backup, imported once into the store
+        self.store = store or PropertySnapshotStore()
+        self.registry = registry if registry is not None else get_property_registry()
+        # Once the registry holds a full list, refreshes reach it as deltas
+        self.store.subscribe(self.registry.apply_deltas)
         self.last_update = None
         self.new_addresses_detected = []
+        self.last_deltas: List[PropertyDelta] = []
+    
+    @property
+    def properties_cache(self) -> List[Dict[str, Any]]:
+        return self.registry.properties
+    
+    @properties_cache.setter
+    def properties_cache(self, properties: List[Dict[str, Any]]):
+        self.registry.load(properties)
         
     async def load_backup_properties(self) -> List[Dict[str, Any]]:
-        """Load properties from backup file"""
+        """Load properties from the snapshot store"""
         try:
-            if os.path.exists(self.backup_file):
-                with open(self.backup_file, 'r') as f:
-                    backup_data = json.load(f)
-                    self.properties_cache = backup_data.get('properties', [])
-                    self.last_update = backup_data.get('last_update')
-                    logger.info(f"📋 BACKUP LOADED: {len(self.properties_cache)} properties from backup file")
-                    return self.properties_cache
+            self.store.seed_from_json(self.backup_file)
+            properties = self.store.load_all()
+            if properties:
+                if not self.registry.from_store:
+                    self.registry.load(properties, from_store=True)
+                    self.registry.store_version = self.store.version
+                self.last_update = self.store.last_update
+                logger.info(f"📋 BACKUP LOADED: {len(self.properties_cache)} properties from snapshot v{self.store.version}")
+                return self.properties_cache
         except Exception as e:
             logger.error(f"Error loading backup properties: {e}")
         
-        # Return hardcoded essential properties if backup file doesn't exist
+        # Return hardcoded essential properties if the store is empty
         return self._get_essential_hardcoded_properties()
     
     async def update_from_api_and_detect_new(self) -> List[Dict[str, Any]]:
@@ -59,14 +79,16 @@ class PropertyBackupSystem:
                 if fresh_properties and len(fresh_properties) > 0:
                     logger.info(f"🔄 API SUCCESS: Retrieved {len(fresh_properties)} properties from Rent Manager API")
                     
-                    # Check for new addresses
-                    await self._detect_new_addresses(fresh_properties)
+                    # Update backup (changed rows only) and report new addresses from the deltas
+                    deltas = await self._save_backup(fresh_properties)
+                    await self._detect_new_addresses(deltas)
                     
-                    # Update backup file
-                    await self._save_backup(fresh_properties)
-                    
-                    self.properties_cache = fresh_properties
-                    return fresh_properties
+                    # A registry started on the hardcoded fallback (or an ad-hoc list) is replaced outright;
+                    # one already mirroring the store has just received the deltas
+                    if not self.registry.from_store:
+                        self.registry.load(fresh_properties, from_store=True)
+                    self.registry.store_version = self.store.version
+                    return self.properties_cache
                 else:
                     logger.warning("⚠️ API returned empty properties - using backup")
             
@@ -76,45 +98,33 @@ class PropertyBackupSystem:
         # Fallback to backup
         return await self.load_backup_properties()
     
-    async def _detect_new_addresses(self, fresh_properties: List[Dict[str, Any]]):
-        """Detect new addresses by comparing with backup"""
-        if not self.properties_cache:
-            await self.load_backup_properties()
-        
-        # Create sets of existing addresses for comparison
-        backup_addresses = {prop.get('Name', '').lower().strip() 
-                          for prop in self.properties_cache}
-        fresh_addresses = {prop.get('Name', '').lower().strip() 
-                          for prop in fresh_properties}
-        
-        # Find new addresses
-        new_addresses = fresh_addresses - backup_addresses
+    async def _detect_new_addresses(self, deltas: List[PropertyDelta]):
+        """Report added and renamed properties from the latest snapshot deltas"""
+        new_addresses = [d.name.lower().strip() for d in deltas if d.kind in ('add', 'rename')]
         
         if new_addresses:
-            self.new_addresses_detected = list(new_addresses)
+            self.new_addresses_detected = new_addresses
             logger.info(f"🆕 NEW ADDRESSES DETECTED: {len(new_addresses)} new properties found")
             for addr in new_addresses:
                 logger.info(f"   📍 NEW: {addr}")
         else:
             logger.info("✅ No new addresses detected - property database unchanged")
+        
+        removed = [d.name for d in deltas if d.kind == 'remove']
+        if removed:
+            logger.info(f"🗑️ PROPERTIES REMOVED: {', '.join(removed)}")
     
-    async def _save_backup(self, properties: List[Dict[str, Any]]):
-        """Save properties to backup file with timestamp"""
+    async def _save_backup(self, properties: List[Dict[str, Any]]) -> List[PropertyDelta]:
+        """Write changed properties to the snapshot store and return the deltas"""
         try:
-            backup_data = {
-                'properties': properties,
-                'last_update': datetime.now().isoformat(),
-                'total_count': len(properties),
-                'backup_created': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            with open(self.backup_file, 'w') as f:
-                json.dump(backup_data, f, indent=2)
-            
-            logger.info(f"💾 BACKUP SAVED: {len(properties)} properties saved to {self.backup_file}")
+            self.store.seed_from_json(self.backup_file)
+            self.last_deltas = self.store.apply_snapshot(properties)
+            self.last_update = self.store.last_update
+            return self.last_deltas
             
         except Exception as e:
             logger.error(f"Error saving backup: {e}")
+            return []
     
     def _get_essential_hardcoded_properties(self) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,250 @@
+"""
+Unified Property Registry
+One process-wide copy of the property portfolio shared by AddressMatcher,
+PropertyBackupSystem and rent_manager_adapter
+Refreshes build a complete new snapshot and swap it in with a single assignment
+"""
+
+import os
+import time
+import fcntl
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from address_index import AddressIndex
+from property_snapshot_store import PropertyDelta, property_key, apply_deltas
+
+logger = logging.getLogger(__name__)
+
+PROPERTY_REFRESH_SECONDS = int(os.environ.get('PROPERTY_REFRESH_SECONDS', '900'))
+
+
+def normalize_unit(unit: str) -> str:
+    """'Apt 2', 'apt. 2', 'Unit 2' and '2' all normalize to '2'"""
+    unit = (unit or '').lower().replace('.', ' ').replace('#', ' ').strip()
+    for prefix in ('apartment ', 'apt ', 'unit ', 'suite ', 'ste '):
+        if unit.startswith(prefix):
+            unit = unit[len(prefix):].strip()
+            break
+    return unit
+
+
+class PropertyRecord:
+    """Slotted lookup view over one property dict (the dict itself is shared, never copied)"""
+    __slots__ = ('property_id', 'name', 'name_key', 'units', 'data')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.property_id = property_key(data)
+        self.name = data.get('Name', '') or ''
+        self.name_key = self.name.lower().strip()
+        self.units = tuple(normalize_unit(str(unit)) for unit in data.get('Units') or [])
+        self.data = data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def has_unit(self, unit: str) -> bool:
+        return normalize_unit(unit) in self.units
+
+
+class RegistrySnapshot:
+    """Immutable set of lookup tables over one property list"""
+    __slots__ = ('properties', 'records', 'by_id', 'by_name', 'by_unit', 'index', 'built_at')
+
+    def __init__(self, properties: List[Dict[str, Any]]):
+        self.properties = properties
+        self.records = tuple(PropertyRecord(prop) for prop in properties)
+        self.by_id: Dict[str, PropertyRecord] = {}
+        self.by_name: Dict[str, PropertyRecord] = {}
+        self.by_unit: Dict[str, Tuple[PropertyRecord, ...]] = {}
+
+        units: Dict[str, List[PropertyRecord]] = {}
+        for record in self.records:
+            self.by_id.setdefault(record.property_id, record)
+            for alias in (record.get('PropertyID'), record.get('ID')):
+                if alias is not None:
+                    self.by_id.setdefault(str(alias), record)
+            if record.name_key:
+                self.by_name.setdefault(record.name_key, record)
+            for unit in record.units:
+                units.setdefault(unit, []).append(record)
+        self.by_unit = {unit: tuple(records) for unit, records in units.items()}
+
+        self.index = AddressIndex(properties)
+        self.built_at = time.time()
+
+
+class PropertyRegistry:
+    """
+    Process-wide property registry.
+    - Lookups by property ID, exact name and unit
+    - load() / apply_deltas() build a new RegistrySnapshot off to the side and swap it in
+      atomically, so readers never see a half-built index
+    - One background refresher per worker; across workers a file lock lets a single
+      worker hit the API while the rest catch up from the snapshot store
+    """
+
+    def __init__(self):
+        self._snapshot = RegistrySnapshot([])
+        self.loaded = False
+        # True once the list mirrors the snapshot store; store deltas only apply on top of that
+        self.from_store = False
+        self.store_version = 0
+        self._write_lock = threading.Lock()
+        self._refresh_thread = None
+        self.running = False
+
+    # ------------------------------------------------------------------
+    # Reading (each accessor reads the current snapshot exactly once)
+    # ------------------------------------------------------------------
+
+    @property
+    def snapshot(self) -> RegistrySnapshot:
+        return self._snapshot
+
+    @property
+    def properties(self) -> List[Dict[str, Any]]:
+        return self._snapshot.properties
+
+    @property
+    def index(self) -> AddressIndex:
+        return self._snapshot.index
+
+    def __len__(self) -> int:
+        return len(self._snapshot.properties)
+
+    def get(self, property_id: Any) -> Optional[PropertyRecord]:
+        return self._snapshot.by_id.get(str(property_id))
+
+    def get_by_name(self, name: str) -> Optional[PropertyRecord]:
+        return self._snapshot.by_name.get((name or '').lower().strip())
+
+    def find_by_unit(self, unit: str) -> Tuple[PropertyRecord, ...]:
+        return self._snapshot.by_unit.get(normalize_unit(unit), ())
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def load(self, properties: List[Dict[str, Any]], from_store: bool = False):
+        """
+        Replace the whole portfolio (no-op if this exact list is already loaded).
+        from_store marks a list that mirrors the snapshot store (API refresh or store load), as opposed
+        to the hardcoded fallback or an ad-hoc API list.
+        """
+        properties = properties if properties is not None else []
+        with self._write_lock:
+            if self.loaded and properties is self._snapshot.properties:
+                return
+            self._snapshot = RegistrySnapshot(properties)
+            self.loaded = True
+            self.from_store = from_store
+        logger.info(f"🏢 PROPERTY REGISTRY LOADED: {len(properties)} properties{' from the snapshot store' if from_store else ''}")
+
+    def apply_deltas(self, deltas: List[PropertyDelta]):
+        """Apply snapshot store deltas (ignored unless the registry holds the store's list)"""
+        if not deltas:
+            return
+        with self._write_lock:
+            if not self.loaded or not self.from_store:
+                return
+            self._snapshot = RegistrySnapshot(apply_deltas(self._snapshot.properties, deltas))
+        logger.info(f"🔁 PROPERTY REGISTRY UPDATED: {len(deltas)} changes applied ({len(self)} properties)")
+
+    def catch_up(self, store) -> int:
+        """Apply store changes written by any worker since this registry last synced"""
+        current = store.version
+        if not self.from_store and current:
+            # Started on a fallback list - deltas would stack on top of it, so take the store's full list
+            properties = store.load_all()
+            if properties:
+                self.load(properties, from_store=True)
+                self.store_version = current
+                return len(properties)
+        if current <= self.store_version:
+            return 0
+        deltas = store.changes_since(self.store_version)
+        self.apply_deltas(deltas)
+        self.store_version = current
+        return len(deltas)
+
+    # ------------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------------
+
+    def start_background_refresh(self, backup_system, interval_seconds: int = PROPERTY_REFRESH_SECONDS):
+        """Start this worker's single refresher thread (later calls are no-ops)"""
+        if self.running:
+            return
+        self.running = True
+        self.store_version = backup_system.store.version
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, args=(backup_system, interval_seconds), daemon=True
+        )
+        self._refresh_thread.start()
+        logger.info(f"🔄 Property registry background refresh started (every {interval_seconds}s)")
+
+    def stop_background_refresh(self):
+        self.running = False
+
+    def _refresh_loop(self, backup_system, interval_seconds: int):
+        from async_runtime import run_sync
+
+        lock_path = f"{backup_system.store.db_file}.refresh.lock"
+        while self.running:
+            time.sleep(interval_seconds)
+            try:
+                with open(lock_path, 'a') as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        acquired = True
+                    except BlockingIOError:
+                        acquired = False  # Another worker is refreshing from the API
+                    if acquired:
+                        try:
+                            if self._refresh_due(backup_system.store, interval_seconds):
+                                run_sync(backup_system.update_from_api_and_detect_new())
+                        finally:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self.catch_up(backup_system.store)
+            except Exception as e:
+                logger.error(f"❌ Property registry refresh error: {e}")
+
+    @staticmethod
+    def _refresh_due(store, interval_seconds: int) -> bool:
+        """Skip the API call if another worker refreshed the store within this interval"""
+        try:
+            refreshed_at = float(store.get_meta('refreshed_at', '0'))
+        except ValueError:
+            refreshed_at = 0.0
+        if time.time() - refreshed_at < interval_seconds * 0.9:
+            return False
+        store.set_meta('refreshed_at', str(time.time()))
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'total_properties': len(snapshot.properties),
+            'total_units': sum(len(record.units) for record in snapshot.records),
+            'loaded': self.loaded,
+            'from_store': self.from_store,
+            'store_version': self.store_version,
+            'snapshot_age_seconds': round(time.time() - snapshot.built_at, 1),
+            'background_refresh': self.running
+        }
+
+
+_property_registry: Optional[PropertyRegistry] = None
+_property_registry_lock = threading.Lock()
+
+
+def get_property_registry() -> PropertyRegistry:
+    """The worker's single property registry"""
+    global _property_registry
+    if _property_registry is None:
+        with _property_registry_lock:
+            if _property_registry is None:
+                _property_registry = PropertyRegistry()
+    return _property_registry
@@ -0,0 +1,255 @@
+"""
+Versioned Property Snapshot Store
+SQLite-backed copy of the Rent Manager property list, keyed by PropertyID
+Each row carries a content hash and the snapshot version it last changed in, so a refresh
+only writes changed rows and add/remove/rename deltas can be replayed incrementally
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Callable, Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+PROPERTY_SNAPSHOT_DB = os.environ.get('PROPERTY_SNAPSHOT_DB', 'property_snapshot.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS properties (
+    property_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS properties_version ON properties (version);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class PropertyDelta(NamedTuple):
+    """One change between snapshots: kind is 'add', 'remove', 'rename' or 'update'"""
+    kind: str
+    property_id: str
+    name: str
+    old_name: Optional[str] = None
+    record: Optional[Dict[str, Any]] = None
+
+
+def property_key(prop: Dict[str, Any]) -> str:
+    """Stable identity for a property record (API PropertyID, backup ID, or name)"""
+    return str(prop.get('PropertyID') or prop.get('ID') or prop.get('Name', ''))
+
+
+def record_hash(prop: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(prop, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')).hexdigest()
+
+
+def apply_deltas(properties: List[Dict[str, Any]], deltas: List[PropertyDelta]) -> List[Dict[str, Any]]:
+    """Return a new property list with deltas applied (changed rows keep their position, adds append)"""
+    updated = list(properties)
+    positions = {property_key(prop): position for position, prop in enumerate(updated)}
+    removed = set()
+    for delta in deltas:
+        position = positions.get(delta.property_id)
+        if delta.kind == 'remove':
+            if position is not None:
+                removed.add(position)
+        elif position is not None:
+            updated[position] = delta.record
+            removed.discard(position)
+        else:
+            positions[delta.property_id] = len(updated)
+            updated.append(delta.record)
+    return [prop for position, prop in enumerate(updated) if position not in removed]
+
+
+class PropertySnapshotStore:
+    """
+    Compact on-disk property snapshot shared by every gunicorn worker.
+    - One row per property: compact JSON record + sha1 hash + version it last changed in
+    - apply_snapshot() diffs a fresh API list by hash and writes only changed rows
+    - Removed properties stay as tombstones so changes_since(version) can replay removals
+    - Subscribers receive the delta list after every snapshot that changed something
+    """
+
+    def __init__(self, db_file: str = PROPERTY_SNAPSHOT_DB):
+        self.db_file = db_file
+        self._subscribers: List[Callable[[List[PropertyDelta]], None]] = []
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        """Current properties in snapshot order"""
+        started = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT record FROM properties WHERE deleted = 0 ORDER BY position").fetchall()
+        properties = [json.loads(record) for (record,) in rows]
+        logger.info(f"📋 PROPERTY SNAPSHOT LOADED: {len(properties)} properties in {(time.time() - started) * 1000:.1f}ms")
+        return properties
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM properties WHERE deleted = 0").fetchone()[0]
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def version(self) -> int:
+        return int(self.get_meta('version', '0'))
+
+    @property
+    def last_update(self) -> Optional[str]:
+        return self.get_meta('last_update')
+
+    def changes_since(self, version: int) -> List[PropertyDelta]:
+        """Rows changed after a snapshot version, as deltas (renames surface as 'update')"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT property_id, name, deleted, record FROM properties WHERE version > ? ORDER BY position",
+                (version,)
+            ).fetchall()
+        return [
+            PropertyDelta('remove', property_id, name) if deleted
+            else PropertyDelta('update', property_id, name, record=json.loads(record))
+            for property_id, name, deleted, record in rows
+        ]
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def apply_snapshot(self, properties: List[Dict[str, Any]]) -> List[PropertyDelta]:
+        """Diff a full property list against the store, write only changed rows, emit deltas"""
+        started = time.time()
+        incoming = {}
+        for position, prop in enumerate(properties):
+            incoming.setdefault(property_key(prop), (position, prop))
+
+        deltas: List[PropertyDelta] = []
+        written = 0
+        with self._lock, self._connect() as conn:
+            # IMMEDIATE takes the write lock up front so concurrent workers serialize cleanly
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = {
+                    property_id: (position, name, digest, deleted)
+                    for property_id, position, name, digest, deleted in conn.execute(
+                        "SELECT property_id, position, name, hash, deleted FROM properties"
+                    )
+                }
+                row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                version = int(row[0]) + 1 if row else 1
+
+                for property_id, (position, prop) in incoming.items():
+                    name = prop.get('Name', '') or ''
+                    digest = record_hash(prop)
+                    old = existing.get(property_id)
+
+                    if old is None or old[3]:
+                        kind = 'add'
+                    elif old[2] != digest:
+                        kind = 'rename' if old[1] != name else 'update'
+                    else:
+                        if old[0] != position:
+                            conn.execute("UPDATE properties SET position = ? WHERE property_id = ?", (position, property_id))
+                            written += 1
+                        continue
+
+                    conn.execute(
+                        "INSERT OR REPLACE INTO properties (property_id, position, name, hash, version, deleted, record) "
+                        "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                        (property_id, position, name, digest, version,
+                         json.dumps(prop, separators=(',', ':'), default=str))
+                    )
+                    written += 1
+                    deltas.append(PropertyDelta(kind, property_id, name,
+                                                old[1] if kind == 'rename' else None, prop))
+
+                for property_id, (_, name, _, deleted) in existing.items():
+                    if property_id not in incoming and not deleted:
+                        conn.execute("UPDATE properties SET deleted = 1, version = ? WHERE property_id = ?",
+                                     (version, property_id))
+                        written += 1
+                        deltas.append(PropertyDelta('remove', property_id, name))
+
+                if deltas:
+                    conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+                        ('version', str(version)),
+                        ('last_update', datetime.now().isoformat())
+                    ])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if deltas:
+            summary = {kind: sum(1 for d in deltas if d.kind == kind) for kind in ('add', 'remove', 'rename', 'update')}
+            logger.info(f"💾 PROPERTY SNAPSHOT v{version}: {written} rows written of {len(incoming)} "
+                        f"({summary}) in {(time.time() - started) * 1000:.1f}ms")
+            self._emit(deltas)
+        else:
+            logger.info(f"✅ Property snapshot unchanged ({len(incoming)} properties, {written} reordered)")
+        return deltas
+
+    def seed_from_json(self, backup_file: str) -> int:
+        """One-time import of a legacy property_backup.json into an empty store"""
+        if self.count() or not os.path.exists(backup_file):
+            return 0
+        try:
+            with open(backup_file, 'r') as f:
+                properties = json.load(f).get('properties', [])
+        except Exception as e:
+            logger.error(f"Error reading legacy property backup: {e}")
+            return 0
+        self.apply_snapshot(properties)
+        logger.info(f"📦 Imported {len(properties)} properties from {backup_file} into {self.db_file}")
+        return len(properties)
+
+    # ------------------------------------------------------------------
+    # Delta events
+    # ------------------------------------------------------------------
+
+    def subscribe(self, callback: Callable[[List[PropertyDelta]], None]):
+        """Register a consumer (e.g. AddressMatcher.apply_property_deltas) for snapshot deltas"""
+        self._subscribers.append(callback)
+
+    def _emit(self, deltas: List[PropertyDelta]):
+        for callback in list(self._subscribers):
+            try:
+                callback(deltas)
+            except Exception as e:
+                logger.error(f"Error delivering property deltas: {e}")
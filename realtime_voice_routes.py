@@ -113,7 +113,7 @@ def register_realtime_routes(app, socketio):
                 audio_data = base64.b64decode(audio_payload)
                 
                 # Process with VAD
-                is_speaking, speech_ended = vad_detector.process_audio_chunk(audio_data)
+                is_speaking, speech_ended = vad_detector.process_audio_chunk(audio_data, call_sid)
                 
                 # Emit VAD status for monitoring
                 emit('vad_status', {
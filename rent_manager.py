@@ -1,11 +1,242 @@
 import os
+import re
+import time
 import aiohttp
 import asyncio
 import logging
+import threading
+from collections import defaultdict
 from typing import Optional, Dict, Any, List
+from async_runtime import run_in_runtime
 
 logger = logging.getLogger(__name__)
 
+# Connection pool / token tuning (overridable per deployment)
+MAX_CONNECTIONS_PER_HOST = int(os.environ.get('RENT_MANAGER_MAX_CONNECTIONS_PER_HOST', '8'))
+KEEPALIVE_TIMEOUT = float(os.environ.get('RENT_MANAGER_KEEPALIVE_TIMEOUT', '60'))
+REQUEST_TIMEOUT = float(os.environ.get('RENT_MANAGER_REQUEST_TIMEOUT', '15'))
+# Rent Manager expires idle tokens; refresh before we get there instead of eating a 401
+TOKEN_IDLE_REFRESH_SECONDS = float(os.environ.get('RENT_MANAGER_TOKEN_IDLE_REFRESH', '1500'))
+
+
+class RentManagerConnection:
+    """
+    Long-lived, connection-pooled client shared by every RentManagerAPI with the same login.
+    - One aiohttp session (keep-alive, per-host connection limit) on the shared async runtime
+    - One API token per login, refreshed proactively and re-acquired single-flight on 401
+    - Per-endpoint latency / error / timeout metrics
+    """
+    
+    _connections: Dict[Any, 'RentManagerConnection'] = {}
+    _registry_lock = threading.Lock()
+    
+    @classmethod
+    def for_credentials(cls, base_url: str, username: Optional[str], password: Optional[str],
+                        location_id: Optional[int], session_token: Optional[str] = None) -> 'RentManagerConnection':
+        key = (base_url, username, location_id) if username else (base_url, session_token)
+        with cls._registry_lock:
+            connection = cls._connections.get(key)
+            if connection is None:
+                connection = cls(base_url, username, password, location_id, session_token)
+                cls._connections[key] = connection
+            return connection
+    
+    def __init__(self, base_url: str, username: Optional[str], password: Optional[str],
+                 location_id: Optional[int], session_token: Optional[str] = None):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.location_id = location_id
+        self.session_token = session_token
+        self.token_acquired_at = time.time() if session_token else None
+        self.token_last_used_at = self.token_acquired_at
+        self.base_headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        self.max_connections_per_host = MAX_CONNECTIONS_PER_HOST
+        self.request_timeout = REQUEST_TIMEOUT
+        
+        self._session = None
+        self._session_pid = None
+        self._auth_lock = None
+        self.metrics = defaultdict(lambda: {'count': 0, 'errors': 0, 'timeouts': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        self.auth_count = 0
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session lazily on the shared runtime loop (once per worker process)"""
+        if self._session is None or self._session.closed or self._session_pid != os.getpid():
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.base_headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+            self._session_pid = os.getpid()
+            self._auth_lock = asyncio.Lock()
+        return self._session
+    
+    def _token_needs_refresh(self) -> bool:
+        if not self.session_token:
+            return True
+        if not self.username:
+            return False  # Pre-issued token - nothing to refresh with
+        idle = time.time() - (self.token_last_used_at or 0)
+        return idle > TOKEN_IDLE_REFRESH_SECONDS
+    
+    async def ensure_token(self, stale_token: Optional[str] = None) -> bool:
+        """
+        Single-flight authentication: concurrent callers wait on one AuthorizeUser call.
+        stale_token marks a token the caller saw rejected; if another coroutine already
+        replaced it we reuse the new one instead of logging in again.
+        """
+        self._get_session()
+        async with self._auth_lock:
+            if self.session_token and self.session_token != stale_token and not self._token_needs_refresh():
+                return True
+            # Proactive refresh: the old token still holds one of the login's sessions - give it back first
+            if self.username and self.session_token and self.session_token != stale_token:
+                await self._release_token(self.session_token)
+            return await self._authorize()
+    
+    async def _release_token(self, token: str):
+        """Best-effort DeAuthorize so a replaced token stops counting against the login's session limit"""
+        try:
+            url = f"{self.base_url}/Authentication/DeAuthorize"
+            async with self._get_session().post(url, headers={"X-RM12Api-ApiToken": token}) as response:
+                if response.status not in (200, 204, 401):
+                    logger.warning(f"Rent Manager token release returned {response.status}")
+        except Exception as e:
+            logger.warning(f"Rent Manager token release failed: {e}")
+    
+    async def _authorize(self) -> bool:
+        if not (self.username and self.password):
+            if self.session_token:
+                return True
+            logger.error("No username/password provided for authentication")
+            return False
+            
+        try:
+            auth_data = {
+                "Username": self.username,
+                "Password": self.password,
+                "LocationID": self.location_id or 1
+            }
+            
+            url = f"{self.base_url}/Authentication/AuthorizeUser"
+            session = self._get_session()
+            async with session.post(url, json=auth_data) as response:
+                if response.status == 200:
+                    # Token is returned as quoted string, remove quotes
+                    self.session_token = (await response.text()).strip('"')
+                    self.token_acquired_at = time.time()
+                    self.token_last_used_at = self.token_acquired_at
+                    self.auth_count += 1
+                    logger.info("Successfully authenticated with Rent Manager API")
+                    return True
+                elif response.status == 401:
+                    error_text = await response.text()
+                    if "already logged in maximum number of times" in error_text:
+                        logger.warning("Rent Manager API session limit reached - using existing session management")
+                        return False
+                    else:
+                        logger.error(f"Authentication failed: {response.status} - {error_text}")
+                        return False
+                else:
+                    logger.error(f"Authentication failed: {response.status} - {await response.text()}")
+                    return False
+                    
+        except Exception as e:
+            logger.error(f"Authentication error: {e}")
+            return False
+    
+    async def request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Any]:
+        """Authenticated request over the pooled session, retrying once on 401"""
+        if self._token_needs_refresh() and not await self.ensure_token():
+            return None
+        
+        metric = self.metrics[f"{method} {_metric_endpoint(endpoint)}"]
+        url = f"{self.base_url}{endpoint}"
+        session = self._get_session()
+        
+        started = time.perf_counter()
+        try:
+            for attempt in range(2):
+                token = self.session_token
+                try:
+                    async with session.request(method, url, json=data, headers={"X-RM12Api-ApiToken": token}) as response:
+                        if response.status == 401 and attempt == 0 and self.username:
+                            logger.warning(f"Rent Manager token rejected on {endpoint} - re-authenticating")
+                            if not await self.ensure_token(stale_token=token):
+                                return None
+                            continue
+                        
+                        self.token_last_used_at = time.time()
+                        if response.status == 200:
+                            return await response.json()
+                        elif response.status == 404:
+                            return None
+                        else:
+                            metric['errors'] += 1
+                            logger.error(f"Rent Manager API error: {response.status} - {await response.text()}")
+                            return None
+                            
+                except asyncio.TimeoutError:
+                    metric['timeouts'] += 1
+                    logger.error(f"Rent Manager API timeout after {self.request_timeout}s: {method} {endpoint}")
+                    return None
+                except aiohttp.ClientError as e:
+                    metric['errors'] += 1
+                    logger.error(f"Network error accessing Rent Manager API: {e}")
+                    return None
+                except Exception as e:
+                    metric['errors'] += 1
+                    logger.error(f"Unexpected error with Rent Manager API: {e}")
+                    return None
+            
+            return None
+        finally:
+            # One sample per request, including a 401 re-auth retry
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            metric['count'] += 1
+            metric['total_ms'] += elapsed_ms
+            metric['max_ms'] = max(metric['max_ms'], elapsed_ms)
+    
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per-endpoint latency/timeout summary plus pool and token state"""
+        endpoints = {}
+        for name, m in list(self.metrics.items()):
+            endpoints[name] = {
+                'count': m['count'],
+                'errors': m['errors'],
+                'timeouts': m['timeouts'],
+                'avg_ms': round(m['total_ms'] / m['count'], 1) if m['count'] else 0.0,
+                'max_ms': round(m['max_ms'], 1)
+            }
+        return {
+            'endpoints': endpoints,
+            'max_connections_per_host': self.max_connections_per_host,
+            'authenticated': bool(self.session_token),
+            'token_age_seconds': round(time.time() - self.token_acquired_at, 1) if self.token_acquired_at else None,
+            'auth_count': self.auth_count
+        }
+
+
+def _metric_endpoint(endpoint: str) -> str:
+    """Collapse IDs and query strings so metrics aggregate per endpoint shape"""
+    path = endpoint.split('?', 1)[0]
+    return re.sub(r'/\d+', '/{id}', path)
+
+
 class RentManagerAPI:
     """
     Rent Manager API integration for tenant management, notes, and service issues.
@@ -13,6 +244,7 @@ class RentManagerAPI:
     
     def __init__(self, credentials: str):
         # Parse credentials - expecting format "username:password:locationID" or just the session token
+        session_token = None
         if ':' in credentials:
             parts = credentials.split(':')
             self.username = parts[0]
@@ -22,10 +254,9 @@ class RentManagerAPI:
                 self.location_id = int(parts[2]) if len(parts) > 2 else 1
             except (ValueError, IndexError):
                 self.location_id = 1
-            self.session_token = None
         else:
             # Assume it's already a session token
-            self.session_token = credentials
+            session_token = credentials
             self.username = None
             self.password = None
             self.location_id = None
@@ -35,74 +266,28 @@ class RentManagerAPI:
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
+        self.phone_directory = None
+        # Every instance with the same login shares one pooled session and one token
+        self.connection = RentManagerConnection.for_credentials(
+            self.base_url, self.username, self.password, self.location_id, session_token
+        )
+    
+    @property
+    def session_token(self) -> Optional[str]:
+        return self.connection.session_token
     
     async def authenticate(self) -> bool:
         """Authenticate with Rent Manager API to get session token"""
         if self.session_token:
             return True  # Already have token
-            
-        if not (self.username and self.password):
-            logger.error("No username/password provided for authentication")
-            return False
-            
-        try:
-            auth_data = {
-                "Username": self.username,
-                "Password": self.password,
-                "LocationID": self.location_id or 1
-            }
-            
-            url = f"{self.base_url}/Authentication/AuthorizeUser"
-            async with aiohttp.ClientSession(headers=self.base_headers) as session:
-                async with session.post(url, json=auth_data) as response:
-                    if response.status == 200:
-                        # Token is returned as quoted string, remove quotes
-                        self.session_token = (await response.text()).strip('"')
-                        logger.info("Successfully authenticated with Rent Manager API")
-                        return True
-                    elif response.status == 401:
-                        error_text = await response.text()
-                        if "already logged in maximum number of times" in error_text:
-                            logger.warning("Rent Manager API session limit reached - using existing session management")
-                            # For production, you would implement session management or wait
-                            return False
-                        else:
-                            logger.error(f"Authentication failed: {response.status} - {error_text}")
-                            return False
-                    else:
-                        logger.error(f"Authentication failed: {response.status} - {await response.text()}")
-                        return False
-                        
-        except Exception as e:
-            logger.error(f"Authentication error: {e}")
-            return False
+        return await run_in_runtime(self.connection.ensure_token())
 
-    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Dict]:
-        """Make an HTTP request to the Rent Manager API."""
-        # Ensure we're authenticated
-        if not self.session_token and not await self.authenticate():
-            return None
-            
-        url = f"{self.base_url}{endpoint}"
-        headers = {**self.base_headers, "X-RM12Api-ApiToken": self.session_token}
-        
-        try:
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.request(method, url, json=data) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    elif response.status == 404:
-                        return None
-                    else:
-                        logger.error(f"Rent Manager API error: {response.status} - {await response.text()}")
-                        return None
-                        
-        except aiohttp.ClientError as e:
-            logger.error(f"Network error accessing Rent Manager API: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error with Rent Manager API: {e}")
-            return None
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Any]:
+        """Make an HTTP request to the Rent Manager API over the shared connection pool."""
+        return await run_in_runtime(self.connection.request(method, endpoint, data))
+    
+    def get_connection_metrics(self) -> Dict[str, Any]:
+        return self.connection.get_metrics()
     
     async def get_all_properties(self) -> List[Dict[str, Any]]:
         """
@@ -194,93 +379,27 @@ class RentManagerAPI:
             logger.error(f"Error looking up tenant by unit {unit_info}: {e}")
             return None
 
+    def get_phone_directory(self):
+        """Shared phone -> tenant index (built lazily on first lookup)"""
+        if self.phone_directory is None:
+            from tenant_phone_directory import TenantPhoneDirectory
+            self.phone_directory = TenantPhoneDirectory(self)
+        return self.phone_directory
+
     async def lookup_tenant_by_phone(self, phone_number: str) -> Optional[Dict[str, Any]]:
         """
         Look up a tenant by their phone number.
         Returns tenant data if found, None otherwise.
+        Served from the local phone directory - no per-contact API calls on the call path.
         """
         try:
-            # Clean phone number (remove formatting)
-            clean_phone = ''.join(filter(str.isdigit, phone_number))
-            logger.info(f"Searching for tenant with phone: {phone_number} (cleaned: {clean_phone})")
-            
-            # First try to search all contacts directly for phone numbers
-            contacts_endpoint = "/Contacts"
-            all_contacts = await self._make_request("GET", contacts_endpoint)
+            directory = self.get_phone_directory()
+            await directory.ensure_fresh()
             
-            if all_contacts and isinstance(all_contacts, list):
-                logger.info(f"Searching through {len(all_contacts)} contact records for phone number")
-                
-                for contact in all_contacts:
-                    contact_id = contact.get('ContactID')
-                    
-                    # Try to get detailed contact information that might have phone numbers
-                    try:
-                        contact_detail_endpoint = f"/Contacts/{contact_id}"
-                        contact_details = await self._make_request("GET", contact_detail_endpoint)
-                        
-                        if contact_details:
-                            # Check all possible phone fields in the detailed contact
-                            phone_fields = ['Phone', 'CellPhone', 'WorkPhone', 'HomePhone', 'PhoneNumber', 'MobilePhone', 'BusinessPhone', 'MainPhone']
-                            
-                            for phone_field in phone_fields:
-                                contact_phone = contact_details.get(phone_field, '')
-                                if not contact_phone:
-                                    continue
-                                    
-                                # Clean contact phone for comparison
-                                clean_contact_phone = ''.join(filter(str.isdigit, contact_phone))
-                                
-                                # Check for phone match
-                                if clean_contact_phone and (
-                                    clean_contact_phone == clean_phone or
-                                    clean_contact_phone.endswith(clean_phone[-10:])  # Last 10 digits match
-                                ):
-                                    logger.info(f"Found phone match in contact {contact_id}! Phone: {contact_phone} (field: {phone_field})")
-                                    
-                                    # This contact has the phone, now find which tenant it belongs to
-                                    parent_id = contact.get('ParentID')
-                                    parent_type = contact.get('ParentType')
-                                    
-                                    if parent_type == 'Tenant' and parent_id:
-                                        # Get tenant information
-                                        tenant_endpoint = f"/Tenants/{parent_id}"
-                                        tenant = await self._make_request("GET", tenant_endpoint)
-                                        
-                                        if tenant:
-                                            # Get unit information for this tenant
-                                            unit_endpoint = f"/Tenants/{parent_id}/Units"
-                                            units = await self._make_request("GET", unit_endpoint)
-                                            
-                                            unit_info = "Unit information unavailable"
-                                            if units and isinstance(units, list) and len(units) > 0:
-                                                unit = units[0]  # Get first unit
-                                                unit_name = unit.get('Name', '')
-                                                # Get property info for full address
-                                                property_id = unit.get('PropertyID')
-                                                if property_id:
-                                                    prop_endpoint = f"/Properties/{property_id}"
-                                                    property_data = await self._make_request("GET", prop_endpoint)
-                                                    if property_data:
-                                                        property_name = property_data.get('Name', '')
-                                                        unit_info = f"Unit {unit_name} at {property_name}"
-                                            
-                                            return {
-                                                'TenantID': parent_id,
-                                                'FirstName': tenant.get('FirstName', ''),
-                                                'LastName': tenant.get('LastName', ''),
-                                                'Name': tenant.get('Name', ''),
-                                                'Phone': contact_phone,
-                                                'Unit': unit_info,
-                                                'Status': tenant.get('Status', 'Current'),
-                                                'PropertyID': tenant.get('PropertyID'),
-                                                'Address': unit_info
-                                            }
-                                    break  # Found match, break out of phone_field loop
-                                    
-                    except Exception as e:
-                        logger.warning(f"Error checking contact details for contact {contact_id}: {e}")
-                        continue
+            tenant = directory.lookup(phone_number)
+            if tenant:
+                logger.info(f"Found tenant {tenant.get('Name')} for phone {phone_number} in phone directory")
+                return tenant
             
             logger.info(f"No tenant found with phone number: {phone_number}")
             return None
@@ -5,7 +5,7 @@ Provides verify_property and create_ticket functions for the production system
 
 import logging
 import os
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 
 logger = logging.getLogger(__name__)
 
@@ -15,19 +15,17 @@ def verify_property(address: str) -> Optional[Dict[str, Any]]:
     Returns property data if found, None if not found
     """
     try:
-        # Import existing property backup system
-        from comprehensive_property_data import address_matcher
+        from async_runtime import run_sync
         
-        # Use address matcher for property verification
-        matched_properties = address_matcher.find_matching_properties(address)
+        # Shared property registry via the worker-wide AddressMatcher
+        prop = run_sync(_get_address_matcher().find_matching_property(address))
         
-        if matched_properties:
-            # Return first match with Rent Manager format
-            prop = matched_properties[0]
+        if prop:
+            # Return match in Rent Manager format
             return {
-                'propertyId': prop.get('PropertyID'),
+                'propertyId': prop.get('PropertyID') or prop.get('ID'),
                 'name': prop.get('Name', ''),
-                'address': prop.get('StreetAddress', ''),
+                'address': prop.get('StreetAddress') or prop.get('Address', ''),
                 'city': prop.get('City', ''),
                 'state': prop.get('State', ''),
                 'zipCode': prop.get('PostalCode', ''),
@@ -85,25 +83,59 @@ def suggest_similar_properties(partial_address: str, limit: int = 3) -> list:
     """
     Suggest similar property addresses for spelling assistance
     """
+    results = suggest_similar_properties_batch([partial_address], limit)
+    return results[0] if results else []
+
+def suggest_similar_properties_batch(partial_addresses: List[str], limit: int = 3) -> List[list]:
+    """
+    Suggest similar properties for many spoken addresses in one pass over the property index
+    (N-best STT alternates, or reprocessing a backlog of call transcripts)
+    """
     try:
-        from comprehensive_property_data import address_matcher
+        from async_runtime import run_sync
         
-        # Use fuzzy matching to find similar addresses
-        suggestions = address_matcher.get_address_suggestions(partial_address, limit)
+        matcher = _get_address_matcher()
+        batch = run_sync(matcher.resolve_addresses_batch(partial_addresses, limit))
         
         return [
-            {
-                'address': prop.get('StreetAddress', ''),
-                'city': prop.get('City', ''),
-                'propertyId': prop.get('PropertyID'),
-                'confidence': prop.get('match_confidence', 0.0)
-            }
-            for prop in suggestions
+            [
+                {
+                    'address': candidate['property'].get('StreetAddress') or candidate['property'].get('Address') or candidate['name'],
+                    'city': candidate['property'].get('City', ''),
+                    'propertyId': candidate['property'].get('PropertyID') or candidate['property'].get('ID'),
+                    'confidence': _match_confidence(candidate)
+                }
+                for candidate in ranked
+            ]
+            for ranked in batch
         ]
         
     except Exception as e:
         logger.error(f"Address suggestion failed: {e}")
-        return []
+        return [[] for _ in partial_addresses]
+
+def _match_confidence(candidate: Dict[str, Any]) -> float:
+    """Map matcher scores onto 0-1 (exact name match = 1.0, house number + street ~ 1.0)"""
+    if candidate['match_type'] == 'exact':
+        return 1.0
+    return round(min(1.0, max(0.0, candidate['score']) / 15.0), 2)
+
+_address_matcher = None
+
+def _get_address_matcher():
+    """Process-wide AddressMatcher over the shared property registry (loaded from backup if still empty)"""
+    global _address_matcher
+    if _address_matcher is None:
+        from async_runtime import run_sync
+        from address_matcher import AddressMatcher
+        from property_backup_system import PropertyBackupSystem
+        
+        matcher = AddressMatcher(None)
+        if not matcher.registry.loaded:
+            matcher.properties_cache = run_sync(PropertyBackupSystem(None).load_backup_properties())
+        matcher.cache_loaded = True
+        _address_matcher = matcher
+    return _address_matcher
 
 def format_property_confirmation(property_data: Dict[str, Any]) -> str:
     """
@@ -164,6 +196,7 @@ __all__ = [
     'verify_property',
     'create_ticket', 
     'suggest_similar_properties',
+    'suggest_similar_properties_batch',
     'format_property_confirmation',
     'classify_emergency',
     'should_create_emergency_ticket'
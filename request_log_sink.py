@@ -0,0 +1,300 @@
+"""
+Asynchronous Request Log Sink
+Call-path logging for the request history without touching disk in the webhook
+Entries are queued, then a background writer appends them in batches to a JSONL journal
+and REQUEST_HISTORY.md; the journal is folded into logs_persistent.json every few seconds
+"""
+
+import os
+import json
+import time
+import queue
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOG_SINK_BATCH_SIZE = int(os.environ.get('LOG_SINK_BATCH_SIZE', '50'))
+LOG_SINK_FLUSH_SECONDS = float(os.environ.get('LOG_SINK_FLUSH_SECONDS', '1.0'))
+LOG_SINK_MAX_QUEUE = int(os.environ.get('LOG_SINK_MAX_QUEUE', '10000'))
+LOG_SINK_COMPACT_BYTES = int(os.environ.get('LOG_SINK_COMPACT_BYTES', str(1024 * 1024)))
+LOG_SINK_COMPACT_SECONDS = float(os.environ.get('LOG_SINK_COMPACT_SECONDS', '2.0'))
+
+
+def format_history_entry(log_entry: Dict[str, Any]) -> str:
+    """REQUEST_HISTORY.md block for one log entry"""
+    return f"""
+log #{log_entry['id']:03d} – {log_entry['date']}  
+📝 Request: {log_entry['request']}  
+✅ Resolution: {log_entry['resolution']}
+"""
+
+
+class RequestLogSink:
+    """
+    Request history = compacted JSON snapshot + append-only JSONL journal.
+    - next_id() hands out IDs from a flock-guarded counter file (constant cost, unique across workers)
+    - submit() only enqueues; the writer thread flushes every batch_size entries or flush_seconds
+    - Journaled entries reach the snapshot within compact_seconds (sooner once the journal passes
+      compact_threshold_bytes), so logs_persistent.json stays current for every call interaction
+    - Journal lines are whole log entries; replay upserts by id, so flag/resolution edits persist too
+    - Queue depth, high-water mark, drops and flush timings are exported by get_metrics()
+    """
+
+    def __init__(self, snapshot_file: str = "logs_persistent.json",
+                 journal_file: str = "logs_journal.jsonl",
+                 history_file: str = "REQUEST_HISTORY.md",
+                 batch_size: int = LOG_SINK_BATCH_SIZE,
+                 flush_seconds: float = LOG_SINK_FLUSH_SECONDS,
+                 max_queue: int = LOG_SINK_MAX_QUEUE,
+                 compact_threshold_bytes: int = LOG_SINK_COMPACT_BYTES,
+                 compact_seconds: float = LOG_SINK_COMPACT_SECONDS):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.history_file = history_file
+        self.lock_file = f"{journal_file}.lock"
+        self.counter_file = f"{journal_file}.seq"
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.compact_threshold_bytes = compact_threshold_bytes
+        self.compact_seconds = compact_seconds
+        self._journal_dirty = False
+        self._last_compact = time.time()
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._seed_id = 0
+        self._cached_signature = None
+        self._cached_logs: List[Dict[str, Any]] = []
+        self._metrics_lock = threading.Lock()
+        self.metrics = {'enqueued': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'high_water': 0,
+                        'last_flush_ms': 0.0, 'total_flush_ms': 0.0, 'compactions': 0}
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive cross-process lock guarding the journal, counter and compaction"""
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load_all(self, default: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Snapshot with journaled entries applied, newest first"""
+        with self._file_lock():
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    logs = json.load(f)
+            except FileNotFoundError:
+                logs = list(default or [])
+            except Exception as e:
+                logger.error(f"Error loading logs from file: {e}")
+                logs = list(default or [])
+            journaled = self._read_journal()
+
+        if journaled:
+            by_id = {log.get('id'): log for log in logs}
+            for entry in journaled:
+                by_id[entry.get('id')] = entry
+            logs = sorted(by_id.values(), key=lambda log: log.get('id', 0), reverse=True)
+
+        self._seed_id = max((log.get('id', 0) for log in logs if isinstance(log.get('id'), int)), default=0)
+        return logs
+
+    def signature(self) -> str:
+        """Changes whenever any worker writes or compacts (snapshot and journal mtime/size)"""
+        parts = []
+        for path in (self.snapshot_file, self.journal_file):
+            try:
+                stat = os.stat(path)
+                parts.append(f"{stat.st_mtime_ns:x}.{stat.st_size:x}")
+            except FileNotFoundError:
+                parts.append("0")
+        return "-".join(parts)
+
+    def load_cached(self, default: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """(signature, logs newest first), re-reading the files only after they changed"""
+        signature = self.signature()
+        if signature != self._cached_signature:
+            self._cached_logs = self.load_all(default)
+            self._cached_signature = signature
+        return signature, self._cached_logs
+
+    def _read_journal(self) -> List[Dict[str, Any]]:
+        entries = []
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        logger.warning("Skipping corrupt request log journal line")
+        return entries
+
+    # ------------------------------------------------------------------
+    # Call path
+    # ------------------------------------------------------------------
+
+    def next_id(self) -> int:
+        """Next log ID, monotonic across every worker sharing the files"""
+        with self._file_lock():
+            try:
+                with open(self.counter_file, 'r') as f:
+                    current = int(f.read().strip() or 0)
+            except (FileNotFoundError, ValueError):
+                current = 0
+            new_id = max(current, self._seed_id) + 1
+            with open(self.counter_file, 'w') as f:
+                f.write(str(new_id))
+        return new_id
+
+    def submit(self, log_entry: Dict[str, Any], mirror: bool = True) -> bool:
+        """Queue an entry for the writer; never blocks (drops and counts when the queue is full)"""
+        try:
+            # A snapshot: callers keep mutating their entry (e.g. status updates) after submitting it
+            self._queue.put_nowait((dict(log_entry), mirror))
+        except queue.Full:
+            with self._metrics_lock:
+                self.metrics['dropped'] += 1
+            logger.warning(f"⚠️ Request log queue full - dropped log #{log_entry.get('id')}")
+            return False
+        with self._metrics_lock:
+            self.metrics['enqueued'] += 1
+            self.metrics['high_water'] = max(self.metrics['high_water'], self._queue.qsize())
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is on disk (shutdown and scripts)"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    # ------------------------------------------------------------------
+    # Writer
+    # ------------------------------------------------------------------
+
+    def _writer_loop(self):
+        while True:
+            try:
+                # While journaled entries are waiting for the snapshot, wake up to compact them even if idle
+                batch = [self._queue.get(timeout=self._compact_wait() if self._journal_dirty else None)]
+            except queue.Empty:
+                self._compact_if_due()
+                continue
+            deadline = time.time() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+                self._compact_if_due()
+            except Exception as e:
+                logger.error(f"❌ Error writing request log batch: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _compact_wait(self) -> float:
+        return max(0.0, self._last_compact + self.compact_seconds - time.time())
+
+    def _compact_if_due(self):
+        if self._journal_dirty and self._compact_wait() <= 0:
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"❌ Error compacting request log: {e}")
+
+    def _write_batch(self, batch: List[tuple]):
+        started = time.time()
+        journal = ''.join(json.dumps(entry, separators=(',', ':'), default=str) + "\n" for entry, _ in batch)
+        history = ''.join(format_history_entry(entry) for entry, mirror in batch if mirror)
+
+        with self._file_lock():
+            with open(self.journal_file, 'a') as f:
+                f.write(journal)
+                size = f.tell()
+        if history:
+            try:
+                with open(self.history_file, 'a') as f:
+                    f.write(history)
+            except Exception as e:
+                logger.error(f"Error updating {self.history_file}: {e}")
+
+        elapsed_ms = (time.time() - started) * 1000
+        with self._metrics_lock:
+            self.metrics['written'] += len(batch)
+            self.metrics['batches'] += 1
+            self.metrics['last_flush_ms'] = round(elapsed_ms, 2)
+            self.metrics['total_flush_ms'] += elapsed_ms
+
+        self._journal_dirty = True
+        if size >= self.compact_threshold_bytes:
+            self.compact()
+
+    def compact(self) -> int:
+        """Fold the journal into the snapshot (newest first), then start a fresh journal"""
+        self._journal_dirty = False
+        self._last_compact = time.time()
+        with self._file_lock():
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    logs = json.load(f)
+            except FileNotFoundError:
+                logs = []
+            journaled = self._read_journal()
+            if not journaled:
+                return 0
+
+            by_id = {log.get('id'): log for log in logs}
+            for entry in journaled:
+                by_id[entry.get('id')] = entry
+            logs = sorted(by_id.values(), key=lambda log: log.get('id', 0), reverse=True)
+
+            tmp_file = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(logs, f, indent=2)
+            os.replace(tmp_file, self.snapshot_file)
+            open(self.journal_file, 'w').close()
+
+        with self._metrics_lock:
+            self.metrics['compactions'] += 1
+        logger.info(f"🗜️ REQUEST LOG COMPACTED: {len(journaled)} journal entries folded into {self.snapshot_file}")
+        return len(journaled)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['queue_capacity'] = self._queue.maxsize
+        metrics['avg_flush_ms'] = round(metrics.pop('total_flush_ms') / metrics['batches'], 2) if metrics['batches'] else 0.0
+        metrics['avg_batch'] = round(metrics['written'] / metrics['batches'], 1) if metrics['batches'] else 0.0
+        return metrics
+
+
+_request_log_sink: Optional[RequestLogSink] = None
+_request_log_sink_lock = threading.Lock()
+
+
+def get_request_log_sink() -> RequestLogSink:
+    """Process-wide sink (the files themselves are shared across workers)"""
+    global _request_log_sink
+    if _request_log_sink is None:
+        with _request_log_sink_lock:
+            if _request_log_sink is None:
+                _request_log_sink = RequestLogSink()
+    return _request_log_sink
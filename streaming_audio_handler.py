@@ -85,7 +85,7 @@ class StreamingAudioHandler:
                     
                     # Process with VAD
                     from voice_activity_detection import vad_detector
-                    is_speaking, speech_ended = vad_detector.process_audio_chunk(audio_data)
+                    is_speaking, speech_ended = vad_detector.process_audio_chunk(audio_data, call_sid)
                     
                     if is_speaking:
                         # User is speaking - send to OpenAI Realtime
@@ -0,0 +1,357 @@
+"""
+Streaming Speech-to-Text Engine
+Per-call STT sessions fed with Twilio's 8 kHz μ-law media frames
+Frames accumulate in a preallocated utterance buffer, the call's VAD marks the turn end,
+and pluggable backends return partial and final N-best hypotheses with confidences
+"""
+
+import os
+import io
+import abc
+import math
+import time
+import struct
+import logging
+import threading
+from typing import Dict, List, Any, Optional, NamedTuple
+
+from mulaw_audio import SAMPLE_RATE, BYTES_PER_MS
+from voice_activity_detection import VoiceActivityDetector, vad_detector
+from async_runtime import run_in_runtime
+from call_session_registry import get_call_sessions
+
+logger = logging.getLogger(__name__)
+
+STT_BACKEND = os.environ.get('STT_BACKEND', 'whisper')  # whisper | local
+STT_N_BEST = int(os.environ.get('STT_N_BEST', '3'))
+STT_PARTIAL_MS = int(os.environ.get('STT_PARTIAL_MS', '800'))
+STT_PREROLL_MS = int(os.environ.get('STT_PREROLL_MS', '200'))
+STT_MAX_UTTERANCE_SECONDS = int(os.environ.get('STT_MAX_UTTERANCE_SECONDS', '30'))
+STT_WHISPER_MODEL = os.environ.get('STT_WHISPER_MODEL', 'whisper-1')
+STT_LOCAL_SCRIPT = os.environ.get('STT_LOCAL_SCRIPT')
+
+
+def mulaw_wav(mulaw: bytes) -> bytes:
+    """Wrap raw 8 kHz μ-law in a WAV (format 7) container - no transcoding needed for upload"""
+    fmt = struct.pack('<HHIIHHH', 7, 1, SAMPLE_RATE, SAMPLE_RATE, 1, 8, 0)
+    fact = struct.pack('<I', len(mulaw))
+    body = (b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt +
+            b'fact' + struct.pack('<I', len(fact)) + fact +
+            b'data' + struct.pack('<I', len(mulaw)) + mulaw)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+class SttResult(NamedTuple):
+    is_final: bool
+    hypotheses: List[Dict[str, Any]]  # [{'text', 'confidence'}], best first
+    audio_ms: int
+    latency_ms: float
+
+
+class UtteranceBuffer:
+    """
+    Preallocated μ-law buffer for the utterance in progress.
+    Frames are copied once into place; reads are memoryview slices, and reset() just rewinds.
+    Past capacity the oldest audio is dropped (the buffer keeps the last max_seconds).
+    """
+
+    def __init__(self, max_seconds: int = STT_MAX_UTTERANCE_SECONDS):
+        self.capacity = max_seconds * SAMPLE_RATE
+        self._data = bytearray(self.capacity)
+        self._view = memoryview(self._data)
+        self.length = 0
+
+    def write(self, frame: bytes):
+        size = len(frame)
+        if size >= self.capacity:
+            self._view[:] = frame[-self.capacity:]
+            self.length = self.capacity
+            return
+        overflow = self.length + size - self.capacity
+        if overflow > 0:
+            self._view[:self.length - overflow] = self._view[overflow:self.length]
+            self.length -= overflow
+        self._view[self.length:self.length + size] = frame
+        self.length += size
+
+    def audio(self) -> memoryview:
+        return self._view[:self.length]
+
+    def keep_last(self, size: int):
+        """Trim to the newest size bytes (compacts only once twice that has built up)"""
+        if self.length > 2 * size:
+            self._view[:size] = self._view[self.length - size:self.length]
+            self.length = size
+
+    def reset(self):
+        self.length = 0
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+
+class SttBackend(abc.ABC):
+    """Transcribes one μ-law utterance (or the utterance so far, for partials) into N-best hypotheses"""
+    name = 'base'
+    supports_partials = False
+
+    @abc.abstractmethod
+    async def transcribe(self, call_sid: str, mulaw: bytes, n_best: int, is_final: bool = True) -> List[Dict[str, Any]]:
+        ...
+
+    def close(self, call_sid: str):
+        pass
+
+
+class WhisperSttBackend(SttBackend):
+    """
+    OpenAI Whisper over the conversation manager's pooled AsyncOpenAI client,
+    so every utterance of every call reuses the same keep-alive connections.
+    Whisper returns a single hypothesis; confidence comes from its segment log-probabilities.
+    """
+    name = 'whisper'
+    supports_partials = os.environ.get('STT_WHISPER_PARTIALS', 'false').lower() == 'true'
+
+    def __init__(self, model: str = STT_WHISPER_MODEL):
+        self.model = model
+
+    async def transcribe(self, call_sid: str, mulaw: bytes, n_best: int, is_final: bool = True) -> List[Dict[str, Any]]:
+        from openai_conversation_manager import conversation_manager
+        # The pooled client belongs to the shared runtime loop, not the media stream's own loop
+        response = await run_in_runtime(conversation_manager.async_openai_client.audio.transcriptions.create(
+            model=self.model,
+            file=('utterance.wav', io.BytesIO(mulaw_wav(bytes(mulaw))), 'audio/wav'),
+            language='en',
+            response_format='verbose_json'
+        ))
+        text = (response.text or '').strip()
+        if not text:
+            return []
+        segments = getattr(response, 'segments', None) or []
+        logprobs = [segment.avg_logprob for segment in segments if getattr(segment, 'avg_logprob', None) is not None]
+        confidence = math.exp(sum(logprobs) / len(logprobs)) if logprobs else 0.8
+        return [{'text': text, 'confidence': round(min(confidence, 1.0), 3)}]
+
+
+class LocalSttBackend(SttBackend):
+    """
+    Deterministic on-box stand-in for load tests: no network, constant cost.
+    Each call walks a script of caller utterances (STT_LOCAL_SCRIPT, one per line);
+    partials reveal the words in proportion to the speech heard so far.
+    """
+    name = 'local'
+    supports_partials = True
+
+    DEFAULT_SCRIPT = [
+        "Hi, my heat is not working.",
+        "I live at 29 Port Richmond Avenue, unit 2B.",
+        "My name is Maria and my number is 718-555-0142.",
+        "The kitchen sink is leaking under the cabinet.",
+        "Yes, that's correct, thank you.",
+    ]
+    WORDS_PER_SECOND = 2.5
+
+    def __init__(self, script_file: Optional[str] = STT_LOCAL_SCRIPT):
+        self.script = self.DEFAULT_SCRIPT
+        if script_file:
+            with open(script_file, 'r') as f:
+                self.script = [line.strip() for line in f if line.strip()] or self.DEFAULT_SCRIPT
+        self._turns: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def transcribe(self, call_sid: str, mulaw: bytes, n_best: int, is_final: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            turn = self._turns.get(call_sid, 0)
+            if is_final:
+                self._turns[call_sid] = turn + 1
+        text = self.script[turn % len(self.script)]
+
+        if not is_final:
+            words = text.split()
+            heard = max(1, int(len(mulaw) / SAMPLE_RATE * self.WORDS_PER_SECOND))
+            return [{'text': ' '.join(words[:heard]), 'confidence': 0.6}]
+
+        plain = text.rstrip('.?!').lower()
+        hypotheses = [
+            {'text': text, 'confidence': 0.92},
+            {'text': plain, 'confidence': 0.71},
+            {'text': ' '.join(plain.split()[:-1]) or plain, 'confidence': 0.48},
+        ]
+        return hypotheses[:n_best]
+
+    def close(self, call_sid: str):
+        with self._lock:
+            self._turns.pop(call_sid, None)
+
+
+BACKENDS = {
+    'whisper': WhisperSttBackend,
+    'local': LocalSttBackend,
+}
+
+
+# ----------------------------------------------------------------------
+# Sessions
+# ----------------------------------------------------------------------
+
+class StreamingSttSession:
+    """
+    One call's recognizer state. feed() takes each media frame as it arrives:
+    - the call's VAD decides speech / turn end; while idle only a short pre-roll is kept,
+      so word onsets before the VAD triggers aren't clipped
+    - every partial_ms of utterance audio a partial result is produced (if the backend supports partials)
+    - the VAD's end of turn detaches the utterance audio for pop_utterance(); its final result comes from
+      recognize_final(), which the caller runs as a task so frames keep flowing meanwhile
+    """
+
+    def __init__(self, call_sid: str, engine: "StreamingSttEngine"):
+        self.call_sid = call_sid
+        self.engine = engine
+        self.buffer = UtteranceBuffer()
+        self.last_partial_ms = 0
+        self.partial_text = ''
+        self.speech_started = False  # the last frame fed started speech (barge-in trigger)
+        self.utterance: Optional[bytes] = None  # audio of the utterance the last frame ended
+
+    async def feed(self, mulaw) -> Optional[SttResult]:
+        """Partial result, if one is due; an ended utterance is left for pop_utterance()"""
+        self.buffer.write(mulaw)
+        vad = self.engine.vad.process(self.call_sid, mulaw)
+        self.speech_started = vad.speech_started
+        if vad.speech_ended:
+            self.utterance = self.take_utterance()
+            return None
+        if not vad.is_speaking:
+            self.buffer.keep_last(self.engine.preroll_bytes)
+            self.last_partial_ms = 0
+            return None
+
+        heard_ms = self.buffer.length // BYTES_PER_MS
+        if self.engine.backend.supports_partials and heard_ms - self.last_partial_ms >= self.engine.partial_ms:
+            self.last_partial_ms = heard_ms
+            result = await self.engine._recognize(self.call_sid, self.buffer.audio(), is_final=False)
+            if result and result.hypotheses:
+                self.partial_text = result.hypotheses[0]['text']
+            return result
+        return None
+
+    def pop_utterance(self) -> Optional[bytes]:
+        """Audio of the utterance ended by the last frame fed (once), or None"""
+        utterance, self.utterance = self.utterance, None
+        return utterance
+
+    def take_utterance(self) -> Optional[bytes]:
+        """Detach the utterance audio buffered so far and rewind for the next one"""
+        audio = bytes(self.buffer.audio())
+        self.buffer.reset()
+        self.last_partial_ms = 0
+        self.partial_text = ''
+        return audio or None
+
+    async def recognize_final(self, audio: bytes) -> Optional[SttResult]:
+        return await self.engine._recognize(self.call_sid, audio, is_final=True)
+
+    async def finish(self) -> Optional[SttResult]:
+        """End the utterance now (e.g. the stream stopped mid-speech) and recognize it"""
+        audio = self.take_utterance()
+        if not audio:
+            return None
+        return await self.recognize_final(audio)
+
+
+class StreamingSttEngine:
+    """
+    Worker-wide STT: one backend, one session per call (kept in the call-session registry,
+    so sessions expire with the call) and latency / volume metrics.
+    """
+
+    def __init__(self, backend: Optional[SttBackend] = None, n_best: int = STT_N_BEST,
+                 partial_ms: int = STT_PARTIAL_MS, preroll_ms: int = STT_PREROLL_MS,
+                 vad: Optional[VoiceActivityDetector] = None):
+        self.backend = backend or BACKENDS[STT_BACKEND]()
+        self.n_best = n_best
+        self.partial_ms = partial_ms
+        self.preroll_bytes = preroll_ms * BYTES_PER_MS
+        self.vad = vad or vad_detector
+
+        call_sessions = get_call_sessions()
+        self.sessions = call_sessions.namespace('stt.sessions')
+        call_sessions.register_teardown(self.backend.close)
+
+        self._metrics_lock = threading.Lock()
+        self.metrics = {'sessions_opened': 0, 'partials': 0, 'finals': 0, 'empty_finals': 0, 'errors': 0,
+                        'audio_ms': 0, 'total_final_latency_ms': 0.0}
+        logger.info(f"🎙️ Streaming STT engine ready (backend: {self.backend.name})")
+
+    def open_session(self, call_sid: str) -> StreamingSttSession:
+        session = StreamingSttSession(call_sid, self)
+        self.sessions[call_sid] = session
+        with self._metrics_lock:
+            self.metrics['sessions_opened'] += 1
+        return session
+
+    def get_session(self, call_sid: str) -> StreamingSttSession:
+        session = self.sessions.get(call_sid)
+        return session if session is not None else self.open_session(call_sid)
+
+    def close_session(self, call_sid: str):
+        self.sessions.pop(call_sid, None)
+        self.vad.reset(call_sid)
+        self.backend.close(call_sid)
+
+    async def feed(self, call_sid: str, mulaw: bytes) -> Optional[SttResult]:
+        return await self.get_session(call_sid).feed(mulaw)
+
+    async def transcribe(self, call_sid: str, mulaw: bytes) -> List[Dict[str, Any]]:
+        """One-shot N-best transcription of a complete μ-law utterance"""
+        result = await self._recognize(call_sid, mulaw, is_final=True)
+        return result.hypotheses if result else []
+
+    async def _recognize(self, call_sid: str, mulaw: bytes, is_final: bool) -> Optional[SttResult]:
+        started = time.time()
+        try:
+            hypotheses = await self.backend.transcribe(call_sid, mulaw, self.n_best, is_final=is_final)
+        except Exception as e:
+            with self._metrics_lock:
+                self.metrics['errors'] += 1
+            logger.error(f"STT {'final' if is_final else 'partial'} error for {call_sid}: {e}")
+            return None
+
+        latency_ms = (time.time() - started) * 1000
+        audio_ms = len(mulaw) // BYTES_PER_MS
+        with self._metrics_lock:
+            if is_final:
+                self.metrics['finals'] += 1
+                self.metrics['audio_ms'] += audio_ms
+                self.metrics['total_final_latency_ms'] += latency_ms
+                if not hypotheses:
+                    self.metrics['empty_finals'] += 1
+            else:
+                self.metrics['partials'] += 1
+        if is_final and hypotheses:
+            logger.info(f"📝 STT final for {call_sid}: '{hypotheses[0]['text'][:60]}' "
+                        f"({hypotheses[0]['confidence']:.2f}, {audio_ms}ms audio, {latency_ms:.0f}ms)")
+        return SttResult(is_final, hypotheses, audio_ms, round(latency_ms, 1))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        total_latency = metrics.pop('total_final_latency_ms')
+        metrics['backend'] = self.backend.name
+        metrics['active_sessions'] = len(self.sessions)
+        metrics['avg_final_latency_ms'] = round(total_latency / metrics['finals'], 1) if metrics['finals'] else 0.0
+        return metrics
+
+
+_stt_engine: Optional[StreamingSttEngine] = None
+_stt_engine_lock = threading.Lock()
+
+
+def get_stt_engine() -> StreamingSttEngine:
+    global _stt_engine
+    if _stt_engine is None:
+        with _stt_engine_lock:
+            if _stt_engine is None:
+                _stt_engine = StreamingSttEngine()
+    return _stt_engine
@@ -305,9 +305,8 @@ def process_speech_chunk(call_sid, speech_text):
         context = media_stream_handler.build_context_with_facts(call_sid, speech_text)
         
         # Get OpenAI response (non-streaming for sentence-chunk mode)
-        import asyncio
-        response_text, mode_used, processing_time = asyncio.run(
-            conversation_manager.process_user_input(call_sid, speech_text)
+        response_text, mode_used, processing_time = conversation_manager.process_user_input_sync(
+            call_sid, speech_text
         )
         
         # Update session facts
@@ -0,0 +1,362 @@
+"""
+Tenant Phone Directory for Rent Manager API
+Local phone-number index so caller ID lookups never scan /Contacts on a live call
+Built in bulk, refreshed incrementally in the background and persisted to disk
+"""
+
+import os
+import json
+import time
+import logging
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Contact fields that may carry a phone number when PhoneNumbers is not embedded
+PHONE_FIELDS = ['Phone', 'CellPhone', 'WorkPhone', 'HomePhone', 'PhoneNumber', 'MobilePhone', 'BusinessPhone', 'MainPhone']
+
+# One bulk request pulls tenants with their contacts, phone numbers, property and leased unit
+TENANT_EMBEDS = "Contacts.PhoneNumbers,Property,Leases.Unit"
+PAGE_SIZE = 1000
+# After a build that produced nothing (API down or empty), wait this long before another full build
+EMPTY_BUILD_BACKOFF_SECONDS = int(os.environ.get('PHONE_DIRECTORY_EMPTY_BACKOFF_SECONDS', '60'))
+
+
+def normalize_phone(phone_number: Optional[str]) -> str:
+    """Normalize a phone number to its last 10 digits (drops +1 and formatting)"""
+    digits = ''.join(filter(str.isdigit, phone_number or ''))
+    return digits[-10:] if len(digits) >= 10 else digits
+
+
+class TenantPhoneDirectory:
+    """
+    In-memory phone -> tenant index with bounded staleness.
+    - Keys are normalized last-10 digits, so lookups are a single dict hit
+    - Full build pages through /Tenants with embedded contacts and phone numbers
+    - Incremental refresh only pulls tenants/contacts updated since the last refresh
+    - Index is persisted to disk so a restarted worker is warm immediately
+    """
+
+    def __init__(self, rent_manager, index_file: str = "tenant_phone_index.json",
+                 max_staleness_seconds: int = 900, refresh_interval_seconds: int = 300):
+        self.rent_manager = rent_manager
+        self.index_file = index_file
+        self.max_staleness_seconds = max_staleness_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.tenant_phones: Dict[str, Set[str]] = {}
+        self.built_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+        self.last_build_attempt: Optional[float] = None
+        self.loaded = False
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self.running = False
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def lookup(self, phone_number: str) -> Optional[Dict[str, Any]]:
+        """O(1) lookup of a tenant record by caller phone number"""
+        key = normalize_phone(phone_number)
+        if not key:
+            return None
+        with self._lock:
+            entry = self.entries.get(key)
+        return dict(entry) if entry else None
+
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the index was last refreshed (None if never built)"""
+        if self.refreshed_at is None:
+            return None
+        return time.time() - self.refreshed_at
+
+    def is_stale(self) -> bool:
+        age = self.age_seconds()
+        return age is None or age > self.max_staleness_seconds
+
+    async def ensure_fresh(self):
+        """
+        Guarantee the index is no older than max_staleness_seconds before a lookup.
+        Normally a no-op because the background refresher keeps it fresh.
+        If a refresh is already running (background thread or another call) the current index is served.
+        """
+        if not self.loaded:
+            self.load_from_disk()
+
+        needs_build = not self.entries and (
+            self.last_build_attempt is None or time.time() - self.last_build_attempt > EMPTY_BUILD_BACKOFF_SECONDS)
+        if (needs_build or (self.entries and self.is_stale())) and self._refresh_lock.acquire(blocking=False):
+            try:
+                if needs_build:
+                    await self.build_full()
+                else:
+                    await self.refresh_incremental()
+            finally:
+                self._refresh_lock.release()
+
+        self.start_background_refresh()
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    async def build_full(self) -> int:
+        """Build the whole index from paged bulk /Tenants requests"""
+        started = time.time()
+        self.last_build_attempt = started
+        tenants = await self._fetch_tenants()
+        if tenants is None:
+            logger.warning("⚠️ Phone directory build failed - keeping existing index")
+            return len(self.entries)
+
+        entries: Dict[str, Dict[str, Any]] = {}
+        tenant_phones: Dict[str, Set[str]] = {}
+        for tenant in tenants:
+            for key, record in self._records_for_tenant(tenant):
+                entries[key] = record
+                tenant_phones.setdefault(str(record['TenantID']), set()).add(key)
+
+        with self._lock:
+            self.entries = entries
+            self.tenant_phones = tenant_phones
+            self.built_at = started
+            self.refreshed_at = started
+
+        logger.info(f"📇 PHONE DIRECTORY BUILT: {len(entries)} numbers for {len(tenants)} tenants in {time.time() - started:.2f}s")
+        self._save_to_disk()
+        return len(entries)
+
+    async def refresh_incremental(self) -> int:
+        """Apply tenants and contacts changed since the last refresh"""
+        if self.refreshed_at is None:
+            return await self.build_full()
+
+        started = time.time()
+        # Overlap the window slightly so clock skew with the API never drops an update
+        since = datetime.fromtimestamp(self.refreshed_at) - timedelta(minutes=5)
+        since_filter = f"UpdateDate,gt,{since.strftime('%Y-%m-%dT%H:%M:%S')}"
+
+        changed_tenants = await self._fetch_tenants(since_filter)
+        if changed_tenants is None:
+            logger.warning("⚠️ Phone directory incremental refresh failed - index unchanged")
+            return 0
+
+        # Phone edits land on the contact record, so pick up their parent tenants too
+        known_ids = {str(t.get('TenantID')) for t in changed_tenants}
+        changed_contacts = await self.rent_manager._make_request(
+            "GET", f"/Contacts?filters={since_filter}&fields=ContactID,ParentID,ParentType"
+        )
+        parent_ids = [
+            str(c.get('ParentID')) for c in (changed_contacts or [])
+            if c.get('ParentType') == 'Tenant' and c.get('ParentID') and str(c.get('ParentID')) not in known_ids
+        ]
+        if parent_ids:
+            id_filter = f"TenantID,in,({','.join(sorted(set(parent_ids)))})"
+            extra = await self._fetch_tenants(id_filter)
+            changed_tenants.extend(extra or [])
+
+        for tenant in changed_tenants:
+            self._apply_tenant(tenant)
+
+        # Deleted tenants never show up as updates; drop any indexed tenant the API no longer lists
+        removed = 0
+        current_ids = await self._fetch_tenant_ids()
+        if current_ids:
+            with self._lock:
+                gone = [tenant_id for tenant_id in self.tenant_phones if tenant_id not in current_ids]
+            for tenant_id in gone:
+                self._remove_tenant(tenant_id)
+            removed = len(gone)
+
+        with self._lock:
+            self.refreshed_at = started
+
+        if changed_tenants or removed:
+            logger.info(f"🔄 PHONE DIRECTORY REFRESHED: {len(changed_tenants)} changed tenants applied, {removed} removed")
+            self._save_to_disk()
+        return len(changed_tenants) + removed
+
+    def _remove_tenant(self, tenant_id: str):
+        """Drop every index entry belonging to one tenant"""
+        with self._lock:
+            self._remove_tenant_locked(tenant_id)
+
+    def _remove_tenant_locked(self, tenant_id: str):
+        for key in self.tenant_phones.pop(tenant_id, set()):
+            if str(self.entries.get(key, {}).get('TenantID')) == tenant_id:
+                self.entries.pop(key, None)
+
+    def _apply_tenant(self, tenant: Dict[str, Any]):
+        """Replace all index entries belonging to one tenant"""
+        tenant_id = str(tenant.get('TenantID'))
+        records = list(self._records_for_tenant(tenant))
+        with self._lock:
+            self._remove_tenant_locked(tenant_id)
+            for key, record in records:
+                self.entries[key] = record
+                self.tenant_phones.setdefault(tenant_id, set()).add(key)
+
+    async def _fetch_tenants(self, filters: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Page through /Tenants with embedded contacts; None means the API failed"""
+        tenants: List[Dict[str, Any]] = []
+        page = 1
+        while True:
+            endpoint = f"/Tenants?embeds={TENANT_EMBEDS}&pageSize={PAGE_SIZE}&pageNumber={page}"
+            if filters:
+                endpoint += f"&filters={filters}"
+            batch = await self.rent_manager._make_request("GET", endpoint)
+            # A failed page fails the whole fetch - a partial list would drop tenants from the directory
+            if not isinstance(batch, list):
+                return None
+            tenants.extend(batch)
+            if len(batch) < PAGE_SIZE:
+                return tenants
+            page += 1
+
+    async def _fetch_tenant_ids(self) -> Optional[Set[str]]:
+        """Every current TenantID (IDs only, paged); None means the API failed"""
+        tenant_ids: Set[str] = set()
+        page = 1
+        while True:
+            batch = await self.rent_manager._make_request(
+                "GET", f"/Tenants?fields=TenantID&pageSize={PAGE_SIZE}&pageNumber={page}"
+            )
+            if not isinstance(batch, list):
+                return None
+            tenant_ids.update(str(t.get('TenantID')) for t in batch if t.get('TenantID'))
+            if len(batch) < PAGE_SIZE:
+                return tenant_ids
+            page += 1
+
+    def _records_for_tenant(self, tenant: Dict[str, Any]):
+        """Yield (phone_key, record) pairs in the lookup_tenant_by_phone result format"""
+        tenant_id = tenant.get('TenantID')
+        if not tenant_id:
+            return
+
+        property_data = tenant.get('Property') or {}
+        property_name = property_data.get('Name', '')
+        unit_name = ''
+        for lease in tenant.get('Leases') or []:
+            unit = lease.get('Unit') or {}
+            if unit.get('Name'):
+                unit_name = unit['Name']
+                break
+
+        if unit_name and property_name:
+            unit_info = f"Unit {unit_name} at {property_name}"
+        else:
+            unit_info = "Unit information unavailable"
+
+        for contact in tenant.get('Contacts') or []:
+            numbers = [p.get('PhoneNumber', '') for p in contact.get('PhoneNumbers') or []]
+            numbers += [contact.get(field, '') for field in PHONE_FIELDS]
+            for contact_phone in numbers:
+                key = normalize_phone(contact_phone)
+                if len(key) < 7:
+                    continue
+                yield key, {
+                    'TenantID': tenant_id,
+                    'FirstName': tenant.get('FirstName', ''),
+                    'LastName': tenant.get('LastName', ''),
+                    'Name': tenant.get('Name', ''),
+                    'Phone': contact_phone,
+                    'Unit': unit_info,
+                    'Status': tenant.get('Status', 'Current'),
+                    'PropertyID': tenant.get('PropertyID'),
+                    'Address': unit_info
+                }
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def load_from_disk(self) -> bool:
+        """Load a previously persisted index so a cold worker answers immediately"""
+        self.loaded = True
+        try:
+            if not os.path.exists(self.index_file):
+                return False
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+
+            entries = data.get('entries', {})
+            tenant_phones: Dict[str, Set[str]] = {}
+            for key, record in entries.items():
+                tenant_phones.setdefault(str(record.get('TenantID')), set()).add(key)
+
+            with self._lock:
+                self.entries = entries
+                self.tenant_phones = tenant_phones
+                self.built_at = data.get('built_at')
+                self.refreshed_at = data.get('refreshed_at')
+
+            logger.info(f"📇 PHONE DIRECTORY LOADED: {len(entries)} numbers from {self.index_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading phone directory: {e}")
+            return False
+
+    def _save_to_disk(self):
+        """Atomically persist the index (write temp file, then rename)"""
+        try:
+            with self._lock:
+                data = {
+                    'entries': dict(self.entries),
+                    'built_at': self.built_at,
+                    'refreshed_at': self.refreshed_at,
+                    'total_numbers': len(self.entries)
+                }
+            tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            logger.error(f"Error saving phone directory: {e}")
+
+    # ------------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------------
+
+    def start_background_refresh(self):
+        """Start the daemon thread that keeps the index within its staleness bound"""
+        if self.running:
+            return
+        self.running = True
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresh_thread.start()
+        logger.info(f"🔄 Phone directory background refresh started (every {self.refresh_interval_seconds}s)")
+
+    def stop_background_refresh(self):
+        self.running = False
+
+    def _refresh_loop(self):
+        while self.running:
+            time.sleep(self.refresh_interval_seconds)
+            if not self._refresh_lock.acquire(blocking=False):
+                continue
+            try:
+                asyncio.run(self.refresh_incremental())
+            except Exception as e:
+                logger.error(f"❌ Phone directory refresh error: {e}")
+            finally:
+                self._refresh_lock.release()
+
+    def get_status(self) -> Dict[str, Any]:
+        age = self.age_seconds()
+        return {
+            'total_numbers': len(self.entries),
+            'total_tenants': len(self.tenant_phones),
+            'age_seconds': round(age, 1) if age is not None else None,
+            'max_staleness_seconds': self.max_staleness_seconds,
+            'stale': self.is_stale(),
+            'background_refresh': self.running
+        }
@@ -0,0 +1,99 @@
+"""
+Unit tests for call-session TTL / LRU eviction and teardown hooks
+"""
+
+import threading
+
+from call_session_registry import CallSessionRegistry
+
+
+def make_registry(**kwargs):
+    kwargs.setdefault('sweep_seconds', 3600)  # expire() is driven by the tests
+    return CallSessionRegistry(**kwargs)
+
+
+def test_ttl_expiry_runs_teardown_before_removal():
+    registry = make_registry(ttl_seconds=60)
+    facts = registry.namespace('facts')
+    torn_down = []
+    registry.register_teardown(lambda call_sid: torn_down.append((call_sid, facts.get(call_sid))))
+
+    facts['CA-old'] = 'old'
+    facts['CA-new'] = 'new'
+    registry.sessions['CA-old'].last_seen -= 120
+
+    assert registry.expire() == 1
+    assert torn_down == [('CA-old', 'old')]
+    assert 'CA-old' not in facts and facts['CA-new'] == 'new'
+    assert registry.metrics['expired'] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    registry = make_registry(max_sessions=2)
+    facts = registry.namespace('facts')
+    torn_down = []
+    registry.register_teardown(torn_down.append)
+
+    facts['CA-1'] = 1
+    facts['CA-2'] = 2
+    facts['CA-1']  # CA-1 is now the most recently used
+    facts['CA-3'] = 3
+
+    assert torn_down == ['CA-2']
+    assert list(registry.sessions) == ['CA-1', 'CA-3']
+    assert registry.metrics['evicted_lru'] == 1
+
+
+def test_teardown_hooks_run_outside_the_lock():
+    registry = make_registry(max_sessions=1)
+    other_thread_done = []
+
+    def hook(call_sid):
+        reader = threading.Thread(target=lambda: other_thread_done.append(registry.get_metrics()['sessions']))
+        reader.start()
+        reader.join(timeout=2)
+
+    registry.register_teardown(hook)
+    registry.touch('CA-1')
+    registry.touch('CA-2')
+    assert len(other_thread_done) == 1
+
+
+def test_session_used_during_teardown_is_kept():
+    registry = make_registry(ttl_seconds=60)
+    facts = registry.namespace('facts')
+    facts['CA-1'] = 'before'
+    registry.sessions['CA-1'].last_seen -= 120
+
+    def caller_returns(call_sid):
+        # A webhook for the call lands on another thread while its hooks run
+        writer = threading.Thread(target=facts.__setitem__, args=(call_sid, 'after'))
+        writer.start()
+        writer.join()
+
+    registry.register_teardown(caller_returns)
+    assert registry.expire() == 0
+    assert facts['CA-1'] == 'after'
+
+
+def test_hook_reads_do_not_keep_the_session_alive():
+    registry = make_registry(ttl_seconds=60)
+    facts = registry.namespace('facts')
+    facts['CA-1'] = 'value'
+    registry.sessions['CA-1'].last_seen -= 120
+    registry.register_teardown(lambda call_sid: facts[call_sid])
+    assert registry.expire() == 1
+
+
+def test_end_call_tears_down_and_counts_errors():
+    registry = make_registry()
+    flags = registry.flag_set('email_sent')
+    calls = []
+    registry.register_teardown(lambda call_sid: 1 / 0)
+    registry.register_teardown(calls.append)
+
+    flags.add('CA-1')
+    assert registry.end_call('CA-1')
+    assert calls == ['CA-1'] and 'CA-1' not in flags
+    assert registry.metrics['teardown_errors'] == 1
+    assert not registry.end_call('CA-1')
@@ -0,0 +1,56 @@
+"""
+Unit tests for the completion registry's wake-on-publish waits
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+from completion_registry import CompletionRegistry
+
+
+def test_wait_wakes_as_soon_as_result_is_published():
+    registry = CompletionRegistry('test')
+    registry.expect('CA-1')
+    threading.Timer(0.05, registry.publish, args=('CA-1', 'reply')).start()
+
+    started = time.time()
+    assert registry.wait('CA-1', timeout=5) == 'reply'
+    assert time.time() - started < 1
+    assert not registry.is_ready('CA-1') and registry.get_pending('CA-1') is None
+
+
+def test_wait_times_out_with_default():
+    registry = CompletionRegistry('test')
+    registry.expect('CA-1')
+    assert registry.wait('CA-1', timeout=0.05, default='fallback') == 'fallback'
+    assert registry.get_metrics()['timeouts'] == 1
+
+
+def test_track_publishes_finalized_future_result():
+    registry = CompletionRegistry('test', max_workers=2)
+    future = Future()
+    registry.track('CA-1', future, lambda done: done.result().upper())
+    assert registry.get_metrics()['in_flight'] == 1
+
+    threading.Timer(0.05, future.set_result, args=('reply',)).start()
+    assert registry.wait('CA-1', timeout=5) == 'REPLY'
+    assert registry.get_metrics()['in_flight'] == 0
+
+
+def test_superseded_slot_drops_late_result():
+    registry = CompletionRegistry('test')
+    stale = Future()
+    registry.track('CA-1', stale, lambda done: done.result())
+    registry.expect('CA-1')  # a newer turn replaces the slot
+    stale.set_result('stale')
+    assert not registry.is_ready('CA-1')
+
+
+def test_publish_wakes_only_its_own_key():
+    registry = CompletionRegistry('test')
+    registry.expect('CA-1')
+    registry.expect('CA-2')
+    threading.Timer(0.05, registry.publish, args=('CA-1', 'reply')).start()
+    assert registry.wait('CA-2', timeout=0.3, default='fallback') == 'fallback'
+    assert registry.wait('CA-1', timeout=5) == 'reply'
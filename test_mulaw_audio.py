@@ -0,0 +1,77 @@
+"""
+Unit tests for the μ-law lookup-table codec and the inbound frame ring
+"""
+
+import numpy as np
+import pytest
+
+from mulaw_audio import decode, encode, MulawFrameRing, OutboundFramer, MULAW_SILENCE
+
+audioop = pytest.importorskip("audioop")
+
+ALL_CODES = bytes(range(256))
+
+
+def test_decode_matches_audioop():
+    expected = np.frombuffer(audioop.ulaw2lin(ALL_CODES, 2), dtype=np.int16)
+    assert np.array_equal(decode(ALL_CODES), expected)
+
+
+def test_encode_matches_audioop():
+    pcm = np.arange(-32768, 32768, 7, dtype=np.int16)
+    codes = np.frombuffer(encode(pcm), dtype=np.uint8).astype(np.int32)
+    expected = np.frombuffer(audioop.lin2ulaw(pcm.tobytes(), 2), dtype=np.uint8).astype(np.int32)
+    # audioop truncates to 14 bits before negating, so negative samples on a step boundary may land one code over
+    assert np.array_equal(codes[pcm >= 0], expected[pcm >= 0])
+    assert np.abs(codes - expected).max() <= 1
+
+
+def test_round_trip():
+    # 0x7F is μ-law's negative zero; it decodes to 0, which encodes as 0xFF
+    codes = bytes(code for code in range(256) if code != 0x7F)
+    assert encode(decode(codes)) == codes
+    assert encode(decode(b'\x7f')) == bytes([MULAW_SILENCE])
+
+
+def test_ring_wraps_without_splitting_frames():
+    ring = MulawFrameRing(frame_bytes=4, capacity_frames=4)
+    ring.write(b'aaaabbbbcccc')
+    assert [bytes(frame) for frame in ring.frames()] == [b'aaaa', b'bbbb', b'cccc']
+
+    # Write position wraps: dddd fills the last slot, eeee and ffff start over at the front
+    ring.write(b'ddddeeeeff')
+    ring.write(b'ff')
+    assert [bytes(frame) for frame in ring.frames()] == [b'dddd', b'eeee', b'ffff']
+    assert len(ring) == 0
+    assert ring.dropped_frames == 0
+
+
+def test_ring_partial_frame_waits_for_the_rest():
+    ring = MulawFrameRing(frame_bytes=4, capacity_frames=4)
+    ring.write(b'aa')
+    assert list(ring.frames()) == []
+    ring.write(b'aa')
+    assert [bytes(frame) for frame in ring.frames()] == [b'aaaa']
+
+
+def test_ring_overflow_drops_oldest_frames():
+    ring = MulawFrameRing(frame_bytes=4, capacity_frames=4)
+    ring.write(b'aaaabbbbccccdddd')
+    ring.write(b'eeeeffff')
+    assert ring.dropped_frames == 2
+    assert [bytes(frame) for frame in ring.frames()] == [b'cccc', b'dddd', b'eeee', b'ffff']
+
+
+def test_ring_payload_larger_than_capacity_keeps_newest():
+    ring = MulawFrameRing(frame_bytes=4, capacity_frames=2)
+    ring.write(b'aaaabbbbcccc')
+    assert [bytes(frame) for frame in ring.frames()] == [b'bbbb', b'cccc']
+
+
+def test_framer_flush_pads_last_frame_with_silence():
+    framer = OutboundFramer('MZ1', frame_bytes=4)
+    assert len(framer.frame(b'123456')) == 1
+    messages = framer.flush()
+    assert len(messages) == 1
+    assert framer.flush() == []
+    assert framer.frames_sent == 2
@@ -0,0 +1,57 @@
+"""
+Unit tests for VAD onset and hangover timing (counted in 20 ms frames of audio)
+"""
+
+import numpy as np
+
+from mulaw_audio import encode, FRAME_BYTES, FRAME_MS, MULAW_SILENCE
+from voice_activity_detection import (VoiceActivityDetector, VAD_ONSET_MS, VAD_HANGOVER_MS,
+                                      VAD_MIN_SPEECH_MS)
+
+SILENCE = bytes([MULAW_SILENCE]) * FRAME_BYTES
+# A 200 Hz tone: loud and voiced (low zero-crossing rate)
+SPEECH = encode((np.sin(2 * np.pi * 200 * np.arange(FRAME_BYTES) / 8000) * 8000).astype(np.int16))
+
+
+def feed(vad, call_sid, frame, count):
+    return [vad.process(call_sid, frame) for _ in range(count)]
+
+
+def test_onset_after_onset_ms_of_speech():
+    vad = VoiceActivityDetector()
+    feed(vad, 'CA-onset', SILENCE, 10)
+    results = feed(vad, 'CA-onset', SPEECH, VAD_ONSET_MS // FRAME_MS)
+    assert [r.speech_started for r in results] == [False] * (len(results) - 1) + [True]
+    assert results[-1].is_speaking
+
+
+def test_short_speech_gap_does_not_end_the_turn():
+    vad = VoiceActivityDetector()
+    feed(vad, 'CA-gap', SPEECH, 20)
+    results = feed(vad, 'CA-gap', SILENCE, VAD_HANGOVER_MS // FRAME_MS - 1)
+    assert all(r.is_speaking and not r.speech_ended for r in results)
+    assert not any(r.speech_started for r in feed(vad, 'CA-gap', SPEECH, 5))
+
+
+def test_turn_ends_after_hangover():
+    vad = VoiceActivityDetector()
+    feed(vad, 'CA-end', SPEECH, VAD_MIN_SPEECH_MS // FRAME_MS + 5)
+    results = feed(vad, 'CA-end', SILENCE, VAD_HANGOVER_MS // FRAME_MS)
+    assert [r.speech_ended for r in results] == [False] * (len(results) - 1) + [True]
+    assert not results[-1].is_speaking
+    assert vad.metrics['turns'] == 1
+
+
+def test_burst_shorter_than_min_speech_is_discarded():
+    vad = VoiceActivityDetector()
+    started = feed(vad, 'CA-burst', SPEECH, VAD_ONSET_MS // FRAME_MS)
+    assert started[-1].speech_started
+    results = feed(vad, 'CA-burst', SILENCE, VAD_HANGOVER_MS // FRAME_MS)
+    assert not any(r.speech_ended for r in results)
+    assert not results[-1].is_speaking
+    assert vad.metrics['discarded_bursts'] == 1
+
+
+def test_silence_never_starts_speech():
+    vad = VoiceActivityDetector()
+    assert not any(r.speech_started or r.is_speaking for r in feed(vad, 'CA-quiet', SILENCE, 50))
@@ -0,0 +1,202 @@
+"""
+Append-Only Transcript Journal
+Per-turn conversation persistence for live calls
+Each turn is one JSON line appended under a file lock, so the cost per utterance is
+independent of history size and concurrent gunicorn workers never clobber each other
+"""
+
+import os
+import json
+import fcntl
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+COMPACT_THRESHOLD_BYTES = int(os.environ.get('TRANSCRIPT_JOURNAL_COMPACT_BYTES', str(4 * 1024 * 1024)))
+
+
+class TranscriptJournal:
+    """
+    Conversation store = compacted snapshot + append-only JSONL journal.
+    - snapshot_file keeps the legacy conversation_history.json layout
+    - journal_file gets one {"call_sid", "turn"} line per turn
+    - offsets index (call_sid -> byte offsets) lets read_call() fetch one call from disk
+    - compaction folds the journal into the snapshot on a background thread
+    """
+
+    def __init__(self, journal_file: str = "conversation_journal.jsonl",
+                 snapshot_file: str = "conversation_history.json",
+                 compact_threshold_bytes: int = COMPACT_THRESHOLD_BYTES):
+        self.journal_file = journal_file
+        self.snapshot_file = snapshot_file
+        self.lock_file = f"{journal_file}.lock"
+        self.compact_threshold_bytes = compact_threshold_bytes
+
+        self.persisted_counts: Dict[str, int] = {}
+        self.offsets: Dict[str, List[int]] = {}
+        self._journal_inode = None
+        self._lock = threading.Lock()
+        self._compacting = False
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive cross-process lock guarding journal appends and compaction"""
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load_all(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Snapshot plus every journaled turn, grouped by call_sid"""
+        conversations: Dict[str, List[Dict[str, Any]]] = {}
+        with self._file_lock():
+            if os.path.exists(self.snapshot_file):
+                with open(self.snapshot_file, 'r') as f:
+                    conversations = json.load(f).get("conversations", {})
+
+            offsets: Dict[str, List[int]] = {}
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file, 'rb') as f:
+                    self._journal_inode = os.fstat(f.fileno()).st_ino
+                    offset = 0
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            conversations.setdefault(record['call_sid'], []).append(record['turn'])
+                            offsets.setdefault(record['call_sid'], []).append(offset)
+                        except (ValueError, KeyError, TypeError):
+                            logger.warning(f"Skipping corrupt transcript journal line at byte {offset}")
+                        offset += len(line)
+
+        with self._lock:
+            self.offsets = offsets
+            self.persisted_counts = {call_sid: len(turns) for call_sid, turns in conversations.items()}
+        logger.info(f"📒 TRANSCRIPTS LOADED: {len(conversations)} calls from snapshot + journal")
+        return conversations
+
+    def read_call(self, call_sid: str) -> List[Dict[str, Any]]:
+        """Journaled turns for one call via the offset index (snapshot turns not included)"""
+        turns = []
+        with self._file_lock():
+            if not os.path.exists(self.journal_file):
+                return turns
+            with open(self.journal_file, 'rb') as f:
+                if os.fstat(f.fileno()).st_ino != self._journal_inode:
+                    # Another worker compacted the journal - offsets no longer apply
+                    return turns
+                for offset in list(self.offsets.get(call_sid, [])):
+                    f.seek(offset)
+                    turns.append(json.loads(f.readline())['turn'])
+        return turns
+
+    # ------------------------------------------------------------------
+    # Appending
+    # ------------------------------------------------------------------
+
+    def sync_call(self, call_sid: str, turns: List[Dict[str, Any]]) -> int:
+        """Append turns not yet persisted for this call; returns how many were written"""
+        with self._lock:
+            persisted = self.persisted_counts.get(call_sid, 0)
+            new_turns = turns[persisted:]
+            if not new_turns:
+                return 0
+            self.persisted_counts[call_sid] = len(turns)
+
+        lines = [json.dumps({'call_sid': call_sid, 'turn': turn}, separators=(',', ':'), default=str) + "\n"
+                 for turn in new_turns]
+
+        with self._file_lock():
+            with open(self.journal_file, 'ab') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                offset = f.seek(0, os.SEEK_END)
+                with self._lock:
+                    if inode != self._journal_inode:
+                        self._journal_inode = inode
+                        self.offsets = {}
+                    for line in lines:
+                        self.offsets.setdefault(call_sid, []).append(offset)
+                        offset += len(line.encode('utf-8'))
+                f.write(''.join(lines).encode('utf-8'))
+                size = offset
+
+        if size >= self.compact_threshold_bytes:
+            self.compact_in_background()
+        return len(new_turns)
+
+    def discard_call(self, call_sid: str):
+        """Forget a call that has left memory; its turns stay in the journal and later turns append after them"""
+        with self._lock:
+            self.persisted_counts.pop(call_sid, None)
+            self.offsets.pop(call_sid, None)
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact_in_background(self):
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_worker, daemon=True).start()
+
+    def _compact_worker(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Error compacting transcript journal: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def compact(self) -> int:
+        """Fold the journal into the snapshot, then start a fresh journal"""
+        with self._file_lock():
+            conversations: Dict[str, List[Dict[str, Any]]] = {}
+            if os.path.exists(self.snapshot_file):
+                with open(self.snapshot_file, 'r') as f:
+                    conversations = json.load(f).get("conversations", {})
+
+            merged = 0
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file, 'rb') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            conversations.setdefault(record['call_sid'], []).append(record['turn'])
+                        except (ValueError, KeyError, TypeError):
+                            continue  # torn or malformed line - skip it, keep compacting
+                        merged += 1
+
+            data = {
+                "conversations": conversations,
+                "last_updated": datetime.now(pytz.timezone('America/New_York')).isoformat(),
+                "total_calls": len(conversations)
+            }
+            tmp_file = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.snapshot_file)
+
+            # New inode tells other workers their offset index is stale
+            tmp_journal = f"{self.journal_file}.{os.getpid()}.tmp"
+            open(tmp_journal, 'wb').close()
+            os.replace(tmp_journal, self.journal_file)
+
+        with self._lock:
+            self.offsets = {}
+            self._journal_inode = None
+        logger.info(f"🗜️ TRANSCRIPT JOURNAL COMPACTED: {merged} turns folded into {self.snapshot_file} ({len(conversations)} calls)")
+        return merged
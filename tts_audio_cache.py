@@ -0,0 +1,204 @@
+"""
+Persistent TTS Audio Cache
+Content-addressed on-disk store for synthesized speech, shared by every gunicorn worker
+Survives restarts so greetings and fixed phrases are synthesized once, not per process
+"""
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', 'tts_cache')
+TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+TTS_CACHE_MAX_AGE_SECONDS = int(os.environ.get('TTS_CACHE_MAX_AGE_SECONDS', str(30 * 24 * 3600)))
+
+
+def make_cache_key(text: str, voice_id: str, model_id: str, voice_settings: Dict[str, Any], output_format: str) -> str:
+    """Content address: every parameter that changes the audio bytes is part of the key"""
+    payload = json.dumps({
+        'text': text,
+        'voice_id': voice_id,
+        'model_id': model_id,
+        'voice_settings': voice_settings,
+        'output_format': output_format
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTSAudioCache:
+    """
+    On-disk audio store keyed by content hash.
+    - Files live at <root>/<key[:2]>/<key>.mp3 and are written atomically (temp + rename)
+    - flock-based key locks let one worker synthesize while the others wait for the hit
+    - Size and age based eviction, least recently used first (hits refresh mtime)
+    - Hit/miss/write/eviction counters for this process: get() counts hits only, a miss is counted
+      once by whoever resolves it (get_or_create() synthesizing, or record_miss() for streamed clips)
+    """
+
+    def __init__(self, root: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES,
+                 max_age_seconds: int = TTS_CACHE_MAX_AGE_SECONDS, extension: str = "mp3"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.extension = extension
+        self.lock_dir = os.path.join(root, ".locks")
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+        self.metrics = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0, 'evicted_bytes': 0, 'lock_waits': 0}
+        self._metrics_lock = threading.Lock()
+        self._writes_since_evict = 0
+        # Sweep the directory every N writes rather than on every put
+        self.evict_every = 25
+
+    def _count(self, name: str, amount: int = 1):
+        with self._metrics_lock:
+            self.metrics[name] += amount
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{self.extension}")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached file path (refreshing its LRU timestamp) or None"""
+        path = self.path_for(key)
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            pass
+        self._count('hits')
+        return path
+
+    def record_miss(self):
+        """A lookup that missed and is being synthesized outside get_or_create() (e.g. streamed)"""
+        self._count('misses')
+
+    def put(self, key: str, audio: bytes) -> str:
+        """Atomically store audio bytes under key and return the file path"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        self._count('writes')
+
+        self._writes_since_evict += 1
+        if self._writes_since_evict >= self.evict_every:
+            self._writes_since_evict = 0
+            self.evict()
+        return path
+
+    @contextmanager
+    def key_lock(self, key: str) -> Iterator[None]:
+        """Cross-process exclusive lock for one key (synthesis single-flight across workers)"""
+        # Striped by key prefix so the number of lock files stays bounded
+        lock_path = os.path.join(self.lock_dir, f"{key[:2]}.lock")
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._count('lock_waits')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_or_create(self, key: str, synthesize) -> Optional[str]:
+        """
+        Return a cached path, or run synthesize() -> bytes exactly once across all workers.
+        Waiters re-check the store after the lock so they pick up the winner's file.
+        """
+        path = self.get(key)
+        if path:
+            return path
+
+        with self.key_lock(key):
+            if os.path.exists(self.path_for(key)):
+                self._count('hits')  # another worker synthesized it while we waited
+                return self.path_for(key)
+            self._count('misses')
+            audio = synthesize()
+            if not audio:
+                return None
+            return self.put(key, audio)
+
+    def evict(self) -> int:
+        """Drop expired files, then least recently used files until under max_bytes"""
+        with self._evict_lock():
+            now = time.time()
+            entries = []
+            total = 0
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                if os.path.abspath(dirpath) == os.path.abspath(self.lock_dir):
+                    dirnames[:] = []
+                    continue
+                for filename in filenames:
+                    if not filename.endswith(f".{self.extension}"):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            entries.sort()
+            removed = 0
+            for mtime, size, path in entries:
+                expired = now - mtime > self.max_age_seconds
+                if not expired and total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+                self._count('evictions')
+                self._count('evicted_bytes', size)
+
+            if removed:
+                logger.info(f"🧹 TTS CACHE EVICTED: {removed} files, {total / (1024 * 1024):.1f} MB remaining")
+            return removed
+
+    @contextmanager
+    def _evict_lock(self) -> Iterator[None]:
+        with open(os.path.join(self.lock_dir, "evict.lock"), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 3) if lookups else 0.0
+        metrics['root'] = self.root
+        return metrics
+
+
+_tts_cache: Optional[TTSAudioCache] = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSAudioCache:
+    """Process-wide cache instance (the directory itself is shared across workers)"""
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                _tts_cache = TTSAudioCache()
+    return _tts_cache
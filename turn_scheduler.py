@@ -0,0 +1,177 @@
+"""
+Turn Scheduler - Barge-in / Interruption Handling
+Each assistant reply runs as one cancellable turn per call
+When the caller starts talking over it, the turn's LLM stream is cancelled, buffered TTS audio is
+flushed, Twilio is told to clear what it already queued, and the wasted tokens / audio are counted
+"""
+
+import time
+import asyncio
+import logging
+import inspect
+import threading
+from typing import Dict, List, Any, Optional, Callable
+
+from call_session_registry import get_call_sessions
+
+logger = logging.getLogger(__name__)
+
+
+class Turn:
+    """One assistant reply: its task plus what it has generated and played so far"""
+    __slots__ = ('call_sid', 'turn_id', 'task', 'started', 'cancelled', 'finished',
+                 'tokens', 'audio_ms_sent', 'first_audio_at')
+
+    def __init__(self, call_sid: str, turn_id: int):
+        self.call_sid = call_sid
+        self.turn_id = turn_id
+        self.task: Optional[asyncio.Task] = None
+        self.started = time.time()
+        self.cancelled = False
+        self.finished = False
+        self.tokens = 0
+        self.audio_ms_sent = 0
+        self.first_audio_at: Optional[float] = None
+
+    def add_tokens(self, count: int = 1):
+        self.tokens += count
+
+    def add_audio(self, audio_ms: int):
+        if self.first_audio_at is None:
+            self.first_audio_at = time.time()
+        self.audio_ms_sent += audio_ms
+
+    def unplayed_ms(self) -> int:
+        """Audio already handed to Twilio that the caller has not heard yet"""
+        if self.first_audio_at is None:
+            return 0
+        return max(0, int(self.audio_ms_sent - (time.time() - self.first_audio_at) * 1000))
+
+    @property
+    def active(self) -> bool:
+        """Still generating, or still playing what was sent"""
+        return not self.cancelled and (not self.finished or self.unplayed_ms() > 0)
+
+
+class TurnScheduler:
+    """
+    Cancellation-aware turn scheduling, one current turn per call.
+    - start_turn() supersedes (cancels) the call's previous turn; run() executes a coroutine as the turn
+    - barge_in() cancels an active turn and runs the registered cancel hooks;
+      hooks return the milliseconds of audio they discarded (flushed buffers, cleared playback)
+    - barge_in_threadsafe() is the entry point for code outside the media stream's loop
+    - Metrics: barge-ins, cancelled turns, wasted tokens and wasted audio
+    """
+
+    def __init__(self):
+        call_sessions = get_call_sessions()
+        self.turns = call_sessions.namespace('turns.current')
+        call_sessions.register_teardown(self.drop)
+        self._cancel_hooks: List[Callable[[Turn], Any]] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.metrics = {'turns': 0, 'completed': 0, 'barge_ins': 0, 'superseded': 0,
+                        'ignored_barge_ins': 0, 'wasted_tokens': 0, 'wasted_audio_ms': 0}
+
+    def register_cancel_hook(self, hook: Callable[[Turn], Any]):
+        """hook(turn) -> discarded audio ms (may be a coroutine); runs on every cancelled turn"""
+        self._cancel_hooks.append(hook)
+
+    def current(self, call_sid: str) -> Optional[Turn]:
+        return self.turns.get(call_sid)
+
+    def is_active(self, call_sid: str) -> bool:
+        turn = self.turns.get(call_sid)
+        return bool(turn and turn.active)
+
+    async def start_turn(self, call_sid: str) -> Turn:
+        previous = self.turns.get(call_sid)
+        if previous and previous.active:
+            await self._cancel(previous, 'superseded')
+        with self._lock:
+            self._next_id += 1
+            turn = Turn(call_sid, self._next_id)
+            self.metrics['turns'] += 1
+        self.turns[call_sid] = turn
+        return turn
+
+    async def run(self, call_sid: str, make_coro: Callable[[Turn], Any]) -> Turn:
+        """Start a turn and run make_coro(turn) as its task (returns without waiting for it)"""
+        turn = await self.start_turn(call_sid)
+        turn.task = asyncio.create_task(make_coro(turn))
+        turn.task.add_done_callback(lambda _: self._finished(turn))
+        return turn
+
+    def _finished(self, turn: Turn):
+        turn.finished = True
+        if not turn.cancelled:
+            with self._lock:
+                self.metrics['completed'] += 1
+
+    def drop(self, call_sid: str):
+        """Stream or call ended: stop the call's turn without counting it as wasted"""
+        turn = self.turns.pop(call_sid, None)
+        if turn and turn.task and not turn.task.done():
+            turn.cancelled = True
+            # Teardown may run on the registry's sweeper thread - cancel on the turn's own loop
+            turn.task.get_loop().call_soon_threadsafe(turn.task.cancel)
+
+    async def barge_in(self, call_sid: str, reason: str = 'caller speech') -> bool:
+        """Caller started talking: cancel the active turn (if any). True if something was cancelled."""
+        turn = self.turns.get(call_sid)
+        if not turn or not turn.active:
+            with self._lock:
+                self.metrics['ignored_barge_ins'] += 1
+            return False
+        await self._cancel(turn, 'barge_ins')
+        logger.info(f"✋ BARGE-IN on {call_sid} ({reason}): turn {turn.turn_id} cancelled")
+        return True
+
+    async def barge_in_threadsafe(self, call_sid: str, reason: str = 'caller speech') -> bool:
+        """barge_in() from any loop or thread (e.g. an HTTP route): runs it on the loop that owns the turn"""
+        turn = self.turns.get(call_sid)
+        loop = turn.task.get_loop() if turn and turn.task else None
+        if loop is None or loop.is_closed() or loop is asyncio.get_running_loop():
+            return await self.barge_in(call_sid, reason)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.barge_in(call_sid, reason), loop))
+
+    async def _cancel(self, turn: Turn, counter: str):
+        turn.cancelled = True
+        if turn.task and not turn.task.done() and turn.task is not asyncio.current_task():
+            turn.task.cancel()
+
+        wasted_audio_ms = turn.unplayed_ms()
+        for hook in list(self._cancel_hooks):
+            try:
+                discarded = hook(turn)
+                if inspect.isawaitable(discarded):
+                    discarded = await discarded
+                wasted_audio_ms += int(discarded or 0)
+            except Exception as e:
+                logger.error(f"Turn cancel hook error for {turn.call_sid}: {e}")
+
+        with self._lock:
+            self.metrics[counter] += 1
+            self.metrics['wasted_tokens'] += turn.tokens
+            self.metrics['wasted_audio_ms'] += wasted_audio_ms
+        logger.info(f"🗑️ Turn {turn.turn_id} for {turn.call_sid} dropped: "
+                    f"{turn.tokens} tokens, {wasted_audio_ms}ms audio unheard")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self.metrics)
+        metrics['active_turns'] = sum(1 for turn in self.turns.values() if turn.active)
+        return metrics
+
+
+_turn_scheduler: Optional[TurnScheduler] = None
+_turn_scheduler_lock = threading.Lock()
+
+
+def get_turn_scheduler() -> TurnScheduler:
+    global _turn_scheduler
+    if _turn_scheduler is None:
+        with _turn_scheduler_lock:
+            if _turn_scheduler is None:
+                _turn_scheduler = TurnScheduler()
+    return _turn_scheduler
@@ -19,22 +19,36 @@ import gevent
 from geventwebsocket.handler import WebSocketHandler
 from openai_conversation_manager import conversation_manager
 from elevenlabs_streaming import streaming_tts_client
+from call_session_registry import get_call_sessions
+from streaming_stt import get_stt_engine
+from mulaw_audio import MulawFrameRing, OutboundFramer, FRAME_MS
+from turn_scheduler import get_turn_scheduler
 
 logger = logging.getLogger(__name__)
 
+# Longest a finished reply waits for ElevenLabs to send the end of its generation
+TTS_FINAL_TIMEOUT_SECONDS = float(os.environ.get('TTS_FINAL_TIMEOUT_SECONDS', '15'))
+
 class TwilioMediaStreamHandler:
     def __init__(self):
         self.active_streams = {}
-        self.session_facts = {}
-        self.conversation_histories = {}
-        self.timing_data = {}
+        # Per-call state is bounded and expired by the shared call-session registry
+        sessions = get_call_sessions()
+        self.session_facts = sessions.namespace('media_stream.session_facts')
+        self.conversation_histories = sessions.namespace('media_stream.conversation_histories')
+        self.conversation_memory = sessions.namespace('media_stream.conversation_memory')
+        self.timing_data = sessions.namespace('media_stream.timing_data')
         
         # Runtime mode selection
         self.streaming_mode = "full"  # "full" or "sentence-chunk"
         
         # Grok usage guard
         self.grok_guard_active = True
-        self.call_sessions = {}  # Track call metadata
+        self.call_sessions = sessions.namespace('media_stream.call_sessions')  # Track call metadata
+        
+        # Replies run as cancellable turns; a barge-in drops their TTS audio and Twilio's queued playback
+        self.turn_scheduler = get_turn_scheduler()
+        self.turn_scheduler.register_cancel_hook(self.discard_playback)
     
     def initialize_call_session(self, call_sid: str, caller_number: str):
         """Initialize a new call session with metadata"""
@@ -71,16 +85,9 @@ class TwilioMediaStreamHandler:
     
     def cleanup_call_session(self, call_sid: str):
         """Clean up call session data"""
-        if call_sid in self.call_sessions:
-            del self.call_sessions[call_sid]
-        if call_sid in self.session_facts:
-            del self.session_facts[call_sid]
-        if call_sid in self.conversation_memory:
-            del self.conversation_memory[call_sid]
         if call_sid in self.active_streams:
             del self.active_streams[call_sid]
-        if call_sid in self.timing_data:
-            del self.timing_data[call_sid]
+        get_call_sessions().end_call(call_sid)
         
         logger.info(f"🧹 Call session cleaned up: {call_sid}")
     
@@ -140,18 +147,25 @@ class TwilioMediaStreamHandler:
                     
                     if event_type == 'connected':
                         logger.info("🔗 Twilio Media Stream connected")
+                        # Warm the TTS socket pool while Twilio sends 'start'
+                        asyncio.create_task(streaming_tts_client.prewarm())
                         
                     elif event_type == 'start':
                         call_sid = data['start']['callSid']
+                        stream_sid = data['start'].get('streamSid') or data.get('streamSid') or call_sid
                         logger.info(f"▶️ Media stream started for call: {call_sid}")
                         
-                        # Initialize session
+                        # Initialize session (inbound ring and outbound framer are allocated once per call)
                         self.active_streams[call_sid] = {
                             'websocket': websocket,
+                            'stream_sid': stream_sid,
+                            'inbound': MulawFrameRing(),
+                            'outbound': OutboundFramer(stream_sid),
                             'start_time': time.time(),
-                            'audio_buffer': b'',
+                            'partial_text': '',
                             'last_activity': time.time()
                         }
+                        get_stt_engine().open_session(call_sid)
                         self.session_facts[call_sid] = {}
                         self.conversation_histories[call_sid] = []
                         
@@ -208,34 +222,51 @@ class TwilioMediaStreamHandler:
         chunk_start = time.time()
         
         try:
-            # Decode Twilio audio (mulaw, base64)
-            audio_payload = base64.b64decode(media_data['payload'])
-            
-            # Add to buffer
             stream_info = self.active_streams[call_sid]
-            stream_info['audio_buffer'] += audio_payload
             stream_info['last_activity'] = time.time()
             
-            # Check if we have enough audio for processing (e.g., 160ms chunks)
-            if len(stream_info['audio_buffer']) >= 1280:  # 160ms at 8kHz
-                audio_chunk = stream_info['audio_buffer'][:1280]
-                stream_info['audio_buffer'] = stream_info['audio_buffer'][1280:]
+            # Decode Twilio audio (mulaw, base64) into the call's ring, then read whole 20 ms frames
+            inbound = stream_info['inbound']
+            inbound.write(base64.b64decode(media_data['payload']))
+            
+            # Streaming STT: frames go straight to the call's recognizer, results arrive at endpoints
+            stt_session = get_stt_engine().get_session(call_sid)
+            for frame in inbound.frames():
+                stt_result = await stt_session.feed(frame)
                 
-                if stream_info['pipeline'] == 'full_streaming':
-                    await self.process_full_streaming(call_sid, audio_chunk, chunk_start)
-                else:
-                    await self.process_sentence_chunk(call_sid, audio_chunk, chunk_start)
+                # Caller started talking over Chris: cancel the reply in flight
+                if stt_session.speech_started and self.turn_scheduler.is_active(call_sid):
+                    await self.turn_scheduler.barge_in(call_sid)
+                
+                utterance = stt_session.pop_utterance()
+                if utterance is not None:
+                    stream_info['partial_text'] = ''
+                    # Final recognition and the reply run as a background turn, so inbound frames
+                    # (and barge-in) keep flowing while Whisper transcribes
+                    await self.turn_scheduler.run(
+                        call_sid, lambda turn, audio=utterance: self.process_utterance(call_sid, stt_session, audio, chunk_start, turn))
+                elif stt_result is not None and stt_result.hypotheses:
+                    stream_info['partial_text'] = stt_result.hypotheses[0]['text']
                     
         except Exception as e:
             logger.error(f"Audio chunk processing error: {e}")
     
-    async def process_full_streaming(self, call_sid, audio_chunk, start_time):
+    async def process_utterance(self, call_sid, stt_session, audio, start_time, turn):
+        """Final STT for an ended utterance, then the reply in the call's pipeline mode"""
+        stt_result = await stt_session.recognize_final(audio)
+        stream_info = self.active_streams.get(call_sid)
+        if stt_result is None or stream_info is None:
+            return
+        if stream_info['pipeline'] == 'full_streaming':
+            await self.process_full_streaming(call_sid, stt_result, start_time, turn)
+        else:
+            await self.process_sentence_chunk(call_sid, stt_result, start_time, turn)
+    
+    async def process_full_streaming(self, call_sid, stt_result, start_time, turn=None):
         """Full streaming: immediate token-by-token forwarding"""
         try:
-            # STT with N-best hypotheses for accuracy
-            stt_start = time.time()
-            transcription_results = await self.perform_stt_with_nbest(audio_chunk)
-            stt_time = time.time() - stt_start
+            # Final STT result with N-best hypotheses for accuracy
+            transcription_results = stt_result.hypotheses
             
             if not transcription_results:
                 return
@@ -247,7 +278,7 @@ class TwilioMediaStreamHandler:
                 return
                 
             # Log STT timing
-            self.log_timing(call_sid, "stt_ms", stt_time * 1000)
+            self.log_timing(call_sid, "stt_ms", stt_result.latency_ms)
             
             # Guard against Grok usage
             self.detect_grok_usage(selected_text)
@@ -258,9 +289,10 @@ class TwilioMediaStreamHandler:
             # Inject session facts into context
             enhanced_context = self.build_context_with_facts(call_sid, selected_text)
             
-            # Stream OpenAI tokens directly to ElevenLabs
+            # Stream OpenAI tokens directly to ElevenLabs (reopened if a barge-in closed it)
+            await streaming_tts_client.ensure_session(call_sid)
             first_token_time = None
-            async for token in conversation_manager.stream_response(call_sid, enhanced_context):
+            async for token in conversation_manager.stream_response(call_sid, enhanced_context, turn):
                 if first_token_time is None:
                     first_token_time = time.time()
                     self.log_timing(call_sid, "first_token_ms", (first_token_time - openai_start) * 1000)
@@ -268,12 +300,12 @@ class TwilioMediaStreamHandler:
                 # Forward token immediately to ElevenLabs streaming
                 await streaming_tts_client.send_token(call_sid, token)
             
-            # Start audio playback as soon as we have enough buffered
-            audio_start = time.time()
-            await self.start_audio_playback(call_sid)
-            first_audio_time = time.time() - start_time
+            # End of text: play the audio as it arrives until the generation is final
+            await streaming_tts_client.finish_generation(call_sid)
+            await self.start_audio_playback(call_sid, turn, final=True)
+            first_audio_at = turn.first_audio_at if turn is not None else None
             
-            self.log_timing(call_sid, "first_audio_ms", first_audio_time * 1000)
+            self.log_timing(call_sid, "first_audio_ms", ((first_audio_at or time.time()) - start_time) * 1000)
             
             # Update session facts
             self.update_session_facts(call_sid, selected_text)
@@ -283,13 +315,10 @@ class TwilioMediaStreamHandler:
                 raise
             logger.error(f"Full streaming processing error: {e}")
     
-    async def process_sentence_chunk(self, call_sid, audio_chunk, start_time):
+    async def process_sentence_chunk(self, call_sid, stt_result, start_time, turn=None):
         """Sentence-chunk mode: buffer sentences, stream each immediately"""
         try:
-            # STT processing
-            stt_start = time.time()
-            transcription_results = await self.perform_stt_with_nbest(audio_chunk)
-            stt_time = time.time() - stt_start
+            transcription_results = stt_result.hypotheses
             
             if not transcription_results:
                 return
@@ -298,7 +327,7 @@ class TwilioMediaStreamHandler:
             if not selected_text.strip():
                 return
                 
-            self.log_timing(call_sid, "stt_ms", stt_time * 1000)
+            self.log_timing(call_sid, "stt_ms", stt_result.latency_ms)
             
             # Guard against Grok usage
             self.detect_grok_usage(selected_text)
@@ -307,20 +336,20 @@ class TwilioMediaStreamHandler:
             stream_info = self.active_streams[call_sid]
             stream_info['sentence_buffer'] += selected_text + " "
             
-            # Check for sentence completion
-            if any(punct in selected_text for punct in ['.', '?', '!']):
+            # A final result is a complete caller turn (the endpoint was reached)
+            if stt_result.is_final or any(punct in selected_text for punct in ['.', '?', '!']):
                 complete_sentence = stream_info['sentence_buffer'].strip()
                 stream_info['sentence_buffer'] = ""
                 
                 # Process complete sentence
-                await self.process_complete_sentence(call_sid, complete_sentence, start_time)
+                await self.process_complete_sentence(call_sid, complete_sentence, start_time, turn)
                 
         except Exception as e:
             if "Grok usage detected" in str(e):
                 raise
             logger.error(f"Sentence chunk processing error: {e}")
     
-    async def process_complete_sentence(self, call_sid, sentence, start_time):
+    async def process_complete_sentence(self, call_sid, sentence, start_time, turn=None):
         """Process a complete sentence in sentence-chunk mode"""
         try:
             openai_start = time.time()
@@ -332,7 +361,7 @@ class TwilioMediaStreamHandler:
             response_text = ""
             first_token_time = None
             
-            async for token in conversation_manager.stream_response(call_sid, enhanced_context):
+            async for token in conversation_manager.stream_response(call_sid, enhanced_context, turn):
                 if first_token_time is None:
                     first_token_time = time.time()
                     self.log_timing(call_sid, "first_token_ms", (first_token_time - openai_start) * 1000)
@@ -345,16 +374,17 @@ class TwilioMediaStreamHandler:
                     await streaming_tts_client.synthesize_and_stream(call_sid, response_text)
                     
                     # Start playback
-                    await self.start_audio_playback(call_sid)
+                    await self.start_audio_playback(call_sid, turn)
                     first_audio_time = time.time() - start_time
                     self.log_timing(call_sid, "first_audio_ms", first_audio_time * 1000)
                     
                     response_text = ""  # Reset for next sentence
             
-            # Send any remaining text
+            # Send any remaining text, then play out the rest of the generation
             if response_text.strip():
                 await streaming_tts_client.synthesize_and_stream(call_sid, response_text)
-                await self.start_audio_playback(call_sid)
+            await streaming_tts_client.finish_generation(call_sid)
+            await self.start_audio_playback(call_sid, turn, final=True)
             
             # Update session facts
             self.update_session_facts(call_sid, sentence)
@@ -362,22 +392,10 @@ class TwilioMediaStreamHandler:
         except Exception as e:
             logger.error(f"Complete sentence processing error: {e}")
     
-    async def perform_stt_with_nbest(self, audio_chunk):
-        """Perform STT with N-best hypotheses for accuracy + emergency detection"""
+    async def perform_stt_with_nbest(self, call_sid, audio_chunk):
+        """One-shot STT of a complete μ-law utterance with N-best hypotheses (+ emergency detection)"""
         try:
-            # Use OpenAI Whisper with multiple hypotheses
-            from openai import OpenAI
-            client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-            
-            # Convert audio chunk to appropriate format for Whisper
-            # Note: This is a simplified example - real implementation would need proper audio format conversion
-            
-            # For now, return mock structure - real implementation would call Whisper API
-            return [
-                {"text": "sample transcription", "confidence": 0.9},
-                {"text": "alternate transcription", "confidence": 0.7},
-                {"text": "emergency transcription", "confidence": 0.6}
-            ]
+            return await get_stt_engine().transcribe(call_sid, audio_chunk)
             
         except Exception as e:
             logger.error(f"STT N-best error: {e}")
@@ -452,35 +470,62 @@ class TwilioMediaStreamHandler:
         if phone_match:
             facts['callbackNumber'] = phone_match.group(1)
     
-    async def start_audio_playback(self, call_sid):
-        """Start audio playback through Twilio Media Stream"""
+    async def start_audio_playback(self, call_sid, turn=None, final=False):
+        """
+        Start audio playback through Twilio Media Stream
+        final=True keeps draining until ElevenLabs ends the generation, then flushes the last partial frame
+        """
         try:
-            if call_sid not in self.active_streams:
+            if call_sid not in self.active_streams or (turn is not None and turn.cancelled):
                 return
                 
-            websocket = self.active_streams[call_sid]['websocket']
-            
-            # Get audio from ElevenLabs streaming buffer
-            audio_data = await streaming_tts_client.get_audio_chunk(call_sid)
-            
-            if audio_data:
-                # Encode for Twilio (base64 mulaw)
-                encoded_audio = base64.b64encode(audio_data).decode('utf-8')
+            stream_info = self.active_streams[call_sid]
+            websocket = stream_info['websocket']
+            framer = stream_info['outbound']
+            deadline = time.time() + TTS_FINAL_TIMEOUT_SECONDS
+            
+            while True:
+                # Checked before draining: once final, every chunk is already buffered
+                finished = not final or streaming_tts_client.generation_final(call_sid)
+                if not finished and time.time() >= deadline:
+                    logger.warning(f"⏰ No end of TTS generation for {call_sid} after {TTS_FINAL_TIMEOUT_SECONDS:.0f}s")
+                    finished = True
+                
+                # Drain everything ElevenLabs has buffered (ulaw_8000) into 20 ms Twilio media messages
+                messages = []
+                while True:
+                    audio_data = await streaming_tts_client.get_audio_chunk(call_sid)
+                    if not audio_data:
+                        break
+                    messages.extend(framer.frame(audio_data))
+                if final and finished:
+                    messages.extend(framer.flush())
                 
-                # Send to Twilio Media Stream
-                media_message = {
-                    "event": "media",
-                    "streamSid": call_sid,
-                    "media": {
-                        "payload": encoded_audio
-                    }
-                }
+                for media_message in messages:
+                    await websocket.send(media_message)
+                if turn is not None and messages:
+                    turn.add_audio(len(messages) * FRAME_MS)
                 
-                await websocket.send(json.dumps(media_message))
+                if finished or (turn is not None and turn.cancelled):
+                    return
+                await asyncio.sleep(FRAME_MS / 1000)
                 
         except Exception as e:
             logger.error(f"Audio playback error: {e}")
     
+    async def discard_playback(self, turn):
+        """Barge-in cancel hook: stop TTS generation, drop unframed audio and clear Twilio's playback queue"""
+        call_sid = turn.call_sid
+        discarded_ms = await streaming_tts_client.cancel_generation(call_sid)
+        
+        stream_info = self.active_streams.get(call_sid)
+        if not stream_info:
+            return discarded_ms
+        stream_info['outbound'].clear()
+        if turn.audio_ms_sent:
+            await stream_info['websocket'].send(json.dumps({"event": "clear", "streamSid": stream_info['stream_sid']}))
+        return discarded_ms
+    
     def log_timing(self, call_sid, metric, value_ms):
         """Log timing metrics for performance monitoring"""
         if call_sid not in self.timing_data:
@@ -503,6 +548,8 @@ class TwilioMediaStreamHandler:
                 logger.info(f"📊 Call {call_sid} timing summary: {timing}")
                 
                 # Cleanup resources
+                self.turn_scheduler.drop(call_sid)
+                get_stt_engine().close_session(call_sid)
                 await conversation_manager.cleanup_session(call_sid)
                 await streaming_tts_client.cleanup_session(call_sid)
                 
@@ -567,6 +614,7 @@ def register_media_stream_routes(app):
                     'pipeline': stream_info.get('pipeline'),
                     'target_latency_ms': stream_info.get('target_latency', 1.0) * 1000,
                     'timing': timing_info,
+                    'partial_transcript': stream_info.get('partial_text', ''),
                     'session_facts': media_stream_handler.session_facts.get(call_sid, {})
                 })
             else:
@@ -574,5 +622,15 @@ def register_media_stream_routes(app):
                 
         except Exception as e:
             return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/stt-status', methods=['GET'])
+    def get_stt_status():
+        """Streaming STT backend, sessions, partial/final counts and final latency"""
+        return jsonify({'status': 'success', 'stt': get_stt_engine().get_metrics()})
+    
+    @app.route('/api/barge-in-status', methods=['GET'])
+    def get_barge_in_status():
+        """Turns, barge-ins and the tokens / audio they wasted"""
+        return jsonify({'status': 'success', 'turns': media_stream_handler.turn_scheduler.get_metrics()})
 
     logger.info("📡 Twilio Media Stream routes registered")
\ No newline at end of file
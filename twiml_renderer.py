@@ -0,0 +1,229 @@
+"""
+TwiML Rendering Layer
+Precompiled response templates for the Twilio voice webhooks
+Public host resolution is cached and <Play> URLs carry short signed IDs instead of full text
+(reply audio by content hash, streamed replies by turn id - the caller's speech never leaves the server)
+"""
+
+import os
+import hmac
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+from typing import Optional, Iterator
+
+logger = logging.getLogger(__name__)
+
+AUDIO_TEXT_DB = os.environ.get('AUDIO_TEXT_DB', 'audio_text.db')
+AUDIO_TEXT_MAX_AGE_SECONDS = int(os.environ.get('AUDIO_TEXT_MAX_AGE_SECONDS', str(24 * 3600)))
+AUDIO_ID_SECRET = os.environ.get("SESSION_SECRET", "dev-secret-key").encode('utf-8')
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>'
+CHRIS_VOICE = 'Polly.Matthew-Neural'
+
+# Gather attribute sets used by the webhooks, keyed by response shape
+GATHER_SHAPES = {
+    'standard': 'input="speech" timeout="8" speechTimeout="4"',
+    'fast': 'input="speech" timeout="8" speechTimeout="1" enhanced="true" language="en-US" '
+            'speechModel="experimental_conversations"',
+    'spelling': 'input="speech" timeout="15" speechTimeout="6"',
+    # Hold flow replies (enhanced_call_flow): keypad input accepted too
+    'queued': 'input="speech dtmf" timeout="8" speechTimeout="4" dtmfTimeout="2" language="en-US"',
+}
+
+
+def _compile(verb: str, gather: str) -> str:
+    """One response shape: verb, Gather posting back to /handle-speech, then Redirect"""
+    return (XML_HEADER + '<Response>' + verb +
+            f'<Gather {gather} action="/handle-speech/{{call_sid}}" method="POST"></Gather>'
+            '<Redirect>/handle-speech/{call_sid}</Redirect></Response>')
+
+
+PLAY_TEMPLATES = {shape: _compile('<Play>{url}</Play>', gather) for shape, gather in GATHER_SHAPES.items()}
+SAY_TEMPLATES = {shape: _compile(f'<Say voice="{CHRIS_VOICE}">{{text}}</Say>', gather)
+                 for shape, gather in GATHER_SHAPES.items()}
+VERBS_TEMPLATES = {shape: _compile('{verbs}', gather) for shape, gather in GATHER_SHAPES.items()}
+PLAY_REDIRECT_TEMPLATE = XML_HEADER + '<Response><Play>{url}</Play><Redirect>{redirect}</Redirect></Response>'
+SAY_ONLY_TEMPLATE = (XML_HEADER + f'<Response><Say voice="{CHRIS_VOICE}">{{text}}</Say>'
+                     '<Gather input="speech" timeout="8" speechTimeout="4"/></Response>')
+
+
+@lru_cache(maxsize=32)
+def public_base_url(host_header: Optional[str]) -> str:
+    """https base URL for a request Host header (bind addresses map to the Replit domain)"""
+    host = host_header or 'localhost:5000'
+    if host.startswith('0.0.0.0'):
+        host = f"{os.environ.get('REPL_SLUG', 'maintenancelinker')}.{os.environ.get('REPL_OWNER', 'brokeropenhouse')}.repl.co"
+    return f"https://{host}"
+
+
+# ----------------------------------------------------------------------
+# Signed audio IDs
+# ----------------------------------------------------------------------
+
+def audio_id_for(text: str) -> str:
+    """Content address of a reply text (same text -> same ID -> cache-friendly URL)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def sign_audio_id(call_sid: str, audio_id: str) -> str:
+    return hmac.new(AUDIO_ID_SECRET, f"{call_sid}:{audio_id}".encode('utf-8'), hashlib.sha256).hexdigest()[:12]
+
+
+def verify_audio_id(call_sid: str, audio_id: str, signature: str) -> bool:
+    return hmac.compare_digest(sign_audio_id(call_sid, audio_id), signature or '')
+
+
+class AudioTextStore:
+    """
+    audio ID -> reply text (or turn key -> caller speech), shared by every gunicorn worker.
+    - Twilio may fetch the <Play> URL from a different worker than the one that rendered it,
+      so IDs are persisted to SQLite (WAL) with a small in-process LRU in front
+    - Rows older than max_age_seconds are pruned every prune_every inserts
+    """
+
+    def __init__(self, db_file: str = AUDIO_TEXT_DB, max_age_seconds: int = AUDIO_TEXT_MAX_AGE_SECONDS,
+                 memory_entries: int = 4096):
+        self.db_file = db_file
+        self.max_age_seconds = max_age_seconds
+        self.memory_entries = memory_entries
+        self.prune_every = 200
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS audio_text "
+                         "(audio_id TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, audio_id: str, text: str):
+        with self._lock:
+            self._memory[audio_id] = text
+            self._memory.move_to_end(audio_id)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, text: str, audio_id: Optional[str] = None) -> str:
+        """Store text under its content hash, or under an explicit key such as a turn key"""
+        audio_id = audio_id or audio_id_for(text)
+        with self._lock:
+            known = audio_id in self._memory
+        if known:
+            return audio_id
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO audio_text (audio_id, text, created) VALUES (?, ?, ?)",
+                         (audio_id, text, now))
+            self._inserts += 1
+            if self._inserts % self.prune_every == 0:
+                conn.execute("DELETE FROM audio_text WHERE created < ?", (now - self.max_age_seconds,))
+        self._remember(audio_id, text)
+        return audio_id
+
+    def get(self, audio_id: str) -> Optional[str]:
+        with self._lock:
+            text = self._memory.get(audio_id)
+        if text is not None:
+            return text
+        with self._connect() as conn:
+            row = conn.execute("SELECT text FROM audio_text WHERE audio_id = ?", (audio_id,)).fetchone()
+        if row:
+            self._remember(audio_id, row[0])
+            return row[0]
+        return None
+
+
+_audio_text_store: Optional[AudioTextStore] = None
+_audio_text_store_lock = threading.Lock()
+
+
+def get_audio_text_store() -> AudioTextStore:
+    global _audio_text_store
+    if _audio_text_store is None:
+        with _audio_text_store_lock:
+            if _audio_text_store is None:
+                _audio_text_store = AudioTextStore()
+    return _audio_text_store
+
+
+def audio_url(base_url: str, call_sid: str, text: str) -> str:
+    """Short signed /generate-audio URL for a reply text (synthesis starts now, not on fetch)"""
+    from call_audio_registry import get_call_audio_registry
+    audio_id = get_call_audio_registry().register(call_sid, text)
+    return f"{base_url}/generate-audio/{call_sid}/{audio_id}?sig={sign_audio_id(call_sid, audio_id)}"
+
+
+def _turn_key(call_sid: str, turn_id: str) -> str:
+    return f"turn:{call_sid}:{turn_id}"
+
+
+def stream_response_url(base_url: str, call_sid: str, turn_id: str, speech: str, skip: int = 0) -> str:
+    """Signed /stream-response URL for one caller turn; the speech is stored under the turn, not put in the URL"""
+    get_audio_text_store().put(speech, _turn_key(call_sid, turn_id))
+    url = f"{base_url}/stream-response/{call_sid}?turn={turn_id}&sig={sign_audio_id(call_sid, _turn_key(call_sid, turn_id))}"
+    return f"{url}&skip={skip}" if skip else url
+
+
+def verify_turn(call_sid: str, turn_id: str, signature: str) -> bool:
+    return verify_audio_id(call_sid, _turn_key(call_sid, turn_id), signature)
+
+
+def turn_speech(call_sid: str, turn_id: str) -> Optional[str]:
+    """The caller speech a stream_response_url() was issued for"""
+    return get_audio_text_store().get(_turn_key(call_sid, turn_id))
+
+
+# ----------------------------------------------------------------------
+# Rendering
+# ----------------------------------------------------------------------
+
+def play_url_gather(call_sid: str, url: str, shape: str = 'standard') -> str:
+    return PLAY_TEMPLATES[shape].format(url=escape(url), call_sid=escape(call_sid))
+
+
+def play_gather(call_sid: str, host_header: Optional[str], text: str, shape: str = 'standard') -> str:
+    """<Play> of Chris saying text, then listen for the caller"""
+    return play_url_gather(call_sid, audio_url(public_base_url(host_header), call_sid, text), shape)
+
+
+def say_gather(call_sid: str, text: str, shape: str = 'standard') -> str:
+    return SAY_TEMPLATES[shape].format(text=escape(text), call_sid=escape(call_sid))
+
+
+def play_verb(url: str) -> str:
+    return f'<Play>{escape(url)}</Play>'
+
+
+def say_verb(text: str) -> str:
+    return f'<Say voice="{CHRIS_VOICE}">{escape(text)}</Say>'
+
+
+def verbs_gather(call_sid: str, verbs: str, shape: str = 'standard') -> str:
+    """Prebuilt verbs (play_verb / say_verb output), then listen for the caller"""
+    return VERBS_TEMPLATES[shape].format(verbs=verbs, call_sid=escape(call_sid))
+
+
+def play_redirect(url: str, redirect: str) -> str:
+    """<Play> then hand the call to another webhook (e.g. the hold message before the queued reply)"""
+    return PLAY_REDIRECT_TEMPLATE.format(url=escape(url), redirect=escape(redirect))
+
+
+def say_only(text: str) -> str:
+    """Last-resort response used when the handler itself failed"""
+    return SAY_ONLY_TEMPLATE.format(text=escape(text))
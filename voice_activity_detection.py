@@ -1,111 +1,226 @@
 """
 Voice Activity Detection (VAD) for real-time conversation handling
 Detects when user starts/stops speaking for seamless turn-taking
+Twilio's 8 kHz μ-law frames are decoded through a lookup table, energy and zero-crossing
+features are computed with NumPy over whole frame batches, and each call keeps a tiny state object
 """
 
-import numpy as np
+import os
+import math
+import time
 import logging
-from typing import Optional, Tuple
-import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple, NamedTuple
+
+import numpy as np
+
+from enhanced_vad_config import VADConfig
+from mulaw_audio import MULAW_TO_PCM, FRAME_BYTES, FRAME_MS, MULAW_SILENCE
+from call_session_registry import get_call_sessions
 
 logger = logging.getLogger(__name__)
 
+_REALTIME_VAD = VADConfig.get_realtime_vad_config()
+
+# Timing comes from VADConfig; everything is counted in audio time (frames), never wall-clock time
+VAD_HANGOVER_MS = int(os.environ.get('VAD_HANGOVER_MS', str(_REALTIME_VAD['silence_timeout_ms'])))
+VAD_MIN_SPEECH_MS = int(os.environ.get('VAD_MIN_SPEECH_MS', str(_REALTIME_VAD['min_speech_duration_ms'])))
+VAD_ONSET_MS = int(os.environ.get('VAD_ONSET_MS', str(
+    max(FRAME_MS, math.ceil(_REALTIME_VAD['processing_delay_ms'] / FRAME_MS) * FRAME_MS))))
+
+# Energy thresholds (dBFS): absolute floor from the realtime silence threshold, plus a margin over the
+# adaptive noise floor - larger to start speech than to keep it (hysteresis)
+VAD_ENERGY_FLOOR_DB = 20 * math.log10(_REALTIME_VAD['silence_threshold'])
+VAD_START_MARGIN_DB = float(os.environ.get('VAD_START_MARGIN_DB', '9'))
+VAD_STOP_MARGIN_DB = float(os.environ.get('VAD_STOP_MARGIN_DB', '5'))
+VAD_NOISE_ADAPT = 0.05
+# Frames whose zero-crossing rate is above this are hiss/noise, not voiced speech
+VAD_ZCR_MAX = float(os.environ.get('VAD_ZCR_MAX', '0.45'))
+
+_PCM_FLOAT = (MULAW_TO_PCM.astype(np.float32) / 32768.0)
+_SIGN = MULAW_TO_PCM < 0
+
+
+def frame_features(mulaw) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-frame energy (dBFS) and zero-crossing rate for a run of μ-law frames.
+    A trailing partial frame is padded with μ-law silence.
+    """
+    codes = np.frombuffer(mulaw, dtype=np.uint8)
+    remainder = len(codes) % FRAME_BYTES
+    if remainder:
+        codes = np.concatenate([codes, np.full(FRAME_BYTES - remainder, MULAW_SILENCE, dtype=np.uint8)])
+    codes = codes.reshape(-1, FRAME_BYTES)
+
+    samples = _PCM_FLOAT[codes]
+    energy = np.einsum('ij,ij->i', samples, samples) / FRAME_BYTES
+    energy_db = 10.0 * np.log10(energy + 1e-10)
+
+    signs = _SIGN[codes]
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (FRAME_BYTES - 1)
+    return energy_db, zcr
+
+
+class VadState:
+    """One call's detector state"""
+    __slots__ = ('speaking', 'onset_ms', 'speech_ms', 'silence_ms', 'noise_db', 'audio_ms')
+
+    def __init__(self):
+        self.speaking = False
+        self.onset_ms = 0
+        self.speech_ms = 0
+        self.silence_ms = 0
+        self.noise_db = VAD_ENERGY_FLOOR_DB
+        self.audio_ms = 0
+
+
+class VadResult(NamedTuple):
+    is_speaking: bool
+    speech_started: bool
+    speech_ended: bool
+
+
 class VoiceActivityDetector:
+    """
+    Per-call μ-law VAD.
+    - A frame is speech when it is voiced (low zero-crossing rate) and its energy clears the noise floor
+      by VAD_START_MARGIN_DB to start speech, or VAD_STOP_MARGIN_DB to keep it going
+    - Speech starts after VAD_ONSET_MS of speech frames; it ends after VAD_HANGOVER_MS of non-speech,
+      as a turn if it lasted VAD_MIN_SPEECH_MS, otherwise it is discarded as a noise burst
+    - The noise floor adapts on non-speech frames only
+    - States live in the call-session registry, so they expire with the call
+    """
+
     def __init__(self):
-        self.silence_threshold = 0.01  # Amplitude threshold for silence
-        self.min_speech_duration = 0.3  # Minimum seconds to consider as speech
-        self.silence_duration_for_end = 0.8  # Seconds of silence to end turn
-        self.sample_rate = 8000  # Twilio audio sample rate
-        
-        # State tracking
-        self.is_speaking = False
-        self.speech_start_time = None
-        self.last_sound_time = None
-        self.audio_buffer = []
-        
-    def process_audio_chunk(self, audio_data: bytes) -> Tuple[bool, bool]:
+        self.start_margin_db = VAD_START_MARGIN_DB
+        self.stop_margin_db = VAD_STOP_MARGIN_DB
+        self.states = get_call_sessions().namespace('vad.states')
+        self._metrics_lock = threading.Lock()
+        self.metrics = {'frames': 0, 'turns': 0, 'discarded_bursts': 0, 'batches': 0, 'feature_ms': 0.0}
+
+    def _state(self, call_sid: str) -> VadState:
+        state = self.states.get(call_sid)
+        if state is None:
+            state = self.states[call_sid] = VadState()
+        return state
+
+    def _advance(self, state: VadState, energy_db: List[float], zcr: List[float]) -> VadResult:
+        started = ended = False
+        for db, crossings in zip(energy_db, zcr):
+            state.audio_ms += FRAME_MS
+            floor = max(state.noise_db, VAD_ENERGY_FLOOR_DB)
+            threshold = floor + (self.stop_margin_db if state.speaking else self.start_margin_db)
+            is_speech = db > threshold and crossings <= VAD_ZCR_MAX
+
+            if not state.speaking:
+                if is_speech:
+                    state.onset_ms += FRAME_MS
+                    if state.onset_ms >= VAD_ONSET_MS:
+                        state.speaking = True
+                        state.speech_ms = state.onset_ms
+                        state.silence_ms = 0
+                        started = True
+                else:
+                    state.onset_ms = 0
+                    state.noise_db += VAD_NOISE_ADAPT * (db - state.noise_db)
+            elif is_speech:
+                state.speech_ms += FRAME_MS
+                state.silence_ms = 0
+            else:
+                state.silence_ms += FRAME_MS
+                if state.silence_ms >= VAD_HANGOVER_MS:
+                    if state.speech_ms >= VAD_MIN_SPEECH_MS:
+                        ended = True
+                        with self._metrics_lock:
+                            self.metrics['turns'] += 1
+                        logger.debug(f"Speech ended - duration: {state.speech_ms}ms")
+                    else:
+                        with self._metrics_lock:
+                            self.metrics['discarded_bursts'] += 1
+                    state.speaking = False
+                    state.onset_ms = state.speech_ms = state.silence_ms = 0
+        with self._metrics_lock:
+            self.metrics['frames'] += len(energy_db)
+        return VadResult(state.speaking, started, ended)
+
+    def process(self, call_sid: str, audio_data) -> VadResult:
+        """Run one call's μ-law payload (one or more 20 ms frames) through its detector"""
+        started = time.perf_counter()
+        energy_db, zcr = frame_features(audio_data)
+        with self._metrics_lock:
+            self.metrics['batches'] += 1
+            self.metrics['feature_ms'] += (time.perf_counter() - started) * 1000
+        return self._advance(self._state(call_sid), energy_db.tolist(), zcr.tolist())
+
+    def process_batch(self, payloads: Dict[str, bytes]) -> Dict[str, VadResult]:
+        """Many calls' payloads at once: one feature pass over every frame, then each call's state machine"""
+        if not payloads:
+            return {}
+        started = time.perf_counter()
+        call_sids = list(payloads)
+        frame_counts = [-(-len(payloads[call_sid]) // FRAME_BYTES) for call_sid in call_sids]
+        padded = b''.join(bytes(payloads[call_sid]).ljust(count * FRAME_BYTES, bytes([MULAW_SILENCE]))
+                          for call_sid, count in zip(call_sids, frame_counts))
+        energy_db, zcr = frame_features(padded)
+        energy_db, zcr = energy_db.tolist(), zcr.tolist()
+        with self._metrics_lock:
+            self.metrics['batches'] += 1
+            self.metrics['feature_ms'] += (time.perf_counter() - started) * 1000
+
+        results, offset = {}, 0
+        for call_sid, count in zip(call_sids, frame_counts):
+            results[call_sid] = self._advance(self._state(call_sid), energy_db[offset:offset + count],
+                                              zcr[offset:offset + count])
+            offset += count
+        return results
+
+    def process_audio_chunk(self, audio_data: bytes, call_sid: str = 'default') -> Tuple[bool, bool]:
         """
         Process audio chunk and return (is_speaking, speech_ended)
-        
+
         Returns:
             is_speaking: True if user is currently speaking
             speech_ended: True if user just finished speaking (turn ended)
         """
         try:
-            # Convert audio bytes to numpy array
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            
-            # Normalize to 0-1 range
-            if len(audio_array) > 0:
-                audio_normalized = np.abs(audio_array.astype(np.float32)) / 32768.0
-                amplitude = np.mean(audio_normalized)
-            else:
-                amplitude = 0.0
-            
-            current_time = asyncio.get_event_loop().time()
-            
-            # Detect if there's significant audio activity
-            has_sound = amplitude > self.silence_threshold
-            
-            if has_sound:
-                self.last_sound_time = current_time
-                
-                if not self.is_speaking:
-                    # Speech is starting
-                    self.speech_start_time = current_time
-                    self.is_speaking = True
-                    logger.debug("Speech detected - user started speaking")
-                    return True, False
-                else:
-                    # Continue speaking
-                    return True, False
-            else:
-                # No significant sound detected
-                if self.is_speaking and self.last_sound_time:
-                    silence_duration = current_time - self.last_sound_time
-                    
-                    if silence_duration >= self.silence_duration_for_end:
-                        # User stopped speaking
-                        speech_duration = current_time - self.speech_start_time if self.speech_start_time else 0
-                        
-                        if speech_duration >= self.min_speech_duration:
-                            # Valid speech turn ended
-                            self.is_speaking = False
-                            self.speech_start_time = None
-                            logger.debug(f"Speech ended - duration: {speech_duration:.2f}s")
-                            return False, True
-                        else:
-                            # Too short to be real speech, ignore
-                            self.is_speaking = False
-                            self.speech_start_time = None
-                            return False, False
-                
-                return self.is_speaking, False
-                
+            result = self.process(call_sid, audio_data)
+            return result.is_speaking, result.speech_ended
         except Exception as e:
             logger.error(f"VAD processing error: {e}")
             return False, False
-    
-    def reset(self):
-        """Reset VAD state for new call"""
-        self.is_speaking = False
-        self.speech_start_time = None
-        self.last_sound_time = None
-        self.audio_buffer.clear()
+
+    def is_speaking(self, call_sid: str) -> bool:
+        state = self.states.get(call_sid)
+        return bool(state and state.speaking)
+
+    def reset(self, call_sid: Optional[str] = None):
+        """Reset VAD state for a call (or every call)"""
+        for sid in ([call_sid] if call_sid else list(self.states)):
+            self.states.pop(sid, None)
         logger.debug("VAD state reset")
-    
+
     def adjust_sensitivity(self, sensitivity: float):
         """Adjust VAD sensitivity (0.0 = most sensitive, 1.0 = least sensitive)"""
-        self.silence_threshold = 0.005 + (sensitivity * 0.02)  # Range: 0.005 to 0.025
-        logger.info(f"VAD sensitivity adjusted to {sensitivity}, threshold: {self.silence_threshold}")
-    
+        self.start_margin_db = 4.0 + sensitivity * 10.0  # Range: 4 to 14 dB over the noise floor
+        self.stop_margin_db = max(2.0, self.start_margin_db - 4.0)
+        logger.info(f"VAD sensitivity adjusted to {sensitivity}, start margin: {self.start_margin_db:.1f}dB")
+
     def get_status(self) -> dict:
         """Get current VAD status for monitoring"""
+        states = self.states.values()
+        speaking = [state for state in states if state.speaking]
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        feature_ms = metrics.pop('feature_ms')
         return {
-            "is_speaking": self.is_speaking,
-            "silence_threshold": self.silence_threshold,
-            "speech_duration": asyncio.get_event_loop().time() - self.speech_start_time if self.speech_start_time else 0
+            "is_speaking": bool(speaking),
+            "speaking_calls": len(speaking),
+            "active_calls": len(states),
+            "start_margin_db": self.start_margin_db,
+            "speech_duration": max((state.speech_ms for state in speaking), default=0) / 1000,
+            "avg_feature_us_per_frame": round(feature_ms * 1000 / metrics['frames'], 2) if metrics['frames'] else 0.0,
+            **metrics
         }
 
 # Global VAD instance
-vad_detector = VoiceActivityDetector()
\ No newline at end of file
+vad_detector = VoiceActivityDetector()